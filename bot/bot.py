@@ -2,16 +2,33 @@ import os
 import sys
 import asyncio
 import logging
-import socket
 from logging.handlers import RotatingFileHandler
+from typing import Any, Iterable
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand, BotCommandScopeDefault, BotCommandScopeChat
 
-from config import load_settings
-from db import init_db_pool, close_db_pool
+from config import Settings, load_settings, load_tenant_settings
+from db import open_backend, ticket_events, use_backend
 from handlers import get_routers
+from services.archiver import MessageArchiver
+from services.assignment import AssignmentEngine
+from services.autoclose import AutoCloseService
+from services.broadcast import BroadcastService
+from services.dashboard import DashboardService
+from services.escalation import EscalationService
+from services.leader import LeaderElection
+from services.notifications import TicketNotifier
+from services.publisher import TicketPublisher
+from services.sender import RateLimitedSender
+from services.retention import RetentionService
+from services.tenants import CURRENT_PROJECT, Tenant, TenantMiddleware
+from services.view_cache import ViewCache
+from services.webhooks import WebhookDispatcher
+from services.workers import WorkerPool
+from storage import StorageBackend
 
 # Гарантируем, что можно запускать bot.py из любой директории
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -52,18 +69,26 @@ class AiogramDispatcherRuFilter(logging.Filter):
         return True
 
 
-def configure_logging():
-    log_file_path = resolve_log_file_path()
+class ProjectLogFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        project = CURRENT_PROJECT.get()
+        record.project = f"[{project}] " if project else ""
+        return True
+
+
+def configure_logging(log_file_path: str | None = None):
+    log_file_path = log_file_path or resolve_log_file_path()
     log_dir = os.path.dirname(log_file_path)
     if log_dir:
         os.makedirs(log_dir, exist_ok=True)
 
     formatter = logging.Formatter(
-        fmt="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        fmt="%(asctime)s | %(levelname)s | %(name)s | %(project)s%(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
     )
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
+    console_handler.addFilter(ProjectLogFilter())
 
     file_handler = RotatingFileHandler(
         filename=log_file_path,
@@ -72,6 +97,7 @@ def configure_logging():
         encoding="utf-8",
     )
     file_handler.setFormatter(formatter)
+    file_handler.addFilter(ProjectLogFilter())
 
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
@@ -91,44 +117,11 @@ def configure_logging():
     LOGGER.info("📝 Логи пишутся в файл: %s", log_file_path)
 
 
-class SingleInstanceLock:
-    """Process lock to prevent running multiple bot.py instances."""
-
-    def __init__(self, lock_name: str):
-        self.lock_name = lock_name
-        self.sock: socket.socket | None = None
-        # Stable port in [46000..46999] based on project path/name.
-        self.port = 46000 + (zlib_crc32(lock_name) % 1000)
-
-    def acquire(self) -> bool:
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            self.sock.bind(("127.0.0.1", self.port))
-            self.sock.listen(1)
-        except OSError:
-            self.sock.close()
-            self.sock = None
-            return False
-        return True
-
-    def release(self):
-        if self.sock is None:
-            return
-        self.sock.close()
-        self.sock = None
-
-
-def zlib_crc32(value: str) -> int:
-    import zlib  # pylint: disable=import-outside-toplevel
-
-    return zlib.crc32(value.encode("utf-8")) & 0xFFFFFFFF
-
-
-async def setup_bot_commands(bot: Bot, admin_chat_id: int):
+async def setup_bot_commands(bot: Bot, admin_chat_ids: Iterable[int]):
     """
     Настраиваем команды:
     - для всех (в ЛС и в обычных чатах)
-    - отдельно для админ-чата (панель и служебные команды)
+    - отдельно для админ-чатов (панель и служебные команды)
     """
 
     # Команды по умолчанию (для пользователей, ЛС и т.п.)
@@ -149,72 +142,295 @@ async def setup_bot_commands(bot: Bot, admin_chat_id: int):
         BotCommand(command="panel", description="Панель управления тикетами"),
         BotCommand(command="tickets", description="Открытые тикеты"),
         BotCommand(command="stats", description="Статистика тикетов"),
+        BotCommand(command="dashboard", description="Закрепить дашборд тикетов"),
         BotCommand(command="close", description="Закрыть тикет по ID"),
+        BotCommand(command="republish", description="Повторить публикацию тикета"),
         BotCommand(command="userinfo", description="Профиль автора тикета"),
+        BotCommand(command="search", description="Поиск по тикетам"),
+        BotCommand(command="export", description="Выгрузка переписки файлом"),
+        BotCommand(command="retention", description="Очистка по срокам хранения"),
+        BotCommand(command="shift", description="Смена: автоназначение тикетов"),
+        BotCommand(command="broadcast", description="Рассылка игрокам"),
         BotCommand(command="adminhelp", description="Справка по админ-командам"),
     ]
-    await bot.set_my_commands(
-        commands=admin_commands,
-        scope=BotCommandScopeChat(chat_id=admin_chat_id),
-    )
+    for admin_chat_id in admin_chat_ids:
+        await bot.set_my_commands(
+            commands=admin_commands,
+            scope=BotCommandScopeChat(chat_id=admin_chat_id),
+        )
 
 
-async def main():
-    LOGGER.info("🚀 Запуск бота начат")
+def create_services(
+    settings: Settings, bot: Bot, backend: StorageBackend | None = None
+) -> dict[str, Any]:
+    """
+    Данные для хендлеров: settings (параметр settings: Settings) и сервисы,
+    к которым обращаются и хендлеры, и фоновые задачи. Сервисы, которым
+    нужны события тикетов, подписываются на шину backend'а (по умолчанию
+    текущего).
+    """
+    # один на бота: рассылки и автозакрытие делят общий лимит Telegram
+    sender = RateLimitedSender(bot)
+    services = {
+        "settings": settings,
+        "sender": sender,
+        "retention": RetentionService(settings),
+        "assignment": AssignmentEngine(settings),
+        "broadcasts": BroadcastService(settings, sender),
+        "publisher": TicketPublisher(settings),
+        "view_cache": ViewCache(settings),
+        "dashboard": DashboardService(settings),
+        "webhooks": WebhookDispatcher(settings),
+        "notifier": TicketNotifier(settings, bot),
+    }
+    events = ticket_events(backend)
+    services["assignment"].subscribe(events)
+    services["dashboard"].subscribe(events)
+    return services
+
+
+def create_dispatcher(
+    settings: Settings | None = None, bot: Bot | None = None
+) -> Dispatcher:
+    """
+    Dispatcher со всеми роутерами хендлеров и сервисами проекта в контексте.
+    Без settings — общий Dispatcher для TENANTS, сервисы подставляет
+    TenantMiddleware.
+    """
+    dp = Dispatcher(storage=MemoryStorage())
+    if settings is not None:
+        if bot is None:
+            raise ValueError("Для сервисов проекта нужен bot")
+        dp.workflow_data.update(create_services(settings, bot))
 
-    settings = load_settings()
-    if not settings.bot_token or not settings.admin_chat_id:
-        raise RuntimeError("Не заданы BOT_TOKEN или ADMIN_CHAT_ID в .env")
+    # Подключаем роутеры
+    routers = get_routers()
+    for router in routers:
+        dp.include_router(router)
+    LOGGER.info("🧩 Подключено роутеров: %s", len(routers))
+    return dp
+
+
+def start_background_services(
+    services: dict[str, Any], bot: Bot
+) -> list[asyncio.Task]:
+    """Фоновые задачи, живущие столько же, сколько polling."""
+    settings: Settings = services["settings"]
+    # темы новых тикетов: хендлеры только пишут тикет в БД
+    publisher: TicketPublisher = services["publisher"]
+    tasks = [asyncio.create_task(publisher.run(bot), name="ticket_publisher")]
+    if settings.archive_after_days > 0:
+        archiver = MessageArchiver(settings)
+        tasks.append(asyncio.create_task(archiver.run(), name="message_archiver"))
+
+    retention: RetentionService = services["retention"]
+    if retention.enabled:
+        tasks.append(asyncio.create_task(retention.run(bot), name="retention_sweeper"))
+
+    escalation = EscalationService(settings)
+    if escalation.enabled:
+        tasks.append(asyncio.create_task(escalation.run(bot), name="sla_escalation"))
+
+    auto_close = AutoCloseService(settings, services["sender"])
+    if auto_close.enabled:
+        tasks.append(asyncio.create_task(auto_close.run(bot), name="auto_close"))
+
+    dashboard: DashboardService = services["dashboard"]
+    if dashboard.enabled:
+        tasks.append(asyncio.create_task(dashboard.run(bot), name="admin_dashboard"))
+
+    # outbox пополняют все процессы, отправляет на WEBHOOK_URL только лидер
+    webhooks: WebhookDispatcher = services["webhooks"]
+    if webhooks.enabled:
+        tasks.append(asyncio.create_task(webhooks.run(), name="webhooks"))
+
+    # рассылки запускаются из /broadcast, а незавершённые продолжаются после рестарта
+    broadcasts: BroadcastService = services["broadcasts"]
+    tasks.append(asyncio.create_task(broadcasts.run(bot), name="broadcasts"))
+    return tasks
+
+
+async def stop_background_services(tasks: list[asyncio.Task]):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_sharded_polling(
+    settings: Settings,
+    dp: Dispatcher,
+    bot: Bot,
+    leader: LeaderElection,
+    background_tasks: list[asyncio.Task],
+):
+    """Режим WORKERS: polling здесь, хендлеры — в процессах-обработчиках."""
+    stop = asyncio.Event()
+
+    async def on_leadership_lost():
+        stop.set()
+
+    background_tasks.append(
+        asyncio.create_task(leader.keep_alive(on_leadership_lost), name="leader_lease")
+    )
+    pool = WorkerPool(settings)
+    pool.start()
+    try:
+        LOGGER.info(
+            "📡 Polling запущен, обработчиков: %s. Для остановки нажми Ctrl+C.",
+            settings.workers,
+        )
+        await pool.poll(bot, stop, dp.resolve_used_update_types())
+    finally:
+        await pool.stop()
+
+
+async def run_project(settings: Settings):
+    """Один бот: пул БД, Bot, Dispatcher, роль лидера, polling и фоновые задачи."""
     LOGGER.info("⚙️ Настройки загружены (admin_chat_id=%s)", settings.admin_chat_id)
 
-    # Инициализируем пул БД
-    LOGGER.info("🗄️ Инициализация пула БД")
-    await init_db_pool(settings)
+    # Инициализируем пул БД: он становится текущим для этой задачи,
+    # хендлеров и фоновых задач, созданных из неё
+    LOGGER.info("🗄️ Инициализация пула БД (backend=%s)", settings.db_backend)
+    backend = await open_backend(settings)
+    use_backend(backend)
     LOGGER.info("✅ Пул БД готов")
 
     bot = Bot(token=settings.bot_token)
-    dp = Dispatcher(storage=MemoryStorage())
+    dp = create_dispatcher(settings, bot)
     LOGGER.info("🤖 Aiogram Bot и Dispatcher инициализированы")
 
-    # Кладём settings в контекст Dispatcher,
-    # чтобы их можно было получать в хендлерах через параметр settings: Settings
-    dp["settings"] = settings
+    leader = LeaderElection(settings)
+    background_tasks: list[asyncio.Task] = []
+    try:
+        # Резервный узел держит готовыми пул БД, сессию бота и Dispatcher,
+        # чтобы после захвата роли сразу начать polling
+        await bot.me()
+        await leader.wait_until_leader()
+
+        # Регистрируем команды бота (отдельно для юзеров и для админ-чата)
+        LOGGER.info("🧭 Настраиваю команды бота")
+        await setup_bot_commands(bot, settings.admin_chat_ids)
+        LOGGER.info("✅ Команды бота настроены")
+
+        background_tasks = start_background_services(dp.workflow_data, bot)
+        if settings.workers > 0:
+            await run_sharded_polling(settings, dp, bot, leader, background_tasks)
+        else:
+            background_tasks.append(
+                asyncio.create_task(
+                    leader.keep_alive(dp.stop_polling), name="leader_lease"
+                )
+            )
+            LOGGER.info("📡 Polling запущен. Для остановки нажми Ctrl+C.")
+            await dp.start_polling(bot)
+        LOGGER.info("🛑 Polling остановлен")
+        if not leader.is_leader:
+            raise RuntimeError("Роль лидера потеряна, узел нужно перезапустить")
+    finally:
+        LOGGER.info("🧹 Завершение: закрываю ресурсы")
+        await stop_background_services(background_tasks)
+        await leader.release()
+        await backend.close()
+        LOGGER.info("🗄️ Пул БД закрыт")
+        await bot.session.close()
+        LOGGER.info("🔌 Сессия бота закрыта")
+
 
-    # Регистрируем команды бота (отдельно для юзеров и для админ-чата)
-    LOGGER.info("🧭 Настраиваю команды бота")
-    await setup_bot_commands(bot, settings.admin_chat_id)
+async def start_tenant(tenant: Tenant, dp: Dispatcher) -> list[asyncio.Task]:
+    """Запуск проекта в его контексте (Tenant.spawn): роль лидера, команды, фон."""
+    await tenant.bot.me()
+    await tenant.leader.wait_until_leader()
+    await setup_bot_commands(tenant.bot, tenant.settings.admin_chat_ids)
     LOGGER.info("✅ Команды бота настроены")
 
-    # Подключаем роутеры
-    routers = get_routers()
-    for router in routers:
-        dp.include_router(router)
-    LOGGER.info("🧩 Подключено роутеров: %s", len(routers))
+    tasks = start_background_services(tenant.services, tenant.bot)
+    # потеря роли любым проектом останавливает весь процесс
+    tasks.append(
+        asyncio.create_task(
+            tenant.leader.keep_alive(dp.stop_polling), name="leader_lease"
+        )
+    )
+    return tasks
 
+
+async def run_tenants(tenant_settings: list[Settings]):
+    """
+    Несколько ботов в одном процессе (TENANTS): общий Dispatcher и общая
+    HTTP-сессия, у каждого проекта свои настройки, сервисы, БД и фоновые
+    задачи. Пулы MySQL общие для проектов на одном сервере БД.
+    """
+    LOGGER.info(
+        "🏢 Проектов в процессе: %s (%s)",
+        len(tenant_settings),
+        ", ".join(settings.project_name for settings in tenant_settings),
+    )
+    session = AiohttpSession()
+    dp = create_dispatcher()
+    tenants: list[Tenant] = []
+    background_tasks: list[asyncio.Task] = []
     try:
+        for settings in tenant_settings:
+            backend = await open_backend(settings)
+            bot = Bot(token=settings.bot_token, session=session)
+            services = create_services(settings, bot, backend)
+            tenants.append(Tenant(settings, backend, bot, services))
+            LOGGER.info(
+                "✅ Проект %s: пул БД готов (backend=%s, admin_chat_id=%s)",
+                settings.project_name,
+                settings.db_backend,
+                settings.admin_chat_id,
+            )
+        dp.update.outer_middleware(TenantMiddleware(tenants))
+
+        started = await asyncio.gather(
+            *(
+                tenant.spawn(
+                    start_tenant(tenant, dp), f"start_{tenant.settings.project_name}"
+                )
+                for tenant in tenants
+            )
+        )
+        for tasks in started:
+            background_tasks.extend(tasks)
+
         LOGGER.info("📡 Polling запущен. Для остановки нажми Ctrl+C.")
-        await dp.start_polling(bot)
+        await dp.start_polling(
+            *(tenant.bot for tenant in tenants), close_bot_session=False
+        )
         LOGGER.info("🛑 Polling остановлен")
+        if not all(tenant.leader.is_leader for tenant in tenants):
+            raise RuntimeError("Роль лидера потеряна, узел нужно перезапустить")
     finally:
         LOGGER.info("🧹 Завершение: закрываю ресурсы")
-        await close_db_pool()
-        LOGGER.info("🗄️ Пул БД закрыт")
-        await bot.session.close()
-        LOGGER.info("🔌 Сессия бота закрыта")
+        await stop_background_services(background_tasks)
+        for tenant in tenants:
+            await tenant.spawn(tenant.leader.release(), "release_lease")
+            await tenant.backend.close()
+        LOGGER.info("🗄️ Пулы БД закрыты")
+        await session.close()
+        LOGGER.info("🔌 Сессия ботов закрыта")
+
+
+async def main():
+    LOGGER.info("🚀 Запуск бота начат")
+
+    tenants = load_tenant_settings()
+    if tenants:
+        if any(settings.workers > 0 for settings in tenants):
+            raise RuntimeError("WORKERS не поддерживается вместе с TENANTS")
+        await run_tenants(tenants)
+        return
+
+    settings = load_settings()
+    if not settings.bot_token or not settings.admin_chat_id:
+        raise RuntimeError("Не заданы BOT_TOKEN или ADMIN_CHAT_ID в .env")
+    await run_project(settings)
 
 
 if __name__ == "__main__":
     configure_logging()
     LOGGER.info("🚀 Инициализация процесса бота")
 
-    instance_lock = SingleInstanceLock(BASE_DIR)
-    if not instance_lock.acquire():
-        LOGGER.error(
-            "❌ Уже запущен другой экземпляр бота. Останови его перед новым запуском."
-        )
-        raise SystemExit(1)
-    LOGGER.info("🔒 Single-instance lock получен на 127.0.0.1:%s", instance_lock.port)
-
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -222,6 +438,3 @@ if __name__ == "__main__":
     except Exception:
         LOGGER.exception("💥 Бот остановлен из-за необработанного исключения")
         raise
-    finally:
-        instance_lock.release()
-        LOGGER.info("🔓 Single-instance lock освобожден")
@@ -1,10 +1,13 @@
 import os
 from dataclasses import dataclass
+from typing import Mapping
 
-from dotenv import load_dotenv
+from dotenv import dotenv_values, load_dotenv
 
 load_dotenv()
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 
 @dataclass
 class Settings:
@@ -16,16 +19,222 @@ class Settings:
     db_user: str
     db_password: str
     db_name: str
+    db_backend: str
+    db_path: str
+    archive_after_days: int
+    archive_batch_tickets: int
+    archive_interval_minutes: int
+    # категория -> дней хранения после закрытия; "*" — для остальных категорий
+    retention_days: dict[str, int]
+    retention_dry_run: bool
+    retention_interval_hours: int
+    # категория -> least_load | round_robin | off; "*" — для остальных категорий
+    assignment_strategy: dict[str, str]
+    # 0 — без ограничения активных тикетов на админа
+    assignment_max_load: int
+    # категория -> пороги уровней эскалации в минутах без ответа админа
+    escalation_minutes: dict[str, tuple[int, ...]]
+    escalation_interval_seconds: int
+    # 0 — не закрывать тикеты без активности
+    auto_close_days: int
+    auto_close_interval_minutes: int
+    # окно склейки подряд идущих текстовых сообщений игрока, сек (0 — без склейки)
+    message_coalesce_seconds: float
+    # подтверждение пересылки: reply — сообщением, reaction — реакцией на исходное
+    ack_mode_admin: str
+    ack_mode_player: str
+    # аренда роли лидера: через сколько секунд без продления её забирает резерв
+    leader_lease_seconds: int
+    # процессов-обработчиков апдейтов (0 — всё в одном процессе)
+    workers: int
+    # категория -> форумы для тем новых тикетов; "*" — для остальных категорий,
+    # пусто — всё в ADMIN_CHAT_ID
+    ticket_chats: dict[str, tuple[int, ...]]
+    # кэш отрисованных историй и списков тикетов, КБ (0 — выключен)
+    view_cache_kb: int
+    # закреплённый дашборд в админ-чате: не чаще раза в N секунд (0 — выключен)
+    dashboard_interval_seconds: int
+    # исходящий вебхук событий тикетов (пусто — выключен), подпись HMAC-SHA256
+    webhook_url: str
+    webhook_secret: str
+    webhook_flush_seconds: float
+    # типы событий для вебхука (пусто — все)
+    webhook_events: tuple[str, ...]
+
+    @property
+    def admin_chat_ids(self) -> frozenset[int]:
+        """Основной админ-чат и все форумы тикетов: здесь работают админ-хендлеры."""
+        chats = {self.admin_chat_id}
+        for chat_ids in self.ticket_chats.values():
+            chats.update(chat_ids)
+        return frozenset(chats)
+
+
+def resolve_path(raw: str, base_dir: str = BASE_DIR) -> str:
+    if os.path.isabs(raw):
+        return raw
+    return os.path.join(base_dir, raw)
+
+
+def parse_category_map(raw: str, env_name: str, cast=str) -> dict:
+    """
+    "donate=730,bug=365,*=365" -> {"donate": 730, "bug": 365, "*": 365}.
+    "*" — значение для остальных категорий.
+    """
+    result = {}
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        category, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(
+                f"{env_name}: ожидается категория=значение, получено {item!r}"
+            )
+        result[category.strip()] = cast(value.strip())
+    return result
+
+
+def parse_retention_days(raw: str) -> dict[str, int]:
+    """RETENTION_DAYS: дней хранения по категориям, 0 — хранить бессрочно."""
+    return parse_category_map(raw, "RETENTION_DAYS", int)
+
+
+def parse_escalation_levels(raw: str) -> tuple[int, ...]:
+    """"30/120" -> (30, 120): порог каждого следующего уровня в минутах."""
+    levels = tuple(sorted(int(part) for part in raw.split("/") if part.strip()))
+    if not levels or levels[0] <= 0:
+        raise ValueError(f"ESCALATION_MINUTES: некорректные пороги {raw!r}")
+    return levels
+
+
+def parse_chat_ids(raw: str) -> tuple[int, ...]:
+    """"-1001/-1002" -> (-1001, -1002): форумы, между которыми делятся тикеты."""
+    chat_ids = tuple(int(part) for part in raw.split("/") if part.strip())
+    if not chat_ids:
+        raise ValueError(f"TICKET_CHATS: не указаны чаты в {raw!r}")
+    return chat_ids
+
 
+def parse_webhook_events(raw: str) -> tuple[str, ...]:
+    """"ticket.created,ticket.closed" -> ("ticket.created", "ticket.closed")."""
+    return tuple(part.strip().lower() for part in raw.split(",") if part.strip())
+
+
+def parse_ack_mode(raw: str, env_name: str) -> str:
+    mode = raw.strip().lower()
+    if mode not in ("reply", "reaction"):
+        raise ValueError(f"{env_name}: ожидается reply или reaction, получено {raw!r}")
+    return mode
+
+
+def load_settings(
+    env: Mapping[str, str | None] | None = None, base_dir: str = BASE_DIR
+) -> Settings:
+    """
+    Настройки из переменных окружения (и .env). env — другой источник
+    переменных, base_dir — от чего считать относительные пути.
+    """
+    source = os.environ if env is None else env
+
+    def getenv(name: str, default: str) -> str:
+        value = source.get(name)
+        return default if value is None else value
 
-def load_settings() -> Settings:
     return Settings(
-        bot_token=os.getenv("BOT_TOKEN", ""),
-        admin_chat_id=int(os.getenv("ADMIN_CHAT_ID", "0")),
-        project_name=os.getenv("PROJECT_NAME", "DETROIT"),
-        db_host=os.getenv("DB_HOST", "127.0.0.1"),
-        db_port=int(os.getenv("DB_PORT", "3306")),
-        db_user=os.getenv("DB_USER", "root"),
-        db_password=os.getenv("DB_PASSWORD", ""),
-        db_name=os.getenv("DB_NAME", "detroit_supportbot"),
+        bot_token=getenv("BOT_TOKEN", ""),
+        admin_chat_id=int(getenv("ADMIN_CHAT_ID", "0")),
+        project_name=getenv("PROJECT_NAME", "DETROIT"),
+        db_host=getenv("DB_HOST", "127.0.0.1"),
+        db_port=int(getenv("DB_PORT", "3306")),
+        db_user=getenv("DB_USER", "root"),
+        db_password=getenv("DB_PASSWORD", ""),
+        db_name=getenv("DB_NAME", "detroit_supportbot"),
+        db_backend=getenv("DB_BACKEND", "mysql").strip().lower(),
+        db_path=resolve_path(
+            getenv("DB_PATH", os.path.join("data", "supportbot.db")), base_dir
+        ),
+        archive_after_days=int(getenv("ARCHIVE_AFTER_DAYS", "30")),
+        archive_batch_tickets=int(getenv("ARCHIVE_BATCH_TICKETS", "50")),
+        archive_interval_minutes=int(getenv("ARCHIVE_INTERVAL_MINUTES", "60")),
+        retention_days=parse_retention_days(getenv("RETENTION_DAYS", "")),
+        retention_dry_run=getenv("RETENTION_DRY_RUN", "0").strip().lower()
+        in ("1", "true", "yes"),
+        retention_interval_hours=int(getenv("RETENTION_INTERVAL_HOURS", "24")),
+        assignment_strategy=parse_category_map(
+            getenv("ASSIGNMENT_STRATEGY", "*=least_load").lower(),
+            "ASSIGNMENT_STRATEGY",
+        ),
+        assignment_max_load=int(getenv("ASSIGNMENT_MAX_LOAD", "0")),
+        escalation_minutes=parse_category_map(
+            getenv("ESCALATION_MINUTES", ""),
+            "ESCALATION_MINUTES",
+            parse_escalation_levels,
+        ),
+        escalation_interval_seconds=int(getenv("ESCALATION_INTERVAL_SECONDS", "60")),
+        auto_close_days=int(getenv("AUTO_CLOSE_DAYS", "0")),
+        auto_close_interval_minutes=int(getenv("AUTO_CLOSE_INTERVAL_MINUTES", "60")),
+        message_coalesce_seconds=float(getenv("MESSAGE_COALESCE_SECONDS", "3")),
+        ack_mode_admin=parse_ack_mode(getenv("ACK_MODE_ADMIN", "reaction"), "ACK_MODE_ADMIN"),
+        ack_mode_player=parse_ack_mode(
+            getenv("ACK_MODE_PLAYER", "reaction"), "ACK_MODE_PLAYER"
+        ),
+        leader_lease_seconds=int(getenv("LEADER_LEASE_SECONDS", "15")),
+        workers=int(getenv("WORKERS", "0")),
+        ticket_chats=parse_category_map(
+            getenv("TICKET_CHATS", ""), "TICKET_CHATS", parse_chat_ids
+        ),
+        view_cache_kb=int(getenv("VIEW_CACHE_KB", "4096")),
+        dashboard_interval_seconds=int(getenv("DASHBOARD_INTERVAL_SECONDS", "0")),
+        webhook_url=getenv("WEBHOOK_URL", "").strip(),
+        webhook_secret=getenv("WEBHOOK_SECRET", ""),
+        webhook_flush_seconds=float(getenv("WEBHOOK_FLUSH_SECONDS", "2")),
+        webhook_events=parse_webhook_events(getenv("WEBHOOK_EVENTS", "")),
     )
+
+
+def parse_tenant_files(raw: str) -> list[str]:
+    """TENANTS: .env-файлы проектов через запятую."""
+    return [resolve_path(item.strip()) for item in raw.split(",") if item.strip()]
+
+
+def load_tenant_settings() -> list[Settings]:
+    """
+    Несколько ботов в одном процессе (TENANTS). У каждого проекта свой
+    .env: его переменные (BOT_TOKEN, ADMIN_CHAT_ID, PROJECT_NAME, DB_NAME,
+    ...) перекрывают общие из окружения и .env рядом с bot.py,
+    относительный DB_PATH считается от каталога его .env.
+    Пустой список — TENANTS не задан, бот один.
+    """
+    tenants = []
+    for path in parse_tenant_files(os.getenv("TENANTS", "")):
+        if not os.path.isfile(path):
+            raise ValueError(f"TENANTS: файл {path} не найден")
+        env = {**os.environ, **dotenv_values(path)}
+        settings = load_settings(env, os.path.dirname(path))
+        if not settings.bot_token or not settings.admin_chat_id:
+            raise ValueError(f"TENANTS: в {path} не заданы BOT_TOKEN или ADMIN_CHAT_ID")
+        tenants.append(settings)
+
+    for field, title in (
+        ("bot_token", "BOT_TOKEN"),
+        ("project_name", "PROJECT_NAME"),
+    ):
+        values = [getattr(settings, field) for settings in tenants]
+        if len(set(values)) != len(values):
+            raise ValueError(f"TENANTS: у проектов должен быть разный {title}")
+    chats = [chat_id for settings in tenants for chat_id in settings.admin_chat_ids]
+    if len(set(chats)) != len(chats):
+        raise ValueError(
+            "TENANTS: у проектов должны быть разные ADMIN_CHAT_ID / TICKET_CHATS"
+        )
+    databases = [tenant_database(settings) for settings in tenants]
+    if len(set(databases)) != len(databases):
+        raise ValueError("TENANTS: у проектов должна быть своя БД (DB_NAME / DB_PATH)")
+    return tenants
+
+
+def tenant_database(settings: Settings) -> tuple:
+    if settings.db_backend == "sqlite":
+        return ("sqlite", os.path.realpath(settings.db_path))
+    return (settings.db_backend, settings.db_host, settings.db_port, settings.db_name)
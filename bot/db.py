@@ -1,111 +1,196 @@
-from typing import Any, Dict, List, Optional
-
-import aiomysql
+import dataclasses
+import json
+import zlib
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence
+from weakref import WeakKeyDictionary
 
 from config import Settings
+from services.events import (
+    CLOSED_BY_ADMIN,
+    CLOSED_BY_INACTIVITY,
+    TICKET_EVENT_NAMES,
+    EventBus,
+    TicketAssigned,
+    TicketClosed,
+    TicketCreated,
+    TicketDeleted,
+    TicketEvent,
+    TicketMessageAdded,
+    TicketPublished,
+    TicketStatusChanged,
+)
+from storage import StorageBackend, create_backend
+from storage.base import parse_search_query
+
+BACKEND: StorageBackend | None = None
+# Backend проекта, чей апдейт или фоновая задача сейчас выполняется
+# (несколько ботов в одном процессе, TENANTS). Если не задан — BACKEND.
+CURRENT_BACKEND: ContextVar[StorageBackend | None] = ContextVar(
+    "current_backend", default=None
+)
+
+ARCHIVE_COMPRESS_LEVEL = 6
+
+# Получатели рассылок: active — авторы open / in_work тикетов,
+# all — все, у кого есть тикет или профиль.
+BROADCAST_AUDIENCE_ACTIVE = "active"
+BROADCAST_AUDIENCE_ALL = "all"
+
+
+def current_backend() -> StorageBackend:
+    backend = CURRENT_BACKEND.get() or BACKEND
+    if backend is None:
+        raise RuntimeError("Пул БД не инициализирован")
+    return backend
+
+
+class DataVersions:
+    """
+    Счётчики изменений тикетов, сделанных этим процессом, — по ним кэш
+    отрисованных view (services/view_cache.py) узнаёт, что запись устарела.
+    rows растёт при изменении строк tickets (списки /panel, /tickets),
+    ticket(id) — ещё и при новых сообщениях тикета (история).
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self._clock = 0
+        self._tickets: Dict[int, int] = {}
+
+    def ticket(self, ticket_id: int) -> int:
+        return self._tickets.get(ticket_id, 0)
+
+    def touch(self, ticket_ids: Iterable[int], *, rows: bool = True):
+        self._clock += 1
+        for ticket_id in ticket_ids:
+            self._tickets[ticket_id] = self._clock
+        if rows:
+            self.rows += 1
+
+
+# Свои счётчики у каждого backend (TENANTS): id тикетов проектов пересекаются.
+DATA_VERSIONS: "WeakKeyDictionary[StorageBackend, DataVersions]" = WeakKeyDictionary()
+
+
+def data_versions(backend: StorageBackend | None = None) -> DataVersions:
+    backend = backend or current_backend()
+    versions = DATA_VERSIONS.get(backend)
+    if versions is None:
+        versions = DATA_VERSIONS[backend] = DataVersions()
+    return versions
+
+
+# Шина событий тикетов (services/events.py) — тоже своя у каждого backend.
+TICKET_EVENTS: "WeakKeyDictionary[StorageBackend, EventBus]" = WeakKeyDictionary()
+
+
+def ticket_events(backend: StorageBackend | None = None) -> EventBus:
+    backend = backend or current_backend()
+    bus = TICKET_EVENTS.get(backend)
+    if bus is None:
+        bus = TICKET_EVENTS[backend] = EventBus()
+    return bus
+
+
+# Какие события тикетов пишутся в webhook_outbox (services/webhooks.py):
+# задаётся из настроек при открытии backend'а; нет записи — вебхук выключен.
+WEBHOOK_OUTBOX: "WeakKeyDictionary[StorageBackend, frozenset[type]]" = (
+    WeakKeyDictionary()
+)
+
+
+def configure_webhook_outbox(backend: StorageBackend, settings: Settings):
+    if not settings.webhook_url:
+        WEBHOOK_OUTBOX.pop(backend, None)
+        return
+    WEBHOOK_OUTBOX[backend] = frozenset(
+        event_type
+        for event_type, name in TICKET_EVENT_NAMES.items()
+        if not settings.webhook_events or name in settings.webhook_events
+    )
+
+
+def _outbox_transaction(conn, backend: StorageBackend):
+    """
+    Транзакция для изменения тикета, если вместе с ним пишется событие
+    в webhook_outbox. Без вебхука запросы выполняются как раньше.
+    """
+    if backend in WEBHOOK_OUTBOX:
+        return conn.transaction()
+    return nullcontext()
+
+
+async def _write_outbox(cur, backend: StorageBackend, events):
+    """
+    Записать события в webhook_outbox тем же курсором, что и само
+    изменение тикета: событие не потеряется после COMMIT при падении процесса.
+    """
+    event_types = WEBHOOK_OUTBOX.get(backend)
+    if not event_types:
+        return
+    rows = []
+    for event in events:
+        if type(event) not in event_types:
+            continue
+        data = dataclasses.asdict(event)
+        data.pop("ticket_id")
+        rows.append(
+            (
+                TICKET_EVENT_NAMES[type(event)],
+                event.ticket_id,
+                json.dumps(data, ensure_ascii=False),
+            )
+        )
+    if rows:
+        await cur.executemany(
+            """
+            INSERT INTO webhook_outbox (event_type, ticket_id, payload)
+            VALUES (%s, %s, %s)
+            """,
+            rows,
+        )
+
 
-POOL: aiomysql.Pool | None = None
+def _publish_events(backend: StorageBackend, events: Iterable[TicketEvent]):
+    bus = ticket_events(backend)
+    for event in events:
+        bus.publish(event)
+
+
+def use_backend(backend: StorageBackend):
+    """
+    Направить запросы текущей задачи и всех задач, созданных из неё
+    (хендлеры, фоновые сервисы), в БД одного проекта.
+    """
+    CURRENT_BACKEND.set(backend)
 
 
 async def ensure_schema():
     """Create required tables if they are missing."""
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute("SHOW TABLES LIKE %s", ("tickets",))
-            tickets_exists = await cur.fetchone() is not None
-            if not tickets_exists:
-                await cur.execute(
-                    """
-                    CREATE TABLE tickets (
-                        id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
-                        user_id BIGINT NOT NULL,
-                        username VARCHAR(64) NULL,
-                        category VARCHAR(32) NOT NULL DEFAULT 'other',
-                        topic VARCHAR(255) NOT NULL,
-                        status ENUM('open', 'in_work', 'closed') NOT NULL
-                            DEFAULT 'open',
-                        admin_thread_id BIGINT NULL,
-                        assigned_admin_id BIGINT NULL,
-                        assigned_admin_username VARCHAR(64) NULL,
-                        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-                            ON UPDATE CURRENT_TIMESTAMP,
-                        PRIMARY KEY (id),
-                        KEY idx_tickets_user_id (user_id),
-                        KEY idx_tickets_status (status),
-                        KEY idx_tickets_thread (admin_thread_id),
-                        KEY idx_tickets_assignee (assigned_admin_id)
-                    ) ENGINE=InnoDB
-                    DEFAULT CHARSET=utf8mb4
-                    COLLATE=utf8mb4_unicode_ci
-                    """
-                )
+    await current_backend().ensure_schema()
 
-            await cur.execute("SHOW TABLES LIKE %s", ("ticket_messages",))
-            ticket_messages_exists = await cur.fetchone() is not None
-            if not ticket_messages_exists:
-                await cur.execute(
-                    """
-                    CREATE TABLE ticket_messages (
-                        id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
-                        ticket_id BIGINT UNSIGNED NOT NULL,
-                        sender ENUM('user', 'admin') NOT NULL,
-                        text TEXT NOT NULL,
-                        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                        PRIMARY KEY (id),
-                        KEY idx_msg_ticket_id (ticket_id),
-                        KEY idx_msg_created_at (created_at),
-                        CONSTRAINT fk_ticket_messages_ticket
-                            FOREIGN KEY (ticket_id) REFERENCES tickets (id)
-                            ON DELETE CASCADE
-                            ON UPDATE CASCADE
-                    ) ENGINE=InnoDB
-                    DEFAULT CHARSET=utf8mb4
-                    COLLATE=utf8mb4_unicode_ci
-                    """
-                )
 
-            await cur.execute("SHOW TABLES LIKE %s", ("user_profiles",))
-            user_profiles_exists = await cur.fetchone() is not None
-            if not user_profiles_exists:
-                await cur.execute(
-                    """
-                    CREATE TABLE user_profiles (
-                        user_id BIGINT NOT NULL,
-                        game_nickname VARCHAR(64) NOT NULL,
-                        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-                            ON UPDATE CURRENT_TIMESTAMP,
-                        PRIMARY KEY (user_id)
-                    ) ENGINE=InnoDB
-                    DEFAULT CHARSET=utf8mb4
-                    COLLATE=utf8mb4_unicode_ci
-                    """
-                )
+async def open_backend(settings: Settings) -> StorageBackend:
+    backend = create_backend(settings)
+    await backend.open()
+    await backend.ensure_schema()
+    configure_webhook_outbox(backend, settings)
+    return backend
 
 
 async def init_db_pool(settings: Settings):
-    global POOL
-    POOL = await aiomysql.create_pool(
-        host=settings.db_host,
-        port=settings.db_port,
-        user=settings.db_user,
-        password=settings.db_password,
-        db=settings.db_name,
-        autocommit=True,
-        minsize=1,
-        maxsize=5,
-    )
-    await ensure_schema()
+    global BACKEND
+    BACKEND = await open_backend(settings)
 
 
 async def close_db_pool():
-    global POOL
-    if POOL:
-        POOL.close()
-        await POOL.wait_closed()
-        POOL = None
+    global BACKEND
+    if BACKEND:
+        await BACKEND.close()
+        BACKEND = None
 
 
 async def create_ticket(
@@ -114,57 +199,292 @@ async def create_ticket(
     topic: str,
     text: str,
     category: str,
+    photo_ids: Optional[Sequence[str]] = None,
 ) -> int:
-    """Создаём тикет (с категорией) + первую запись."""
-    assert POOL is not None
-    async with POOL.acquire() as conn:
+    """
+    Создаём тикет (с категорией) + первую запись. Тема и пост в админ-чате
+    появятся позже (published = 0), photo_ids — фото для этого поста.
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with _outbox_transaction(conn, backend):
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    INSERT INTO tickets (
+                        user_id, username, category, topic, status, published,
+                        photo_ids, last_message_at
+                    )
+                    VALUES (%s, %s, %s, %s, 'open', 0, %s, CURRENT_TIMESTAMP)
+                    """,
+                    (
+                        user_id,
+                        username,
+                        category,
+                        topic,
+                        json.dumps(list(photo_ids)) if photo_ids else None,
+                    ),
+                )
+                ticket_id = cur.lastrowid
+                await cur.execute(
+                    """
+                    INSERT INTO ticket_messages (ticket_id, sender, text)
+                    VALUES (%s, 'user', %s)
+                    """,
+                    (ticket_id, text),
+                )
+                events = [TicketCreated(ticket_id, user_id, category)]
+                await _write_outbox(cur, backend, events)
+    data_versions(backend).touch([ticket_id])
+    _publish_events(backend, events)
+    return ticket_id
+
+
+async def set_ticket_thread(
+    ticket_id: int, thread_id: int | None, admin_chat_id: int | None = None
+):
+    """
+    Привязать тикет к ID темы (message_thread_id). admin_chat_id — форум
+    с темой (0 — основной админ-чат); None — не менять.
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            if admin_chat_id is None:
+                await cur.execute(
+                    "UPDATE tickets SET admin_thread_id = %s WHERE id = %s",
+                    (thread_id, ticket_id),
+                )
+            else:
+                await cur.execute(
+                    """
+                    UPDATE tickets SET admin_chat_id = %s, admin_thread_id = %s
+                    WHERE id = %s
+                    """,
+                    (admin_chat_id, thread_id, ticket_id),
+                )
+    data_versions(backend).touch([ticket_id])
+
+
+async def get_unpublished_ticket_ids(limit: int = 100) -> List[int]:
+    """
+    Тикеты, для которых ещё не создана тема в админ-чате или не переслана
+    очередь сообщений игрока (ticket_relay_queue), старые первыми.
+    Тикеты с publish_error пропускаются до /republish.
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
         async with conn.cursor() as cur:
             await cur.execute(
                 """
-                INSERT INTO tickets (user_id, username, category, topic, status)
-                VALUES (%s, %s, %s, %s, 'open')
+                SELECT id FROM tickets
+                WHERE published = 0 AND publish_error IS NULL
+                UNION
+                SELECT q.ticket_id AS id
+                FROM ticket_relay_queue q
+                JOIN tickets t ON t.id = q.ticket_id
+                WHERE t.published = 1
+                ORDER BY id
+                LIMIT %s
                 """,
-                (user_id, username, category, topic),
+                (limit,),
             )
-            ticket_id = cur.lastrowid
+            rows = await cur.fetchall()
+            return [int(row[0]) for row in rows]
+
+
+async def get_ticket_for_publication(ticket_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Всё для поста о новом тикете: тикет, первое сообщение игрока (text),
+    его фото (photo_ids) и никнейм из профиля (game_nickname).
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
-                INSERT INTO ticket_messages (ticket_id, sender, text)
-                VALUES (%s, 'user', %s)
+                SELECT
+                    t.id,
+                    t.user_id,
+                    t.username,
+                    t.topic,
+                    t.category,
+                    t.status,
+                    t.published,
+                    t.photo_ids,
+                    t.posted_photos,
+                    t.publish_error,
+                    t.admin_chat_id,
+                    t.admin_thread_id,
+                    t.assigned_admin_id,
+                    t.assigned_admin_username,
+                    p.game_nickname,
+                    (
+                        SELECT m.text FROM ticket_messages m
+                        WHERE m.ticket_id = t.id
+                        ORDER BY m.id
+                        LIMIT 1
+                    ) AS text
+                FROM tickets t
+                LEFT JOIN user_profiles p ON p.user_id = t.user_id
+                WHERE t.id = %s
                 """,
-                (ticket_id, text),
+                (ticket_id,),
             )
-            return ticket_id
+            row = await cur.fetchone()
+    if row is not None:
+        row["photo_ids"] = json.loads(row["photo_ids"]) if row["photo_ids"] else []
+    return row
 
 
-async def set_ticket_thread(ticket_id: int, thread_id: int):
-    """Привязать тикет к ID темы (message_thread_id)."""
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor() as cur:
+async def queue_ticket_relay(
+    ticket_id: int, chat_id: int, message_ids: Sequence[int]
+) -> bool:
+    """
+    Поставить сообщения игрока в очередь на пересылку в тему тикета.
+    False — тема уже создана (published = 1), пересылать нужно сразу.
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                # условие в том же запросе: публикатор пересылает очередь
+                # после mark_ticket_published, и сообщение не проскочит мимо
+                for message_id in message_ids:
+                    queued = await cur.execute(
+                        """
+                        INSERT INTO ticket_relay_queue (ticket_id, chat_id, message_id)
+                        SELECT id, %s, %s FROM tickets
+                        WHERE id = %s AND published = 0
+                        """,
+                        (chat_id, message_id, ticket_id),
+                    )
+                    if not queued:
+                        return False
+    return True
+
+
+async def get_ticket_relay_queue(ticket_id: int) -> List[Dict[str, Any]]:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
-                "UPDATE tickets SET admin_thread_id = %s WHERE id = %s",
-                (thread_id, ticket_id),
+                """
+                SELECT id, chat_id, message_id
+                FROM ticket_relay_queue
+                WHERE ticket_id = %s
+                ORDER BY id ASC
+                """,
+                (ticket_id,),
             )
+            return await cur.fetchall()
 
 
-async def add_ticket_message(ticket_id: int, sender: str, text: str):
-    assert POOL is not None
-    async with POOL.acquire() as conn:
+async def delete_ticket_relay_queue(relay_ids: Sequence[int]) -> int:
+    if not relay_ids:
+        return 0
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            return await cur.execute(
+                f"""
+                DELETE FROM ticket_relay_queue
+                WHERE id IN ({', '.join(['%s'] * len(relay_ids))})
+                """,
+                tuple(relay_ids),
+            )
+
+
+async def set_ticket_posted_photos(ticket_id: int, count: int):
+    """Сколько фото тикета уже отправлено в тему: повтор публикации их пропустит."""
+    backend = current_backend()
+    async with backend.acquire() as conn:
         async with conn.cursor() as cur:
             await cur.execute(
+                "UPDATE tickets SET posted_photos = %s WHERE id = %s",
+                (count, ticket_id),
+            )
+
+
+async def set_ticket_publish_error(ticket_id: int, error: str) -> bool:
+    """
+    Остановить публикацию тикета до /republish. False — тема уже создана
+    (published = 1), ошибка случилась при пересылке очереди сообщений.
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            updated = await cur.execute(
                 """
-                INSERT INTO ticket_messages (ticket_id, sender, text)
-                VALUES (%s, %s, %s)
+                UPDATE tickets SET publish_error = %s
+                WHERE id = %s AND published = 0
+                """,
+                (error[:255], ticket_id),
+            )
+    data_versions(backend).touch([ticket_id])
+    return updated > 0
+
+
+async def reset_ticket_publish_error(ticket_id: int) -> bool:
+    """Вернуть тикет с ошибкой публикации в очередь. False — ошибки не было."""
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            updated = await cur.execute(
+                """
+                UPDATE tickets SET publish_error = NULL
+                WHERE id = %s AND published = 0 AND publish_error IS NOT NULL
                 """,
-                (ticket_id, sender, text),
+                (ticket_id,),
             )
+    data_versions(backend).touch([ticket_id])
+    return updated > 0
+
+
+async def mark_ticket_published(ticket_id: int):
+    backend = current_backend()
+    events = [TicketPublished(ticket_id)]
+    async with backend.acquire() as conn:
+        async with _outbox_transaction(conn, backend):
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "UPDATE tickets SET published = 1, photo_ids = NULL WHERE id = %s",
+                    (ticket_id,),
+                )
+                await _write_outbox(cur, backend, events)
+    data_versions(backend).touch([ticket_id])
+    _publish_events(backend, events)
+
+
+async def add_ticket_message(ticket_id: int, sender: str, text: str):
+    backend = current_backend()
+    events = [TicketMessageAdded(ticket_id, sender)]
+    async with backend.acquire() as conn:
+        async with _outbox_transaction(conn, backend):
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    INSERT INTO ticket_messages (ticket_id, sender, text)
+                    VALUES (%s, %s, %s)
+                    """,
+                    (ticket_id, sender, text),
+                )
+                await cur.execute(
+                    """
+                    UPDATE tickets SET last_message_at = CURRENT_TIMESTAMP
+                    WHERE id = %s
+                    """,
+                    (ticket_id,),
+                )
+                await _write_outbox(cur, backend, events)
+    data_versions(backend).touch([ticket_id], rows=False)
+    _publish_events(backend, events)
 
 
 async def get_user_tickets(user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
                 SELECT id, topic, status, category, created_at
@@ -184,12 +504,12 @@ async def get_closed_tickets_with_threads() -> List[Dict[str, Any]]:
     Все закрытые тикеты, у которых есть forum thread в админ-чате.
     Используется для архивации (удаления тем).
     """
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
-                SELECT id, admin_thread_id
+                SELECT id, admin_chat_id, admin_thread_id
                 FROM tickets
                 WHERE status = 'closed' AND admin_thread_id IS NOT NULL
                 ORDER BY id DESC
@@ -200,18 +520,86 @@ async def get_closed_tickets_with_threads() -> List[Dict[str, Any]]:
 
 
 async def set_ticket_status(ticket_id: int, status: str):
-    assert POOL is not None
-    async with POOL.acquire() as conn:
+    backend = current_backend()
+    if status == "closed":
+        events = [TicketClosed(ticket_id)]
+    else:
+        events = [TicketStatusChanged(ticket_id, status)]
+    async with backend.acquire() as conn:
+        async with _outbox_transaction(conn, backend):
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    UPDATE tickets
+                    SET status = %s,
+                        taken_at = COALESCE(
+                            taken_at,
+                            CASE WHEN %s = 'in_work' THEN CURRENT_TIMESTAMP END
+                        ),
+                        closed_at = CASE WHEN %s = 'closed' THEN CURRENT_TIMESTAMP END
+                    WHERE id = %s
+                    """,
+                    (status, status, status, ticket_id),
+                )
+                await _write_outbox(cur, backend, events)
+    data_versions(backend).touch([ticket_id])
+    _publish_events(backend, events)
+
+
+async def close_ticket(ticket_id: int, note: str) -> bool:
+    """
+    Закрыть активный тикет из админ-чата и записать note в его историю.
+    False — тикет уже закрыт (например, другим админом секундой раньше)
+    или не найден.
+    """
+    backend = current_backend()
+    events = [TicketClosed(ticket_id, reason=CLOSED_BY_ADMIN)]
+    async with backend.acquire() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    UPDATE tickets
+                    SET status = 'closed',
+                        closed_at = CURRENT_TIMESTAMP,
+                        last_message_at = CURRENT_TIMESTAMP
+                    WHERE id = %s AND status <> 'closed'
+                    """,
+                    (ticket_id,),
+                )
+                if cur.rowcount == 0:
+                    return False
+                await cur.execute(
+                    """
+                    INSERT INTO ticket_messages (ticket_id, sender, text)
+                    VALUES (%s, 'admin', %s)
+                    """,
+                    (ticket_id, note),
+                )
+                await _write_outbox(cur, backend, events)
+    data_versions(backend).touch([ticket_id])
+    _publish_events(backend, events)
+    return True
+
+
+async def mark_first_admin_reply(ticket_id: int):
+    """Запомнить время первого ответа админа игроку (повторные вызовы не меняют)."""
+    backend = current_backend()
+    async with backend.acquire() as conn:
         async with conn.cursor() as cur:
             await cur.execute(
-                "UPDATE tickets SET status = %s WHERE id = %s",
-                (status, ticket_id),
+                """
+                UPDATE tickets
+                SET first_admin_reply_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND first_admin_reply_at IS NULL
+                """,
+                (ticket_id,),
             )
 
 
 async def ticket_exists(ticket_id: int) -> bool:
-    assert POOL is not None
-    async with POOL.acquire() as conn:
+    backend = current_backend()
+    async with backend.acquire() as conn:
         async with conn.cursor() as cur:
             await cur.execute(
                 "SELECT id FROM tickets WHERE id = %s",
@@ -221,27 +609,56 @@ async def ticket_exists(ticket_id: int) -> bool:
             return row is not None
 
 
-async def get_ticket_by_thread_id(thread_id: int) -> Optional[Dict[str, Any]]:
-    """Получаем тикет по ID темы (message_thread_id)."""
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+async def get_ticket_by_thread_id(
+    thread_id: int, admin_chat_id: int = 0
+) -> Optional[Dict[str, Any]]:
+    """
+    Получаем тикет по ID темы (message_thread_id) в форуме admin_chat_id
+    (0 — основной админ-чат): номера тем в разных чатах совпадают.
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
-                SELECT id, user_id, username, topic, status
+                SELECT id, user_id, username, topic, status, admin_chat_id
                 FROM tickets
-                WHERE admin_thread_id = %s
+                WHERE admin_chat_id = %s AND admin_thread_id = %s
                 """,
-                (thread_id,),
+                (admin_chat_id, thread_id),
             )
             row = await cur.fetchone()
             return row
 
 
+async def count_active_tickets_by_chat(
+    admin_chat_ids: Sequence[int],
+) -> Dict[int, int]:
+    """Открытые и «в работе» тикеты по форумам (0 — основной админ-чат)."""
+    if not admin_chat_ids:
+        return {}
+    backend = current_backend()
+    placeholders = ", ".join(["%s"] * len(admin_chat_ids))
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"""
+                SELECT admin_chat_id, COUNT(*)
+                FROM tickets
+                WHERE status IN ('open', 'in_work')
+                  AND admin_chat_id IN ({placeholders})
+                GROUP BY admin_chat_id
+                """,
+                tuple(admin_chat_ids),
+            )
+            rows = await cur.fetchall()
+            return {int(chat_id): int(count) for chat_id, count in rows}
+
+
 async def get_open_tickets(limit: int = 20) -> List[Dict[str, Any]]:
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
                 SELECT
@@ -249,7 +666,10 @@ async def get_open_tickets(limit: int = 20) -> List[Dict[str, Any]]:
                     user_id,
                     topic,
                     status,
+                    admin_chat_id,
                     admin_thread_id,
+                    published,
+                    publish_error,
                     category,
                     assigned_admin_id,
                     assigned_admin_username
@@ -268,9 +688,9 @@ async def get_tickets_by_status(status: str, limit: int = 20) -> List[Dict[str,
     """
     Тикеты по статусу: open / in_work / closed.
     """
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
                 SELECT
@@ -279,7 +699,10 @@ async def get_tickets_by_status(status: str, limit: int = 20) -> List[Dict[str,
                     topic,
                     status,
                     category,
+                    admin_chat_id,
                     admin_thread_id,
+                    published,
+                    publish_error,
                     assigned_admin_id,
                     assigned_admin_username
                 FROM tickets
@@ -299,9 +722,9 @@ async def get_tickets_by_assignee(
     """
     Активные (open + in_work) тикеты, закреплённые за конкретным админом.
     """
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
                 SELECT
@@ -310,7 +733,10 @@ async def get_tickets_by_assignee(
                     topic,
                     status,
                     category,
+                    admin_chat_id,
                     admin_thread_id,
+                    published,
+                    publish_error,
                     assigned_admin_id,
                     assigned_admin_username
                 FROM tickets
@@ -327,12 +753,20 @@ async def get_tickets_by_assignee(
 
 async def get_user_last_active_ticket(user_id: int) -> Optional[Dict[str, Any]]:
     """Последний тикет пользователя в статусе open / in_work."""
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
-                SELECT id, user_id, username, topic, status, admin_thread_id
+                SELECT
+                    id,
+                    user_id,
+                    username,
+                    topic,
+                    status,
+                    admin_chat_id,
+                    admin_thread_id,
+                    published
                 FROM tickets
                 WHERE user_id = %s AND status IN ('open', 'in_work')
                 ORDER BY id DESC
@@ -346,9 +780,9 @@ async def get_user_last_active_ticket(user_id: int) -> Optional[Dict[str, Any]]:
 
 async def get_ticket(ticket_id: int) -> Optional[Dict[str, Any]]:
     """Получить тикет по ID."""
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
                 SELECT
@@ -357,10 +791,12 @@ async def get_ticket(ticket_id: int) -> Optional[Dict[str, Any]]:
                     username,
                     topic,
                     status,
+                    admin_chat_id,
                     admin_thread_id,
                     category,
                     assigned_admin_id,
-                    assigned_admin_username
+                    assigned_admin_username,
+                    created_at
                 FROM tickets
                 WHERE id = %s
                 """,
@@ -370,13 +806,53 @@ async def get_ticket(ticket_id: int) -> Optional[Dict[str, Any]]:
             return row
 
 
+def _pack_messages(rows: Sequence[Dict[str, Any]]) -> bytes:
+    data = [
+        [row["id"], row["sender"], row["text"], str(row["created_at"])]
+        for row in rows
+    ]
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(raw.encode("utf-8"), ARCHIVE_COMPRESS_LEVEL)
+
+
+def _unpack_messages(payload: bytes) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": msg_id,
+            "sender": sender,
+            "text": text,
+            "created_at": datetime.fromisoformat(created_at),
+        }
+        for msg_id, sender, text, created_at in json.loads(zlib.decompress(payload))
+    ]
+
+
+async def _fetch_archived_messages(
+    cur, ticket_id: int, after_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Архивные сообщения тикета (по возрастанию id). С after_id архив читается,
+    только если в нём есть сообщения новее after_id.
+    """
+    sql = "SELECT payload FROM ticket_messages_archive WHERE ticket_id = %s"
+    args: tuple = (ticket_id,)
+    if after_id is not None:
+        sql += " AND last_message_id > %s"
+        args = (ticket_id, after_id)
+    await cur.execute(sql, args)
+    row = await cur.fetchone()
+    if not row:
+        return []
+    return _unpack_messages(row["payload"])
+
+
 async def get_ticket_with_messages(ticket_id: int) -> Optional[Dict[str, Any]]:
     """
-    Получить тикет и все его сообщения.
+    Получить тикет и все его сообщения (включая перенесённые в архив).
     """
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
                 SELECT
@@ -385,6 +861,7 @@ async def get_ticket_with_messages(ticket_id: int) -> Optional[Dict[str, Any]]:
                     username,
                     topic,
                     status,
+                    admin_chat_id,
                     admin_thread_id,
                     category,
                     assigned_admin_id,
@@ -409,6 +886,9 @@ async def get_ticket_with_messages(ticket_id: int) -> Optional[Dict[str, Any]]:
                 (ticket_id,),
             )
             messages = await cur.fetchall()
+            archived = await _fetch_archived_messages(cur, ticket_id)
+            if archived:
+                messages = archived + messages
 
             return {
                 "ticket": ticket,
@@ -416,6 +896,358 @@ async def get_ticket_with_messages(ticket_id: int) -> Optional[Dict[str, Any]]:
             }
 
 
+async def get_ticket_messages_page(
+    ticket_id: int,
+    *,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: int = 30,
+) -> List[Dict[str, Any]]:
+    """
+    Страница сообщений тикета по ключу (ticket_id, id), без загрузки всей истории:
+    - before_id: limit сообщений старше before_id (ближайшие к нему);
+    - after_id: limit сообщений новее after_id (ближайшие к нему);
+    - без якоря: limit последних сообщений.
+    Сообщения всегда возвращаются в хронологическом порядке.
+    Индекс idx_msg_ticket_id в InnoDB неявно содержит PK,
+    то есть уже упорядочен по (ticket_id, id).
+    Архив (все id в нём меньше id «горячих» сообщений) читается,
+    только когда горячих сообщений не хватает на страницу.
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
+            if after_id is not None:
+                await cur.execute(
+                    """
+                    SELECT id, sender, text, created_at
+                    FROM ticket_messages
+                    WHERE ticket_id = %s AND id > %s
+                    ORDER BY id ASC
+                    LIMIT %s
+                    """,
+                    (ticket_id, after_id, limit),
+                )
+                rows = await cur.fetchall()
+                archived = await _fetch_archived_messages(cur, ticket_id, after_id)
+                if archived:
+                    newer = [msg for msg in archived if msg["id"] > after_id]
+                    rows = (newer + rows)[:limit]
+                return rows
+
+            if before_id is not None:
+                await cur.execute(
+                    """
+                    SELECT id, sender, text, created_at
+                    FROM ticket_messages
+                    WHERE ticket_id = %s AND id < %s
+                    ORDER BY id DESC
+                    LIMIT %s
+                    """,
+                    (ticket_id, before_id, limit),
+                )
+            else:
+                await cur.execute(
+                    """
+                    SELECT id, sender, text, created_at
+                    FROM ticket_messages
+                    WHERE ticket_id = %s
+                    ORDER BY id DESC
+                    LIMIT %s
+                    """,
+                    (ticket_id, limit),
+                )
+            rows = await cur.fetchall()
+            rows.reverse()
+
+            missing = limit - len(rows)
+            if missing > 0:
+                archived = await _fetch_archived_messages(cur, ticket_id)
+                if before_id is not None:
+                    archived = [msg for msg in archived if msg["id"] < before_id]
+                if archived:
+                    rows = archived[-missing:] + rows
+            return rows
+
+
+async def iter_ticket_export_rows(
+    *,
+    ticket_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: int = 500,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Построчная выгрузка тикетов вместе с сообщениями для экспорта.
+    Каждая строка — одно сообщение с полями тикета (msg_* = NULL у тикета без
+    сообщений), порядок — (ticket_id, msg_id). Архивные сообщения тикета
+    распаковываются и отдаются перед горячими.
+    Результат читается небуферизованным курсором пачками по batch_size,
+    поэтому память не зависит от размера выгрузки. Пока генератор не
+    исчерпан (или не закрыт), он держит соединение пула.
+    """
+    conditions = []
+    args: list[Any] = []
+    if ticket_id is not None:
+        conditions.append("t.id = %s")
+        args.append(ticket_id)
+    if user_id is not None:
+        conditions.append("t.user_id = %s")
+        args.append(user_id)
+    if created_from is not None:
+        conditions.append("t.created_at >= %s")
+        args.append(created_from)
+    if created_to is not None:
+        conditions.append("t.created_at < %s")
+        args.append(created_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True, stream=True) as cur:
+            await cur.execute(
+                f"""
+                SELECT
+                    t.id AS ticket_id,
+                    t.user_id,
+                    t.username,
+                    t.category,
+                    t.topic,
+                    t.status,
+                    t.assigned_admin_username,
+                    t.created_at AS ticket_created_at,
+                    m.id AS msg_id,
+                    m.sender,
+                    m.text,
+                    m.created_at,
+                    a.payload AS archive_payload
+                FROM tickets AS t
+                LEFT JOIN ticket_messages_archive AS a ON a.ticket_id = t.id
+                LEFT JOIN ticket_messages AS m ON m.ticket_id = t.id
+                {where}
+                ORDER BY t.id ASC, m.id ASC
+                """,
+                args,
+            )
+            unpacked_ticket = None
+            while True:
+                rows = await cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    payload = row.pop("archive_payload")
+                    if payload is not None and row["ticket_id"] != unpacked_ticket:
+                        unpacked_ticket = row["ticket_id"]
+                        for msg in _unpack_messages(payload):
+                            yield {
+                                **row,
+                                "msg_id": msg["id"],
+                                "sender": msg["sender"],
+                                "text": msg["text"],
+                                "created_at": msg["created_at"],
+                            }
+                    if row["msg_id"] is not None or payload is None:
+                        yield row
+
+
+async def search_tickets(
+    query: str,
+    *,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    after: Optional[tuple[float, int]] = None,
+    limit: int = 10,
+) -> List[Dict[str, Any]]:
+    """
+    Полнотекстовый поиск тикетов по теме и сообщениям (FULLTEXT / FTS5).
+    query: слово, слово*, "фраза", -исключение (каждый терм обязателен
+    в пределах темы или одного сообщения).
+    Результат отсортирован по (score DESC, id DESC); следующая страница —
+    after=(score, id) последнего тикета предыдущей.
+    """
+    backend = current_backend()
+    terms = parse_search_query(query)
+    if not terms.required:
+        raise ValueError("Пустой поисковый запрос")
+
+    match = backend.fulltext_query(terms)
+    hits_sql, placeholders = backend.fulltext_hits_sql()
+
+    conditions = []
+    args: list[Any] = [match] * placeholders
+    if status is not None:
+        conditions.append("t.status = %s")
+        args.append(status)
+    if category is not None:
+        conditions.append("t.category = %s")
+        args.append(category)
+    if user_id is not None:
+        conditions.append("t.user_id = %s")
+        args.append(user_id)
+    if created_from is not None:
+        conditions.append("t.created_at >= %s")
+        args.append(created_from)
+    if created_to is not None:
+        conditions.append("t.created_at < %s")
+        args.append(created_to)
+    if after is not None:
+        conditions.append("(hits.score < %s OR (hits.score = %s AND t.id < %s))")
+        args.extend((after[0], after[0], after[1]))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    args.append(limit)
+
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
+            await cur.execute(
+                f"""
+                SELECT
+                    t.id,
+                    t.user_id,
+                    t.username,
+                    t.category,
+                    t.topic,
+                    t.status,
+                    t.admin_chat_id,
+                    t.admin_thread_id,
+                    t.created_at,
+                    hits.score
+                FROM ({hits_sql}) AS hits
+                JOIN tickets AS t ON t.id = hits.ticket_id
+                {where}
+                ORDER BY hits.score DESC, t.id DESC
+                LIMIT %s
+                """,
+                args,
+            )
+            return await cur.fetchall()
+
+
+async def get_archivable_tickets(
+    older_than_days: int,
+    *,
+    after: Optional[tuple[datetime, int]] = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    Закрытые больше older_than_days дней назад тикеты, у которых остались
+    сообщения в ticket_messages. Порядок (closed_at, id); after — ключ
+    последнего тикета предыдущей пачки, чтобы не сканировать заново
+    уже заархивированное начало.
+    """
+    backend = current_backend()
+    conditions = [
+        "t.status = 'closed'",
+        f"t.closed_at < {backend.since(older_than_days, 'DAY')}",
+    ]
+    args: list[Any] = []
+    if after is not None:
+        conditions.append("(t.closed_at > %s OR (t.closed_at = %s AND t.id > %s))")
+        args.extend((after[0], after[0], after[1]))
+    args.append(limit)
+
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
+            await cur.execute(
+                f"""
+                SELECT t.id, t.closed_at
+                FROM tickets AS t
+                WHERE {' AND '.join(conditions)}
+                  AND EXISTS (
+                      SELECT 1 FROM ticket_messages AS m WHERE m.ticket_id = t.id
+                  )
+                ORDER BY t.closed_at ASC, t.id ASC
+                LIMIT %s
+                """,
+                args,
+            )
+            return await cur.fetchall()
+
+
+async def archive_ticket_messages(ticket_ids: Sequence[int]) -> Dict[str, int]:
+    """
+    Перенести сообщения тикетов в ticket_messages_archive одной транзакцией:
+    на тикет — одна строка со сжатым (zlib) JSON всех его сообщений.
+    Если тикет уже в архиве, новые сообщения дописываются к старым.
+    Возвращает {"tickets": ..., "messages": ...}.
+    """
+    if not ticket_ids:
+        return {"tickets": 0, "messages": 0}
+
+    placeholders = ", ".join(["%s"] * len(ticket_ids))
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.transaction():
+            async with conn.cursor(dict_rows=True) as cur:
+                await cur.execute(
+                    f"""
+                    SELECT id, ticket_id, sender, text, created_at
+                    FROM ticket_messages
+                    WHERE ticket_id IN ({placeholders})
+                    ORDER BY ticket_id ASC, id ASC
+                    """,
+                    tuple(ticket_ids),
+                )
+                by_ticket: Dict[int, List[Dict[str, Any]]] = {}
+                for row in await cur.fetchall():
+                    by_ticket.setdefault(row["ticket_id"], []).append(row)
+                if not by_ticket:
+                    return {"tickets": 0, "messages": 0}
+
+                await cur.execute(
+                    f"""
+                    SELECT ticket_id, payload
+                    FROM ticket_messages_archive
+                    WHERE ticket_id IN ({placeholders})
+                    """,
+                    tuple(ticket_ids),
+                )
+                existing = {
+                    row["ticket_id"]: row["payload"] for row in await cur.fetchall()
+                }
+
+                archive_rows = []
+                delete_rows = []
+                moved = 0
+                for ticket_id, messages in by_ticket.items():
+                    moved += len(messages)
+                    # удаляем ровно прочитанное: до последнего id этого тикета
+                    delete_rows.append((ticket_id, messages[-1]["id"]))
+                    if ticket_id in existing:
+                        messages = _unpack_messages(existing[ticket_id]) + messages
+                    archive_rows.append(
+                        (
+                            ticket_id,
+                            len(messages),
+                            messages[-1]["id"],
+                            _pack_messages(messages),
+                        )
+                    )
+
+                await cur.executemany(
+                    f"""
+                    INSERT INTO ticket_messages_archive
+                        (ticket_id, message_count, last_message_id, payload)
+                    VALUES (%s, %s, %s, %s)
+                    {backend.upsert_clause(
+                        ("ticket_id",),
+                        ("message_count", "last_message_id", "payload"),
+                        touch_columns=("archived_at",),
+                    )}
+                    """,
+                    archive_rows,
+                )
+                await cur.executemany(
+                    "DELETE FROM ticket_messages WHERE ticket_id = %s AND id <= %s",
+                    delete_rows,
+                )
+
+    return {"tickets": len(by_ticket), "messages": moved}
+
+
 async def get_ticket_stats_overview() -> Dict[str, Any]:
     """
     Общая статистика по тикетам:
@@ -423,16 +1255,20 @@ async def get_ticket_stats_overview() -> Dict[str, Any]:
     - by_status: словарь по статусам
     - last_24h: тикетов за последние 24 часа
     - last_7d: тикетов за последние 7 дней
+    - unpublished: тикетов, чья тема в админ-чате ещё не создана
+    - publish_failed: тикетов, чью публикацию остановила ошибка (ждут /republish)
     """
-    assert POOL is not None
+    backend = current_backend()
     result: Dict[str, Any] = {
         "total": 0,
         "by_status": {},
         "last_24h": 0,
         "last_7d": 0,
+        "unpublished": 0,
+        "publish_failed": 0,
     }
 
-    async with POOL.acquire() as conn:
+    async with backend.acquire() as conn:
         # всего тикетов
         async with conn.cursor() as cur:
             await cur.execute("SELECT COUNT(*) FROM tickets")
@@ -451,7 +1287,8 @@ async def get_ticket_stats_overview() -> Dict[str, Any]:
         # за последние 24 часа
         async with conn.cursor() as cur:
             await cur.execute(
-                "SELECT COUNT(*) FROM tickets WHERE created_at >= NOW() - INTERVAL 1 DAY"
+                "SELECT COUNT(*) FROM tickets "
+                f"WHERE created_at >= {backend.since(1, 'DAY')}"
             )
             row = await cur.fetchone()
             result["last_24h"] = int(row[0]) if row else 0
@@ -459,27 +1296,230 @@ async def get_ticket_stats_overview() -> Dict[str, Any]:
         # за последние 7 дней
         async with conn.cursor() as cur:
             await cur.execute(
-                "SELECT COUNT(*) FROM tickets WHERE created_at >= NOW() - INTERVAL 7 DAY"
+                "SELECT COUNT(*) FROM tickets "
+                f"WHERE created_at >= {backend.since(7, 'DAY')}"
             )
             row = await cur.fetchone()
             result["last_7d"] = int(row[0]) if row else 0
 
+        # ждут публикации в админ-чате
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT COUNT(*), COUNT(publish_error) FROM tickets WHERE published = 0"
+            )
+            total, failed = await cur.fetchone()
+            result["unpublished"] = int(total or 0) - int(failed or 0)
+            result["publish_failed"] = int(failed or 0)
+
     return result
 
 
-async def get_ticket_stats_by_assignee(limit: int = 5) -> List[Dict[str, Any]]:
+async def get_escalation_candidates(
+    scopes: Sequence[tuple[Optional[str], Sequence[str], Sequence[int]]],
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
     """
-    Статистика по администраторам:
-    - сколько тикетов закреплено за каждым админом
-    Возвращает топ по количеству тикетов.
+    Активные тикеты без ответа админа, которым пора на следующий уровень
+    эскалации. scopes — (category, exclude_categories, пороги уровней в минутах);
+    category=None — все категории, кроме exclude_categories.
+    Уровень k положен, если тикет ждёт дольше k-го порога и escalation_level < k.
     """
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    backend = current_backend()
+    if not scopes:
+        return []
+
+    scope_conditions = []
+    params: List[Any] = []
+    for category, exclude, thresholds in scopes:
+        levels = " OR ".join(
+            f"(escalation_level < {level} "
+            f"AND created_at < {backend.since(minutes, 'MINUTE')})"
+            for level, minutes in enumerate(thresholds, start=1)
+        )
+        if category is not None:
+            scope_conditions.append(f"(category = %s AND ({levels}))")
+            params.append(category)
+        elif exclude:
+            placeholders = ", ".join(["%s"] * len(exclude))
+            scope_conditions.append(f"(category NOT IN ({placeholders}) AND ({levels}))")
+            params.extend(exclude)
+        else:
+            scope_conditions.append(f"({levels})")
+
+    # общий верхний край по created_at — чтобы индекс (status, created_at)
+    # отсекал свежие тикеты ещё до проверки условий по категориям
+    newest = min(thresholds[0] for _, _, thresholds in scopes)
+    waiting = backend.seconds_between("created_at", "CURRENT_TIMESTAMP")
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
-                """
+                f"""
                 SELECT
-                    assigned_admin_id AS admin_id,
+                    id,
+                    user_id,
+                    category,
+                    topic,
+                    status,
+                    admin_chat_id,
+                    admin_thread_id,
+                    assigned_admin_id,
+                    assigned_admin_username,
+                    escalation_level,
+                    {waiting} AS waiting_seconds
+                FROM tickets
+                WHERE status IN ('open', 'in_work')
+                  AND created_at < {backend.since(newest, 'MINUTE')}
+                  AND first_admin_reply_at IS NULL
+                  AND ({" OR ".join(scope_conditions)})
+                ORDER BY created_at ASC
+                LIMIT %s
+                """,
+                (*params, limit),
+            )
+            rows = await cur.fetchall()
+            return rows
+
+
+async def set_ticket_escalation_level(ticket_id: int, level: int) -> bool:
+    """
+    Поднять уровень эскалации тикета. False — уровень уже был выставлен
+    (другим проходом) или админ успел ответить.
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                UPDATE tickets
+                SET escalation_level = %s
+                WHERE id = %s
+                  AND escalation_level < %s
+                  AND first_admin_reply_at IS NULL
+                """,
+                (level, ticket_id, level),
+            )
+            return cur.rowcount > 0
+
+
+async def close_inactive_tickets(
+    days: int, note: str, limit: int = 100
+) -> List[Dict[str, Any]]:
+    """
+    Закрыть пачку активных тикетов, в которых больше days дней не было
+    сообщений (по tickets.last_message_at), и записать note в их историю.
+    Возвращает закрытые тикеты; пустой список — закрывать больше нечего.
+    """
+    backend = current_backend()
+    inactive = (
+        "status IN ('open', 'in_work') "
+        f"AND last_message_at < {backend.since(days, 'DAY')}"
+    )
+    async with backend.acquire() as conn:
+        async with conn.transaction():
+            async with conn.cursor(dict_rows=True) as cur:
+                await cur.execute(
+                    f"""
+                    SELECT
+                        id,
+                        user_id,
+                        category,
+                        topic,
+                        admin_chat_id,
+                        admin_thread_id,
+                        assigned_admin_id
+                    FROM tickets
+                    WHERE {inactive}
+                    ORDER BY last_message_at ASC
+                    LIMIT %s
+                    """,
+                    (limit,),
+                )
+                rows = await cur.fetchall()
+                if not rows:
+                    return []
+
+                ids = tuple(row["id"] for row in rows)
+                placeholders = ", ".join(["%s"] * len(ids))
+                closed = await cur.execute(
+                    f"""
+                    UPDATE tickets
+                    SET status = 'closed', closed_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({placeholders}) AND {inactive}
+                    """,
+                    ids,
+                )
+                if closed != len(rows):
+                    # между SELECT и UPDATE игрок успел написать или тикет закрыли
+                    await cur.execute(
+                        f"""
+                        SELECT id FROM tickets
+                        WHERE id IN ({placeholders})
+                          AND status = 'closed'
+                          AND last_message_at < {backend.since(days, 'DAY')}
+                        """,
+                        ids,
+                    )
+                    still_closed = {row["id"] for row in await cur.fetchall()}
+                    rows = [row for row in rows if row["id"] in still_closed]
+
+                events = [
+                    TicketClosed(row["id"], reason=CLOSED_BY_INACTIVITY)
+                    for row in rows
+                ]
+                if rows:
+                    await cur.executemany(
+                        """
+                        INSERT INTO ticket_messages (ticket_id, sender, text)
+                        VALUES (%s, 'admin', %s)
+                        """,
+                        [(row["id"], note) for row in rows],
+                    )
+                    await _write_outbox(cur, backend, events)
+    data_versions(backend).touch(row["id"] for row in rows)
+    _publish_events(backend, events)
+    return rows
+
+
+async def get_sla_samples(days: int) -> List[Dict[str, Any]]:
+    """
+    Задержки по тикетам, созданным за последние days дней, в секундах:
+    first_response — до первого ответа админа, time_to_close — до закрытия
+    (NULL, если события ещё не было).
+    """
+    backend = current_backend()
+    first_response = backend.seconds_between("created_at", "first_admin_reply_at")
+    time_to_close = backend.seconds_between("created_at", "closed_at")
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
+            await cur.execute(
+                f"""
+                SELECT
+                    category,
+                    assigned_admin_id,
+                    assigned_admin_username,
+                    {first_response} AS first_response,
+                    {time_to_close} AS time_to_close
+                FROM tickets
+                WHERE created_at >= {backend.since(days, 'DAY')}
+                """
+            )
+            rows = await cur.fetchall()
+            return rows
+
+
+async def get_ticket_stats_by_assignee(limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    Статистика по администраторам:
+    - сколько тикетов закреплено за каждым админом
+    Возвращает топ по количеству тикетов.
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
+            await cur.execute(
+                """
+                SELECT
+                    assigned_admin_id AS admin_id,
                     assigned_admin_username AS admin_username,
                     COUNT(*) AS tickets_count
                 FROM tickets
@@ -494,11 +1534,90 @@ async def get_ticket_stats_by_assignee(limit: int = 5) -> List[Dict[str, Any]]:
             return rows
 
 
+async def get_dashboard_counters() -> Dict[str, Any]:
+    """
+    Счётчики для дашборда админ-чата (services/dashboard.py):
+    - queues: активные тикеты по (status, category)
+    - oldest_waiting: самый старый активный тикет без ответа админа или None
+    - load: активные тикеты по исполнителям, по убыванию
+    - unpublished: тикетов, чья тема в админ-чате ещё не создана
+    - publish_failed: тикетов, чью публикацию остановила ошибка (ждут /republish)
+    """
+    backend = current_backend()
+    result: Dict[str, Any] = {
+        "queues": {},
+        "oldest_waiting": None,
+        "load": [],
+        "unpublished": 0,
+        "publish_failed": 0,
+    }
+
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT status, category, COUNT(*)
+                FROM tickets
+                WHERE status IN ('open', 'in_work')
+                GROUP BY status, category
+                """
+            )
+            rows = await cur.fetchall()
+            result["queues"] = {
+                (status, category): int(cnt) for status, category, cnt in rows
+            }
+
+        async with conn.cursor(dict_rows=True) as cur:
+            await cur.execute(
+                """
+                SELECT
+                    id,
+                    category,
+                    admin_chat_id,
+                    admin_thread_id,
+                    assigned_admin_username,
+                    created_at
+                FROM tickets
+                WHERE status IN ('open', 'in_work')
+                  AND first_admin_reply_at IS NULL
+                ORDER BY created_at ASC, id ASC
+                LIMIT 1
+                """
+            )
+            result["oldest_waiting"] = await cur.fetchone()
+
+        async with conn.cursor(dict_rows=True) as cur:
+            await cur.execute(
+                """
+                SELECT
+                    assigned_admin_id AS admin_id,
+                    MAX(assigned_admin_username) AS admin_username,
+                    COUNT(*) AS tickets_count
+                FROM tickets
+                WHERE status IN ('open', 'in_work')
+                  AND assigned_admin_id IS NOT NULL
+                GROUP BY assigned_admin_id
+                ORDER BY tickets_count DESC, admin_id ASC
+                """
+            )
+            result["load"] = await cur.fetchall()
+
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT COUNT(*), COUNT(publish_error) FROM tickets WHERE published = 0"
+            )
+            total, failed = await cur.fetchone()
+            result["unpublished"] = int(total or 0) - int(failed or 0)
+            result["publish_failed"] = int(failed or 0)
+
+    return result
+
+
 async def get_user_active_tickets(user_id: int) -> List[Dict[str, Any]]:
     """Все активные (open / in_work) тикеты пользователя."""
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
                 SELECT id, topic, status, category, created_at
@@ -514,8 +1633,8 @@ async def get_user_active_tickets(user_id: int) -> List[Dict[str, Any]]:
 
 async def get_user_active_tickets_count(user_id: int) -> int:
     """Количество активных тикетов пользователя."""
-    assert POOL is not None
-    async with POOL.acquire() as conn:
+    backend = current_backend()
+    async with backend.acquire() as conn:
         async with conn.cursor() as cur:
             await cur.execute(
                 """
@@ -533,25 +1652,117 @@ async def set_ticket_assignee(
     ticket_id: int, admin_id: int, admin_username: Optional[str]
 ):
     """Назначить ответственного администратора за тикет."""
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor() as cur:
+    backend = current_backend()
+    events = [TicketAssigned(ticket_id, admin_id, admin_username)]
+    async with backend.acquire() as conn:
+        async with _outbox_transaction(conn, backend):
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    UPDATE tickets
+                    SET assigned_admin_id = %s,
+                        assigned_admin_username = %s
+                    WHERE id = %s
+                    """,
+                    (admin_id, admin_username, ticket_id),
+                )
+                await _write_outbox(cur, backend, events)
+    data_versions(backend).touch([ticket_id])
+    _publish_events(backend, events)
+
+
+async def auto_assign_ticket(
+    ticket_id: int, admin_id: int, admin_username: Optional[str]
+) -> bool:
+    """
+    Взять открытый тикет без исполнителя в работу за admin_id.
+    False — тикет уже кто-то взял (или закрыли) раньше.
+    """
+    backend = current_backend()
+    events = [TicketAssigned(ticket_id, admin_id, admin_username, auto=True)]
+    async with backend.acquire() as conn:
+        async with _outbox_transaction(conn, backend):
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    UPDATE tickets
+                    SET status = 'in_work',
+                        assigned_admin_id = %s,
+                        assigned_admin_username = %s,
+                        taken_at = COALESCE(taken_at, CURRENT_TIMESTAMP)
+                    WHERE id = %s
+                      AND status = 'open'
+                      AND assigned_admin_id IS NULL
+                    """,
+                    (admin_id, admin_username, ticket_id),
+                )
+                assigned = cur.rowcount > 0
+                if assigned:
+                    await _write_outbox(cur, backend, events)
+    if assigned:
+        data_versions(backend).touch([ticket_id])
+        _publish_events(backend, events)
+    return assigned
+
+
+async def get_active_assignments() -> List[Dict[str, Any]]:
+    """Активные тикеты с исполнителем: (id, category, assigned_admin_id)."""
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
-                UPDATE tickets
-                SET assigned_admin_id = %s,
-                    assigned_admin_username = %s
-                WHERE id = %s
+                SELECT id, category, assigned_admin_id
+                FROM tickets
+                WHERE status IN ('open', 'in_work')
+                  AND assigned_admin_id IS NOT NULL
+                """
+            )
+            rows = await cur.fetchall()
+            return rows
+
+
+async def get_admin_shifts() -> List[Dict[str, Any]]:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
+            await cur.execute(
+                """
+                SELECT admin_id, admin_username, on_shift, updated_at
+                FROM admin_shifts
+                ORDER BY admin_id
+                """
+            )
+            rows = await cur.fetchall()
+            return rows
+
+
+async def set_admin_shift(
+    admin_id: int, admin_username: Optional[str], on_shift: bool
+):
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            upsert = backend.upsert_clause(
+                ("admin_id",),
+                ("admin_username", "on_shift"),
+                touch_columns=("updated_at",),
+            )
+            await cur.execute(
+                f"""
+                INSERT INTO admin_shifts (admin_id, admin_username, on_shift)
+                VALUES (%s, %s, %s)
+                {upsert}
                 """,
-                (admin_id, admin_username, ticket_id),
+                (admin_id, admin_username, int(on_shift)),
             )
 
 
 async def get_user_profile(user_id: int) -> Optional[Dict[str, Any]]:
     """Get stored player profile by Telegram user id."""
-    assert POOL is not None
-    async with POOL.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
             await cur.execute(
                 """
                 SELECT user_id, game_nickname, created_at, updated_at
@@ -567,16 +1778,508 @@ async def get_user_profile(user_id: int) -> Optional[Dict[str, Any]]:
 
 async def upsert_user_profile(user_id: int, game_nickname: str):
     """Create or update player profile nickname."""
-    assert POOL is not None
-    async with POOL.acquire() as conn:
+    backend = current_backend()
+    async with backend.acquire() as conn:
         async with conn.cursor() as cur:
+            upsert = backend.upsert_clause(
+                ("user_id",), ("game_nickname",), touch_columns=("updated_at",)
+            )
             await cur.execute(
-                """
+                f"""
                 INSERT INTO user_profiles (user_id, game_nickname)
                 VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE
-                    game_nickname = VALUES(game_nickname),
-                    updated_at = CURRENT_TIMESTAMP
+                {upsert}
                 """,
                 (user_id, game_nickname),
             )
+
+
+async def get_expired_ticket_ids(
+    older_than_days: int,
+    *,
+    category: Optional[str] = None,
+    exclude_categories: Sequence[str] = (),
+    after_id: int = 0,
+    limit: int = 200,
+) -> List[int]:
+    """
+    ID закрытых тикетов, у которых истёк срок хранения (closed_at старше
+    older_than_days дней), по возрастанию id начиная после after_id.
+    category — только эта категория; exclude_categories — все, кроме этих
+    (политика по умолчанию для неперечисленных категорий).
+    """
+    backend = current_backend()
+    conditions = [
+        "status = 'closed'",
+        f"closed_at < {backend.since(older_than_days, 'DAY')}",
+        "id > %s",
+    ]
+    args: list[Any] = [after_id]
+    if category is not None:
+        conditions.append("category = %s")
+        args.append(category)
+    if exclude_categories:
+        conditions.append(
+            f"category NOT IN ({', '.join(['%s'] * len(exclude_categories))})"
+        )
+        args.extend(exclude_categories)
+    args.append(limit)
+
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"""
+                SELECT id
+                FROM tickets
+                WHERE {' AND '.join(conditions)}
+                ORDER BY id ASC
+                LIMIT %s
+                """,
+                args,
+            )
+            return [row[0] for row in await cur.fetchall()]
+
+
+async def count_ticket_messages(ticket_ids: Sequence[int]) -> int:
+    """Сколько сообщений (горячих и архивных) у этих тикетов."""
+    if not ticket_ids:
+        return 0
+
+    placeholders = ", ".join(["%s"] * len(ticket_ids))
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"SELECT COUNT(*) FROM ticket_messages WHERE ticket_id IN ({placeholders})",
+                tuple(ticket_ids),
+            )
+            hot = (await cur.fetchone())[0]
+            await cur.execute(
+                f"""
+                SELECT COALESCE(SUM(message_count), 0)
+                FROM ticket_messages_archive
+                WHERE ticket_id IN ({placeholders})
+                """,
+                tuple(ticket_ids),
+            )
+            archived = (await cur.fetchone())[0]
+            return int(hot) + int(archived)
+
+
+async def delete_ticket_messages_chunk(ticket_ids: Sequence[int], limit: int) -> int:
+    """
+    Удалить до limit сообщений этих тикетов, по возрастанию id.
+    Возвращает число удалённых строк; меньше limit — сообщений не осталось.
+    """
+    if not ticket_ids:
+        return 0
+
+    placeholders = ", ".join(["%s"] * len(ticket_ids))
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            # DELETE ... LIMIT непереносим (и запрещён в подзапросе IN в MySQL),
+            # поэтому сначала выбираем id пачки.
+            await cur.execute(
+                f"""
+                SELECT id
+                FROM ticket_messages
+                WHERE ticket_id IN ({placeholders})
+                ORDER BY id ASC
+                LIMIT %s
+                """,
+                (*ticket_ids, limit),
+            )
+            message_ids = [row[0] for row in await cur.fetchall()]
+            if not message_ids:
+                return 0
+
+            await cur.execute(
+                f"""
+                DELETE FROM ticket_messages
+                WHERE id IN ({', '.join(['%s'] * len(message_ids))})
+                """,
+                tuple(message_ids),
+            )
+    data_versions(backend).touch(ticket_ids, rows=False)
+    return len(message_ids)
+
+
+async def delete_tickets(ticket_ids: Sequence[int]) -> Dict[str, int]:
+    """
+    Удалить тикеты (их архив удаляется каскадно).
+    Горячие сообщения нужно удалить заранее через delete_ticket_messages_chunk,
+    чтобы каскад не превратился в одну огромную транзакцию.
+    Возвращает {"tickets": ..., "archived_messages": ...}.
+    """
+    if not ticket_ids:
+        return {"tickets": 0, "archived_messages": 0}
+
+    placeholders = ", ".join(["%s"] * len(ticket_ids))
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    f"""
+                    SELECT COALESCE(SUM(message_count), 0)
+                    FROM ticket_messages_archive
+                    WHERE ticket_id IN ({placeholders})
+                    """,
+                    tuple(ticket_ids),
+                )
+                archived = int((await cur.fetchone())[0])
+                deleted = await cur.execute(
+                    f"DELETE FROM tickets WHERE id IN ({placeholders})",
+                    tuple(ticket_ids),
+                )
+                events = [TicketDeleted(ticket_id) for ticket_id in ticket_ids]
+                await _write_outbox(cur, backend, events)
+    data_versions(backend).touch(ticket_ids)
+    _publish_events(backend, events)
+    return {"tickets": deleted, "archived_messages": archived}
+
+
+async def get_orphan_user_profile_ids(
+    older_than_days: int,
+    *,
+    after_id: int = 0,
+    limit: int = 500,
+) -> List[int]:
+    """
+    user_id профилей без единого тикета, которые не обновлялись
+    older_than_days дней (свежий /setnick без тикета не трогаем).
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"""
+                SELECT p.user_id
+                FROM user_profiles AS p
+                WHERE p.user_id > %s
+                  AND p.updated_at < {backend.since(older_than_days, 'DAY')}
+                  AND NOT EXISTS (
+                      SELECT 1 FROM tickets AS t WHERE t.user_id = p.user_id
+                  )
+                ORDER BY p.user_id ASC
+                LIMIT %s
+                """,
+                (after_id, limit),
+            )
+            return [row[0] for row in await cur.fetchall()]
+
+
+async def delete_user_profiles(user_ids: Sequence[int]) -> int:
+    """Удалить профили, если у пользователя так и не появилось тикетов."""
+    if not user_ids:
+        return 0
+
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            return await cur.execute(
+                f"""
+                DELETE FROM user_profiles
+                WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})
+                  AND NOT EXISTS (
+                      SELECT 1 FROM tickets AS t
+                      WHERE t.user_id = user_profiles.user_id
+                  )
+                """,
+                tuple(user_ids),
+            )
+
+
+async def count_broadcast_recipients(audience: str) -> int:
+    backend = current_backend()
+    if audience == BROADCAST_AUDIENCE_ACTIVE:
+        sql = """
+            SELECT COUNT(DISTINCT user_id) FROM tickets
+            WHERE status IN ('open', 'in_work')
+        """
+    else:
+        sql = """
+            SELECT COUNT(*) FROM (
+                SELECT user_id FROM tickets
+                UNION
+                SELECT user_id FROM user_profiles
+            ) AS recipients
+        """
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(sql)
+            row = await cur.fetchone()
+            return int(row[0]) if row else 0
+
+
+async def get_broadcast_recipients(
+    audience: str, after_user_id: int, limit: int
+) -> List[int]:
+    """
+    Следующая порция получателей по возрастанию user_id (курсор after_user_id).
+    Для all две выборки по индексам сливаются в Python — без UNION всей таблицы
+    на каждую порцию.
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            if audience == BROADCAST_AUDIENCE_ACTIVE:
+                await cur.execute(
+                    """
+                    SELECT DISTINCT user_id FROM tickets
+                    WHERE status IN ('open', 'in_work') AND user_id > %s
+                    ORDER BY user_id ASC
+                    LIMIT %s
+                    """,
+                    (after_user_id, limit),
+                )
+                return [row[0] for row in await cur.fetchall()]
+
+            await cur.execute(
+                """
+                SELECT DISTINCT user_id FROM tickets
+                WHERE user_id > %s
+                ORDER BY user_id ASC
+                LIMIT %s
+                """,
+                (after_user_id, limit),
+            )
+            user_ids = {row[0] for row in await cur.fetchall()}
+            await cur.execute(
+                """
+                SELECT user_id FROM user_profiles
+                WHERE user_id > %s
+                ORDER BY user_id ASC
+                LIMIT %s
+                """,
+                (after_user_id, limit),
+            )
+            user_ids.update(row[0] for row in await cur.fetchall())
+            return sorted(user_ids)[:limit]
+
+
+async def create_broadcast(
+    text: str, audience: str, created_by: int, total: int
+) -> int:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                INSERT INTO broadcasts (text, audience, created_by, total)
+                VALUES (%s, %s, %s, %s)
+                """,
+                (text, audience, created_by, total),
+            )
+            return cur.lastrowid
+
+
+async def get_broadcast(broadcast_id: int) -> Optional[Dict[str, Any]]:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
+            await cur.execute(
+                """
+                SELECT
+                    id, text, audience, status, created_by, total,
+                    cursor_user_id, delivered, blocked, failed,
+                    progress_message_id, created_at, started_at, finished_at
+                FROM broadcasts
+                WHERE id = %s
+                """,
+                (broadcast_id,),
+            )
+            return await cur.fetchone()
+
+
+async def get_running_broadcast_ids() -> List[int]:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT id FROM broadcasts WHERE status = 'running' ORDER BY id ASC"
+            )
+            return [row[0] for row in await cur.fetchall()]
+
+
+async def set_broadcast_status(
+    broadcast_id: int, status: str, from_status: str
+) -> bool:
+    """Перевести рассылку из from_status в status; False — статус уже другой."""
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                UPDATE broadcasts
+                SET status = %s,
+                    started_at = CASE WHEN %s = 'running'
+                        THEN CURRENT_TIMESTAMP ELSE started_at END,
+                    finished_at = CASE WHEN %s IN ('done', 'cancelled')
+                        THEN CURRENT_TIMESTAMP ELSE finished_at END
+                WHERE id = %s AND status = %s
+                """,
+                (status, status, status, broadcast_id, from_status),
+            )
+            return cur.rowcount > 0
+
+
+async def save_broadcast_progress(
+    broadcast_id: int,
+    *,
+    cursor_user_id: int,
+    delivered: int,
+    blocked: int,
+    failed: int,
+    progress_message_id: Optional[int],
+):
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                UPDATE broadcasts
+                SET cursor_user_id = %s,
+                    delivered = %s,
+                    blocked = %s,
+                    failed = %s,
+                    progress_message_id = %s
+                WHERE id = %s
+                """,
+                (
+                    cursor_user_id,
+                    delivered,
+                    blocked,
+                    failed,
+                    progress_message_id,
+                    broadcast_id,
+                ),
+            )
+
+
+async def acquire_lease(name: str, holder: str, ttl_seconds: int) -> Optional[int]:
+    """
+    Захватить аренду name, если она свободна или не продлевалась ttl_seconds.
+    Вернуть новый fencing token или None, если аренда у другого узла.
+    Время сравнивается по часам БД, а не узлов.
+    """
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"""
+                UPDATE bot_leases
+                SET holder = %s,
+                    token = token + 1,
+                    heartbeats = 0,
+                    renewed_at = CURRENT_TIMESTAMP
+                WHERE name = %s
+                  AND (holder = '' OR renewed_at < {backend.since(ttl_seconds, 'SECOND')})
+                """,
+                (holder, name),
+            )
+            if cur.rowcount == 0:
+                return None
+            await cur.execute(
+                "SELECT token FROM bot_leases WHERE name = %s AND holder = %s",
+                (name, holder),
+            )
+            row = await cur.fetchone()
+            return int(row[0]) if row else None
+
+
+async def renew_lease(name: str, holder: str, token: int) -> bool:
+    """Продлить свою аренду; False — её уже забрал другой узел."""
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            # heartbeats меняет строку всегда: MySQL не считает UPDATE без
+            # изменений затронувшим строку, даже если renewed_at в ту же секунду
+            await cur.execute(
+                """
+                UPDATE bot_leases
+                SET heartbeats = heartbeats + 1,
+                    renewed_at = CURRENT_TIMESTAMP
+                WHERE name = %s AND holder = %s AND token = %s
+                """,
+                (name, holder, token),
+            )
+            return cur.rowcount > 0
+
+
+async def release_lease(name: str, holder: str, token: int):
+    """Отдать аренду сразу, не дожидаясь истечения (штатная остановка)."""
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                UPDATE bot_leases
+                SET holder = ''
+                WHERE name = %s AND holder = %s AND token = %s
+                """,
+                (name, holder, token),
+            )
+
+
+async def get_dashboard_message_id(admin_chat_id: int) -> Optional[int]:
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT message_id FROM admin_dashboards WHERE admin_chat_id = %s",
+                (admin_chat_id,),
+            )
+            row = await cur.fetchone()
+            return int(row[0]) if row else None
+
+
+async def set_dashboard_message_id(admin_chat_id: int, message_id: int):
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            upsert = backend.upsert_clause(
+                ("admin_chat_id",), ("message_id",), touch_columns=("updated_at",)
+            )
+            await cur.execute(
+                f"""
+                INSERT INTO admin_dashboards (admin_chat_id, message_id)
+                VALUES (%s, %s)
+                {upsert}
+                """,
+                (admin_chat_id, message_id),
+            )
+
+
+async def get_webhook_batch(limit: int = 100) -> List[Dict[str, Any]]:
+    """Самые старые недоставленные события, в порядке появления."""
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor(dict_rows=True) as cur:
+            await cur.execute(
+                """
+                SELECT id, event_type, ticket_id, payload, created_at
+                FROM webhook_outbox
+                ORDER BY id ASC
+                LIMIT %s
+                """,
+                (limit,),
+            )
+            rows = await cur.fetchall()
+            return rows
+
+
+async def delete_webhook_events(event_ids: Sequence[int]) -> int:
+    if not event_ids:
+        return 0
+    backend = current_backend()
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            return await cur.execute(
+                f"""
+                DELETE FROM webhook_outbox
+                WHERE id IN ({', '.join(['%s'] * len(event_ids))})
+                """,
+                tuple(event_ids),
+            )
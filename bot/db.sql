@@ -16,10 +16,25 @@ CREATE TABLE IF NOT EXISTS `tickets` (
   `topic` VARCHAR(255) NOT NULL,
   `status` ENUM('open','in_work','closed') NOT NULL DEFAULT 'open',
 
+  -- форум с темой тикета (TICKET_CHATS), 0 — основной админ-чат ADMIN_CHAT_ID
+  `admin_chat_id` BIGINT NOT NULL DEFAULT 0,
   `admin_thread_id` BIGINT NULL,
+  -- 0 — тема и пост в админ-чате ещё не созданы (services/publisher.py),
+  -- photo_ids — file_id фото первого сообщения (JSON) для этого поста,
+  -- posted_photos — сколько из них уже отправлено альбомом (повтор публикации),
+  -- publish_error — ошибка, которую повтор не исправит (ждёт /republish)
+  `published` TINYINT(1) NOT NULL DEFAULT 1,
+  `photo_ids` TEXT NULL,
+  `posted_photos` SMALLINT UNSIGNED NOT NULL DEFAULT 0,
+  `publish_error` VARCHAR(255) NULL,
 
   `assigned_admin_id` BIGINT NULL,
   `assigned_admin_username` VARCHAR(64) NULL,
+  `taken_at` TIMESTAMP NULL DEFAULT NULL,
+  `first_admin_reply_at` TIMESTAMP NULL DEFAULT NULL,
+  `escalation_level` TINYINT UNSIGNED NOT NULL DEFAULT 0,
+  `last_message_at` TIMESTAMP NULL DEFAULT NULL,
+  `closed_at` TIMESTAMP NULL DEFAULT NULL,
 
   `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
@@ -28,8 +43,14 @@ CREATE TABLE IF NOT EXISTS `tickets` (
 
   KEY `idx_tickets_user_id` (`user_id`),
   KEY `idx_tickets_status` (`status`),
-  KEY `idx_tickets_thread` (`admin_thread_id`),
-  KEY `idx_tickets_assignee` (`assigned_admin_id`)
+  KEY `idx_tickets_chat_thread` (`admin_chat_id`, `admin_thread_id`),
+  KEY `idx_tickets_published` (`published`),
+  KEY `idx_tickets_assignee` (`assigned_admin_id`),
+  KEY `idx_tickets_status_closed` (`status`, `closed_at`),
+  KEY `idx_tickets_created` (`created_at`),
+  KEY `idx_tickets_status_created` (`status`, `created_at`),
+  KEY `idx_tickets_status_last_message` (`status`, `last_message_at`),
+  FULLTEXT KEY `ft_tickets_topic` (`topic`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Таблица сообщений тикета
@@ -46,6 +67,7 @@ CREATE TABLE IF NOT EXISTS `ticket_messages` (
 
   KEY `idx_msg_ticket_id` (`ticket_id`),
   KEY `idx_msg_created_at` (`created_at`),
+  FULLTEXT KEY `ft_msg_text` (`text`),
 
   CONSTRAINT `fk_ticket_messages_ticket`
     FOREIGN KEY (`ticket_id`) REFERENCES `tickets` (`id`)
@@ -53,6 +75,23 @@ CREATE TABLE IF NOT EXISTS `ticket_messages` (
     ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Архив сообщений давно закрытых тикетов: одна строка на тикет,
+-- payload — zlib-сжатый JSON [[id, sender, text, created_at], ...]
+CREATE TABLE IF NOT EXISTS `ticket_messages_archive` (
+  `ticket_id` BIGINT UNSIGNED NOT NULL,
+  `message_count` INT UNSIGNED NOT NULL,
+  `last_message_id` BIGINT UNSIGNED NOT NULL,
+  `payload` LONGBLOB NOT NULL,
+  `archived_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+  PRIMARY KEY (`ticket_id`),
+
+  CONSTRAINT `fk_ticket_messages_archive_ticket`
+    FOREIGN KEY (`ticket_id`) REFERENCES `tickets` (`id`)
+    ON DELETE CASCADE
+    ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- User profiles (nickname on game server)
 CREATE TABLE IF NOT EXISTS `user_profiles` (
   `user_id` BIGINT NOT NULL,
@@ -62,3 +101,114 @@ CREATE TABLE IF NOT EXISTS `user_profiles` (
 
   PRIMARY KEY (`user_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Смены админов: кому автоматически назначаются новые тикеты
+CREATE TABLE IF NOT EXISTS `admin_shifts` (
+  `admin_id` BIGINT NOT NULL,
+  `admin_username` VARCHAR(64) NULL,
+  `on_shift` TINYINT(1) NOT NULL DEFAULT 0,
+  `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+  PRIMARY KEY (`admin_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Рассылки игрокам (/broadcast): курсор и счётчики для продолжения после рестарта
+CREATE TABLE IF NOT EXISTS `broadcasts` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  `text` TEXT NOT NULL,
+  `audience` VARCHAR(16) NOT NULL,
+  `status` ENUM('draft','running','done','cancelled') NOT NULL DEFAULT 'draft',
+  `created_by` BIGINT NOT NULL,
+  `total` INT UNSIGNED NOT NULL DEFAULT 0,
+  `cursor_user_id` BIGINT NOT NULL DEFAULT 0,
+  `delivered` INT UNSIGNED NOT NULL DEFAULT 0,
+  `blocked` INT UNSIGNED NOT NULL DEFAULT 0,
+  `failed` INT UNSIGNED NOT NULL DEFAULT 0,
+  `progress_message_id` BIGINT NULL DEFAULT NULL,
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `started_at` TIMESTAMP NULL DEFAULT NULL,
+  `finished_at` TIMESTAMP NULL DEFAULT NULL,
+
+  PRIMARY KEY (`id`),
+  KEY `idx_broadcasts_status` (`status`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Аренда роли лидера: polling ведёт только узел, продлевающий аренду.
+-- token растёт при каждой смене владельца (fencing token).
+CREATE TABLE IF NOT EXISTS `bot_leases` (
+  `name` VARCHAR(64) NOT NULL,
+  `holder` VARCHAR(128) NOT NULL DEFAULT '',
+  `token` BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  `heartbeats` BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  `renewed_at` DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00',
+
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT IGNORE INTO `bot_leases` (`name`) VALUES ('poller');
+
+-- Закреплённое сообщение-дашборд в админ-чате (services/dashboard.py).
+CREATE TABLE IF NOT EXISTS `admin_dashboards` (
+  `admin_chat_id` BIGINT NOT NULL,
+  `message_id` BIGINT NOT NULL,
+  `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+  PRIMARY KEY (`admin_chat_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- События тикетов, ещё не доставленные на WEBHOOK_URL (services/webhooks.py).
+CREATE TABLE IF NOT EXISTS `webhook_outbox` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  `event_type` VARCHAR(32) NOT NULL,
+  `ticket_id` BIGINT UNSIGNED NOT NULL,
+  `payload` TEXT NOT NULL,
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Сообщения игрока, пришедшие, пока тема тикета ещё не создана:
+-- services/publisher.py копирует их в тему следом за постом о тикете.
+CREATE TABLE IF NOT EXISTS `ticket_relay_queue` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  `ticket_id` BIGINT UNSIGNED NOT NULL,
+  `chat_id` BIGINT NOT NULL,
+  `message_id` BIGINT NOT NULL,
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+  PRIMARY KEY (`id`),
+
+  KEY `idx_relay_ticket_id` (`ticket_id`),
+
+  CONSTRAINT `fk_ticket_relay_queue_ticket`
+    FOREIGN KEY (`ticket_id`) REFERENCES `tickets` (`id`)
+    ON DELETE CASCADE
+    ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Применённые миграции (storage/mysql.py: MIGRATIONS).
+-- Схема выше уже содержит их изменения, поэтому версии отмечены сразу.
+CREATE TABLE IF NOT EXISTS `schema_migrations` (
+  `version` INTEGER NOT NULL,
+  `name` VARCHAR(128) NOT NULL,
+  `applied_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+  PRIMARY KEY (`version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT IGNORE INTO `schema_migrations` (`version`, `name`) VALUES
+  (1, 'fulltext_search'),
+  (2, 'ticket_messages_archive'),
+  (3, 'admin_shifts'),
+  (4, 'sla_timestamps'),
+  (5, 'ticket_escalation'),
+  (6, 'ticket_last_message_at'),
+  (7, 'broadcasts'),
+  (8, 'leader_lease'),
+  (9, 'ticket_admin_chat'),
+  (10, 'ticket_publication'),
+  (11, 'admin_dashboard'),
+  (12, 'webhook_outbox'),
+  (13, 'ticket_publication_progress'),
+  (14, 'ticket_relay_queue'),
+  (15, 'ticket_publish_error');
@@ -2,8 +2,11 @@
 
 from .user import user_router
 from .admin import admin_router
+from .history import history_router
+from .search import search_router
+from .broadcast import broadcast_router
 
 
 
 def get_routers():
-    return [user_router, admin_router]
+    return [user_router, admin_router, history_router, search_router, broadcast_router]
@@ -1,6 +1,8 @@
 import asyncio
 
 import logging
+import os
+from datetime import datetime, timedelta
 
 from aiogram import Router, F, Bot
 from aiogram.filters import Command
@@ -10,16 +12,18 @@ from aiogram.types import (
     InlineKeyboardMarkup,
     InlineKeyboardButton,
     InputMediaPhoto,
+    FSInputFile,
 )
 
 from config import Settings
 from db import (
+    close_ticket,
+    data_versions,
     set_ticket_status,
     add_ticket_message,
     get_open_tickets,
     get_ticket_by_thread_id,
     get_ticket,
-    get_ticket_with_messages,
     set_ticket_assignee,
     get_ticket_stats_overview,
     get_ticket_stats_by_assignee,
@@ -28,9 +32,36 @@ from db import (
     get_tickets_by_assignee,
     set_ticket_thread,
     get_user_profile,
+    mark_first_admin_reply,
+    reset_ticket_publish_error,
+    ticket_exists,
 )
 
-from handlers.user import CATEGORY_TITLES
+from handlers.common import (
+    ACK_FAIL_EMOJI,
+    ACK_OK_EMOJI,
+    ACK_REACTION,
+    category_title,
+    format_duration,
+    set_reaction,
+)
+from handlers.history import send_ticket_history
+from services.assignment import AssignmentEngine
+from services.dashboard import DashboardService
+from services.export import EXPORT_FORMATS, TELEGRAM_DOCUMENT_LIMIT, export_tickets
+from services.notifications import TicketNotifier
+from services.publisher import TicketPublisher
+from services.retention import RetentionService
+from services.sla import LatencyStats, SlaReport, build_sla_report
+from services.templates import (
+    MY_TICKET_ROW,
+    TELEGRAM_CAPTION_LIMIT,
+    TICKET_ROW,
+    TICKET_TAKEN_NOTICE,
+    truncate_utf16,
+)
+from services.ticket_chats import stored_chat_id, ticket_chat_id
+from services.view_cache import ViewCache
 
 
 admin_router = Router()
@@ -40,6 +71,17 @@ PHOTO_ALBUM_FLUSH_DELAY = 4.0
 ADMIN_PHOTO_ALBUMS: dict[tuple[int, int, str], dict] = {}
 ADMIN_PHOTO_ALBUM_IGNORED: set[tuple[int, int, str]] = set()
 
+# Экспорты идут по одному: каждый держит соединение БД и временный файл.
+EXPORT_LOCK = asyncio.Lock()
+EXPORT_USAGE = (
+    "Использование:\n"
+    "/export ID [jsonl|html|txt] — один тикет;\n"
+    "/export user USER_ID [формат] — все тикеты игрока;\n"
+    "/export from ГГГГ-ММ-ДД [ГГГГ-ММ-ДД] [формат] — тикеты, "
+    "созданные в диапазоне дат (конец включительно).\n"
+    "Формат по умолчанию — txt."
+)
+
 
 # ==========================
 #  Хелперы
@@ -104,22 +146,7 @@ def truncate_message(
     suffix: str = "\n\n…обрезано.",
 ) -> str:
     """Ограничить длину текста под лимит Telegram."""
-    if len(text) <= limit:
-        return text
-    return text[:limit] + suffix
-
-
-def category_title(category: str | None) -> str:
-    return CATEGORY_TITLES.get(category or "other", "📦 Другое")
-
-
-def status_title(status: str) -> str:
-    status_map = {
-        "open": "🟢 Открыт",
-        "in_work": "🟡 В работе",
-        "closed": "⚪ Закрыт",
-    }
-    return status_map.get(status, status)
+    return truncate_utf16(text, limit, suffix)
 
 
 def panel_status_header(status: str) -> str:
@@ -138,6 +165,27 @@ def assignee_title(row: dict) -> str:
     return "исполнитель: не назначен"
 
 
+def format_ticket_row(row: dict, mark: str = "") -> str:
+    return TICKET_ROW.cached_text(
+        ticket_id=row["id"],
+        topic=row["topic"],
+        category=category_title(row.get("category")),
+        user_id=row["user_id"],
+        status=row["status"],
+        assignee=assignee_title(row),
+        mark=mark,
+    )
+
+
+def unpublished_mark(row: dict) -> str:
+    """Тема тикета ещё не создана в админ-чате (services/publisher.py)."""
+    if row.get("published", 1):
+        return ""
+    if row.get("publish_error"):
+        return f" ❗ ошибка публикации, /republish {row['id']}"
+    return " ⏳ тема ещё не создана"
+
+
 async def build_top_admin_lines(
     assignee_rows: list[dict],
     settings: Settings,
@@ -158,9 +206,56 @@ async def build_top_admin_lines(
     return lines
 
 
+def format_latency_line(label: str, stats: LatencyStats) -> str:
+    first_p50, first_p90 = stats.first_response_pct()
+    close_p50, close_p90 = stats.time_to_close_pct()
+    return (
+        f"• {label} ({stats.tickets}): "
+        f"ответ {format_duration(first_p50)} / {format_duration(first_p90)}, "
+        f"закрытие {format_duration(close_p50)} / {format_duration(close_p90)}\n"
+    )
+
+
+async def build_sla_lines(
+    report: SlaReport,
+    settings: Settings,
+    bot: Bot,
+    admins_limit: int = 5,
+) -> list[str]:
+    if report.total.tickets == 0:
+        return [f"\n⏱ Скорость ответа: за {report.days} дн. тикетов не было.\n"]
+
+    lines = [
+        f"\n⏱ Скорость ответа за {report.days} дн. (p50 / p90):\n",
+        format_latency_line("Все тикеты", report.total),
+    ]
+
+    lines.append("\nПо категориям:\n")
+    for category, stats in sorted(
+        report.by_category.items(), key=lambda item: -item[1].tickets
+    ):
+        lines.append(format_latency_line(category_title(category), stats))
+
+    if report.by_admin:
+        lines.append("\nПо исполнителям:\n")
+        top_admins = sorted(
+            report.by_admin.items(), key=lambda item: -item[1].tickets
+        )[:admins_limit]
+        for admin_id, stats in top_admins:
+            admin_title = await safe_get_admin_title(
+                bot,
+                settings,
+                admin_id,
+                report.admin_usernames.get(admin_id) or "",
+            )
+            lines.append(format_latency_line(admin_title, stats))
+    return lines
+
+
 async def build_stats_text(settings: Settings, bot: Bot) -> str:
     overview = await get_ticket_stats_overview()
     assignee_rows = await get_ticket_stats_by_assignee(limit=5)
+    sla_report = await build_sla_report()
     by_status = overview["by_status"]
 
     lines: list[str] = []
@@ -169,35 +264,41 @@ async def build_stats_text(settings: Settings, bot: Bot) -> str:
     lines.append(f"• 🟢 Открытых: {by_status.get('open', 0)}\n")
     lines.append(f"• 🟡 В работе: {by_status.get('in_work', 0)}\n")
     lines.append(f"• ⚪ Закрытых: {by_status.get('closed', 0)}\n")
+    if overview["unpublished"]:
+        lines.append(f"• ⏳ Ждут создания темы: {overview['unpublished']}\n")
+    if overview["publish_failed"]:
+        lines.append(
+            f"• ❗ Не опубликованы из-за ошибки: {overview['publish_failed']} "
+            "(см. /panel, повтор — /republish ID)\n"
+        )
     lines.append("\n")
     lines.append(f"За последние 24 часа: {overview['last_24h']}\n")
     lines.append(f"За последние 7 дней: {overview['last_7d']}\n")
     lines.extend(await build_top_admin_lines(assignee_rows, settings, bot))
+    lines.extend(await build_sla_lines(sla_report, settings, bot))
 
-    return "".join(lines)
+    return truncate_message("".join(lines))
 
 
 def format_status_rows(status: str, rows: list[dict]) -> str:
     lines = [panel_status_header(status) + "\n\n"]
     for row in rows:
-        cat = category_title(row.get("category"))
-        assignee = assignee_title(row)
-        lines.append(
-            f"#{row['id']} — {row['topic']} "
-            f"[{cat}] "
-            f"(user_id: {row['user_id']}, status: {row['status']}, {assignee})\n"
-        )
+        lines.append(format_ticket_row(row, unpublished_mark(row)))
     return truncate_message("".join(lines))
 
 
 def format_my_rows(admin_title: str, rows: list[dict]) -> str:
     lines = [f"👤 Тикеты в работе у {admin_title}:\n\n"]
     for row in rows:
-        cat = category_title(row.get("category"))
         lines.append(
-            f"#{row['id']} — {row['topic']} "
-            f"[{cat}] "
-            f"(status: {row['status']}, user_id: {row['user_id']})\n"
+            MY_TICKET_ROW.cached_text(
+                ticket_id=row["id"],
+                topic=row["topic"],
+                category=category_title(row.get("category")),
+                status=row["status"],
+                user_id=row["user_id"],
+                mark=unpublished_mark(row),
+            )
         )
     return truncate_message("".join(lines))
 
@@ -235,6 +336,56 @@ def parse_ticket_id_from_command(text: str | None) -> int | None:
         return None
 
 
+def parse_export_command(text: str | None) -> dict | None:
+    """
+    Разбор /export: возвращает параметры export_tickets (+ fmt и имя файла)
+    или None, если аргументы некорректны.
+    """
+    args = (text or "").split()[1:]
+    fmt = "txt"
+    if args and args[-1].lower() in EXPORT_FORMATS:
+        fmt = args.pop().lower()
+    if not args:
+        return None
+
+    try:
+        if args[0].lower() == "user" and len(args) == 2:
+            user_id = int(args[1])
+            return {
+                "fmt": fmt,
+                "user_id": user_id,
+                "filename_stem": f"user_{user_id}",
+                "title": f"Тикеты игрока {user_id}",
+            }
+
+        if args[0].lower() == "from" and len(args) in (2, 3):
+            created_from = datetime.strptime(args[1], "%Y-%m-%d")
+            last_day = (
+                datetime.strptime(args[2], "%Y-%m-%d") if len(args) == 3 else created_from
+            )
+            if last_day < created_from:
+                return None
+            return {
+                "fmt": fmt,
+                "created_from": created_from,
+                "created_to": last_day + timedelta(days=1),
+                "filename_stem": f"tickets_{args[1]}_{last_day:%Y-%m-%d}",
+                "title": f"Тикеты с {args[1]} по {last_day:%Y-%m-%d}",
+            }
+
+        if len(args) == 1:
+            ticket_id = int(args[0])
+            return {
+                "fmt": fmt,
+                "ticket_id": ticket_id,
+                "filename_stem": f"ticket_{ticket_id}",
+                "title": f"Тикет #{ticket_id}",
+            }
+    except ValueError:
+        return None
+    return None
+
+
 def format_optional(value: object | None) -> str:
     if value is None:
         return "не указано"
@@ -253,6 +404,7 @@ def format_bool(value: bool | None) -> str:
 
 async def resolve_ticket_for_admin_command(
     message: Message,
+    settings: Settings,
     command_name: str,
 ) -> dict | None:
     ticket_id = parse_ticket_id_from_command(message.text)
@@ -276,7 +428,9 @@ async def resolve_ticket_for_admin_command(
         )
         return None
 
-    ticket = await get_ticket_by_thread_id(thread_id)
+    ticket = await get_ticket_by_thread_id(
+        thread_id, stored_chat_id(settings, message.chat.id)
+    )
     if ticket is None:
         await message.reply("Для этой темы тикет не найден.")
         return None
@@ -366,41 +520,6 @@ async def build_ticket_user_info_text(
     return truncate_message("\n".join(lines))
 
 
-def format_ticket_history(ticket: dict, messages: list[dict]) -> str:
-    username = ticket.get("username") or "без username"
-    category = category_title(ticket.get("category"))
-    status = status_title(ticket["status"])
-
-    assignee_username = ticket.get("assigned_admin_username")
-    if assignee_username:
-        assignee = f"Исполнитель: @{assignee_username}"
-    else:
-        assignee = "Исполнитель: не назначен"
-
-    header = (
-        f"📄 Тикет #{ticket['id']} — {status}\n"
-        f"Категория: {category}\n"
-        f"От: @{username} (user_id: {ticket['user_id']})\n"
-        f"{assignee}\n"
-        f"Тема: {ticket['topic']}\n"
-        f"Создан: {ticket['created_at']}\n\n"
-        f"История сообщений:\n"
-    )
-
-    lines = [header]
-    if not messages:
-        lines.append("Пока нет сообщений.")
-    else:
-        for msg in messages:
-            who = "👤 Игрок" if msg["sender"] == "user" else "🛡 Админ"
-            lines.append(f"\n{who} [{msg['created_at']}]:\n{msg['text']}\n")
-
-    return truncate_message(
-        "".join(lines),
-        suffix="\n\n…обрезано, слишком длинная история.",
-    )
-
-
 # ==========================
 #  Команды для админов
 # ==========================
@@ -411,7 +530,7 @@ async def admin_help(message: Message, settings: Settings):
     """
     Подсказка по командам для админов.
     """
-    if message.chat.id != settings.admin_chat_id:
+    if message.chat.id not in settings.admin_chat_ids:
         await message.answer("Эта команда доступна только в админском чате.")
         return
 
@@ -422,14 +541,31 @@ async def admin_help(message: Message, settings: Settings):
         "открытые / в работе / закрытые / мои / статистика / архив);\n"
         "• /tickets — список всех открытых и «в работе» тикетов;\n"
         "• /stats — общая статистика по тикетам;\n"
+        "• /dashboard — закрепить в чате дашборд тикетов, который "
+        "обновляется сам (DASHBOARD_INTERVAL_SECONDS);\n"
         "• /close <ID> — закрыть тикет по ID;\n"
+        "• /republish <ID> — повторить публикацию тикета, тему которого "
+        "не удалось создать (после исправления прав бота или TICKET_CHATS);\n"
         "• /ticket <ID> — вывести историю конкретного тикета;\n"
         "• /userinfo <ID> — показать Telegram-профиль автора тикета;\n"
+        "• /search <запрос> — поиск по темам и сообщениям тикетов "
+        "(фильтры: status:, cat:, user:, from:, to:);\n"
+        "• /export <ID> — полная переписка тикета файлом "
+        "(также /export user <user_id> и /export from <дата> [дата]);\n"
+        "• /retention — пробный прогон очистки по срокам хранения "
+        "(/retention run — удалить);\n"
+        "• /shift on|off — встать на смену / уйти со смены "
+        "(/shift — кто на смене и их нагрузка);\n"
+        "• /broadcast [active|all] <текст> — рассылка игрокам "
+        "(сначала предпросмотр, отправка по кнопке);\n"
         "• /adminhelp — эта справка.\n\n"
         "Работа с темами тикетов:\n"
-        "• При создании тикета бот создаёт тему в этом чате;\n"
+        "• При создании тикета бот создаёт тему в этом чате "
+        "или в форуме её категории (TICKET_CHATS);\n"
         "• В сообщении о новом тикете есть кнопка «Взять тикет в работу» — "
         "назначает исполнителя и ставит статус «в работе»;\n"
+        "• Админам на смене новые тикеты назначаются автоматически "
+        "(наименее загруженному или по кругу — см. ASSIGNMENT_STRATEGY);\n"
         "• Всё, что вы пишете в теме (текст + медиа), бот отправляет игроку в ЛС;\n"
         "• Кнопка «Закрыть тикет» закрывает тикет и тему, игрок получает уведомление.\n\n"
         "Архивация:\n"
@@ -446,15 +582,38 @@ async def admin_help_alias(message: Message, settings: Settings):
     В админ-чате /help показывает админскую справку,
     в других местах — игнорируется (в ЛС обрабатывается user.py).
     """
-    if message.chat.id != settings.admin_chat_id:
+    if message.chat.id not in settings.admin_chat_ids:
         return
     await admin_help(message, settings)
 
 
+TICKET_NOT_FOUND = "Тикет с таким ID не найден."
+TICKET_ALREADY_CLOSED = "Этот тикет уже закрыт."
+
+
+async def close_ticket_from_admin_chat(
+    ticket_id: int, note: str, notifier: TicketNotifier
+) -> str | None:
+    """
+    Закрытие тикета из админ-чата (/close и кнопка): запись в БД, затем
+    уведомление игрока и темы тикета. Уведомляет только тот, чей UPDATE
+    закрыл тикет, поэтому при двух одновременных закрытиях игрок получит
+    одно сообщение. Возвращает причину отказа или None, если тикет закрыт.
+    """
+    if await close_ticket(ticket_id, note):
+        await notifier.ticket_closed(ticket_id)
+        return None
+    if await ticket_exists(ticket_id):
+        return TICKET_ALREADY_CLOSED
+    return TICKET_NOT_FOUND
+
+
 @admin_router.message(Command("close"))
-async def admin_close_ticket(message: Message, settings: Settings, bot: Bot):
+async def admin_close_ticket(
+    message: Message, settings: Settings, notifier: TicketNotifier
+):
     """Закрытие тикета по команде /close ID + закрытие темы."""
-    if message.chat.id != settings.admin_chat_id:
+    if message.chat.id not in settings.admin_chat_ids:
         return
 
     parts = message.text.split()
@@ -468,113 +627,80 @@ async def admin_close_ticket(message: Message, settings: Settings, bot: Bot):
         await message.reply("ID тикета должен быть числом.")
         return
 
-    ticket = await get_ticket(ticket_id)
-    if not ticket:
-        await message.reply("Тикет с таким ID не найден.")
+    error = await close_ticket_from_admin_chat(
+        ticket_id, f"[Тикет закрыт админом {message.from_user.id}]", notifier
+    )
+    if error:
+        await message.reply(error)
         return
 
-    if ticket["status"] == "closed":
-        await message.reply("Этот тикет уже закрыт.")
-        return
+    await message.reply(f"Тикет #{ticket_id} закрыт.")
 
-    user_id = ticket["user_id"]
-    thread_id = ticket["admin_thread_id"]
 
-    await set_ticket_status(ticket_id, "closed")
-    await add_ticket_message(
-        ticket_id, "admin", f"[Тикет закрыт админом {message.from_user.id}]"
-    )
-
-    try:
-        await bot.send_message(
-            chat_id=user_id,
-            text=(
-                f"✅ Твой тикет #{ticket_id} был закрыт администрацией.\n"
-                f"Если проблема не решена — создай новый тикет."
-            ),
-        )
-        LOGGER.info(
-            "📤 Пользователь %s уведомлен о закрытии тикета #%s",
-            user_id,
-            ticket_id,
-        )
-    except Exception:
-        LOGGER.exception(
-            "❌ Не удалось уведомить пользователя о закрытии тикета #%s (user_id=%s)",
-            ticket_id,
-            user_id,
-        )
+@admin_router.message(Command("republish"))
+async def admin_republish_ticket(
+    message: Message, settings: Settings, publisher: TicketPublisher
+):
+    """Повторить публикацию тикета, остановленную ошибкой (/republish ID)."""
+    if message.chat.id not in settings.admin_chat_ids:
+        return
 
-    if thread_id:
-        try:
-            await bot.close_forum_topic(
-                chat_id=settings.admin_chat_id,
-                message_thread_id=thread_id,
-            )
-            LOGGER.info("🧵 Тема тикета #%s закрыта (thread_id=%s)", ticket_id, thread_id)
-        except Exception:
-            LOGGER.exception(
-                "❌ Не удалось закрыть тему тикета #%s (thread_id=%s)",
-                ticket_id,
-                thread_id,
-            )
+    parts = message.text.split()
+    if len(parts) < 2:
+        await message.reply("Использование: /republish ID")
+        return
 
-        try:
-            await bot.send_message(
-                chat_id=settings.admin_chat_id,
-                message_thread_id=thread_id,
-                text="🔒 Тикет закрыт, тема закрыта.",
-            )
-            LOGGER.info(
-                "📣 В тему тикета #%s отправлено сообщение о закрытии",
-                ticket_id,
-            )
-        except Exception:
-            LOGGER.exception(
-                "❌ Не удалось отправить сообщение о закрытии в тему тикета #%s",
-                ticket_id,
-            )
+    try:
+        ticket_id = int(parts[1])
+    except ValueError:
+        await message.reply("ID тикета должен быть числом.")
+        return
 
-    await message.reply(f"Тикет #{ticket_id} закрыт.")
+    if not await reset_ticket_publish_error(ticket_id):
+        await message.reply(f"Тикет #{ticket_id} не ждёт повторной публикации.")
+        return
 
+    # у лидера — сразу, в остальных процессах тикет найдёт опрос БД
+    publisher.enqueue(ticket_id)
+    LOGGER.info(
+        "🔁 Админ %s повторил публикацию тикета #%s", message.from_user.id, ticket_id
+    )
+    await message.reply(f"Тикет #{ticket_id} снова в очереди на публикацию.")
 
-@admin_router.message(Command("tickets"))
-async def admin_list_open_tickets(message: Message, settings: Settings):
-    """Список открытых и 'в работе' тикетов."""
-    if message.chat.id != settings.admin_chat_id:
-        return
 
+async def render_open_tickets_view() -> str:
     rows = await get_open_tickets()
     if not rows:
-        await message.answer("Нет открытых тикетов.")
-        return
+        return "Нет открытых тикетов."
 
     lines = ["Открытые/в работе тикеты:\n\n"]
     for row in rows:
-        cat_title = CATEGORY_TITLES.get(row.get("category", "other"), "📦 Другое")
         thread_info = (
-            f"(thread_id: {row['admin_thread_id']})"
+            f" (thread_id: {row['admin_thread_id']})"
             if row["admin_thread_id"]
-            else "(без темы)"
+            else " (без темы)"
         )
-        assignee = row.get("assigned_admin_username")
-        if assignee:
-            assignee_str = f"исполнитель: @{assignee}"
-        else:
-            assignee_str = "исполнитель: не назначен"
+        lines.append(format_ticket_row(row, thread_info))
+    return "".join(lines)
 
-        lines.append(
-            f"#{row['id']} — {row['topic']} "
-            f"[{cat_title}] "
-            f"(user_id: {row['user_id']}, status: {row['status']}, {assignee_str}) {thread_info}\n"
-        )
 
-    await message.answer("".join(lines))
+@admin_router.message(Command("tickets"))
+async def admin_list_open_tickets(
+    message: Message, settings: Settings, view_cache: ViewCache
+):
+    """Список открытых и 'в работе' тикетов."""
+    if message.chat.id not in settings.admin_chat_ids:
+        return
+
+    text = await view_cache.get_or_render(
+        ("open",), data_versions().rows, render_open_tickets_view
+    )
+    await message.answer(text)
 
 @admin_router.message(Command("panel"))
 async def admin_panel(message: Message, settings: Settings):
     """Панель управления тикетами: /panel."""
-    if message.chat.id != settings.admin_chat_id:
+    if message.chat.id not in settings.admin_chat_ids:
         return
 
     kb = InlineKeyboardMarkup(
@@ -622,19 +748,41 @@ async def admin_stats(
     bot: Bot,
 ):
     """Статистика по тикетам: /stats."""
-    if message.chat.id != settings.admin_chat_id:
+    if message.chat.id not in settings.admin_chat_ids:
         return
 
     await message.answer(await build_stats_text(settings, bot))
 
 
+@admin_router.message(Command("dashboard"))
+async def admin_dashboard(
+    message: Message,
+    settings: Settings,
+    bot: Bot,
+    dashboard: DashboardService,
+):
+    """Новый закреплённый дашборд вместо прежнего: /dashboard."""
+    if message.chat.id != settings.admin_chat_id:
+        if message.chat.id in settings.admin_chat_ids:
+            await message.answer("Дашборд живёт в основном админ-чате.")
+        return
+    if not dashboard.enabled:
+        await message.answer(
+            "Дашборд выключен: задайте DASHBOARD_INTERVAL_SECONDS в настройках."
+        )
+        return
+
+    await dashboard.publish(bot)
+
+
 @admin_router.message(Command("ticket"))
 async def admin_show_ticket(
     message: Message,
     settings: Settings,
+    view_cache: ViewCache,
 ):
     """Показ истории тикета по ID для админов: /ticket 4"""
-    if message.chat.id != settings.admin_chat_id:
+    if message.chat.id not in settings.admin_chat_ids:
         return
 
     ticket_id = parse_ticket_id_from_command(message.text)
@@ -645,12 +793,151 @@ async def admin_show_ticket(
         await message.reply("ID тикета должен быть числом.")
         return
 
-    data = await get_ticket_with_messages(ticket_id)
-    if not data:
+    ticket = await get_ticket(ticket_id)
+    if not ticket:
         await message.reply("Тикет с таким ID не найден.")
         return
 
-    await message.reply(format_ticket_history(data["ticket"], data["messages"]))
+    await send_ticket_history(message, ticket, "admin", view_cache)
+
+
+@admin_router.message(Command("export"))
+async def admin_export_tickets(message: Message, settings: Settings):
+    """
+    Полная выгрузка переписки файлом: /export 42, /export user 123,
+    /export from 2024-05-01 2024-05-31 html.
+    """
+    if message.chat.id not in settings.admin_chat_ids:
+        return
+
+    params = parse_export_command(message.text)
+    if params is None:
+        await message.reply(EXPORT_USAGE)
+        return
+
+    if EXPORT_LOCK.locked():
+        await message.reply("⏳ Уже идёт другой экспорт, подожди немного.")
+        return
+
+    async with EXPORT_LOCK:
+        fmt = params.pop("fmt")
+        try:
+            result = await export_tickets(fmt, **params)
+        except Exception as e:
+            LOGGER.exception("❌ Ошибка экспорта (%s): %s", message.text, e)
+            await message.reply("Не удалось сформировать экспорт, подробности в логах.")
+            return
+
+        try:
+            if result.tickets == 0:
+                await message.reply("По этому запросу тикетов не найдено.")
+                return
+            if result.size > TELEGRAM_DOCUMENT_LIMIT:
+                await message.reply(
+                    f"Файл получился слишком большим ({result.size // (1024 * 1024)} МБ), "
+                    "Telegram принимает от бота до 50 МБ. Сузь диапазон."
+                )
+                return
+
+            await message.reply_document(
+                FSInputFile(result.path, filename=result.filename),
+                caption=(
+                    f"📦 Экспорт: тикетов {result.tickets}, "
+                    f"сообщений {result.messages}."
+                ),
+            )
+            LOGGER.info(
+                "📦 Экспорт %s: %s тикетов, %s сообщений, %s байт",
+                result.filename,
+                result.tickets,
+                result.messages,
+                result.size,
+            )
+        finally:
+            os.remove(result.path)
+
+
+@admin_router.message(Command("retention"))
+async def admin_retention(
+    message: Message,
+    settings: Settings,
+    bot: Bot,
+    retention: RetentionService,
+):
+    """
+    /retention — пробный прогон очистки по срокам хранения (только отчёт),
+    /retention run — удалить по-настоящему.
+    """
+    # отчёт и прогресс очистки идут в основной админ-чат
+    if message.chat.id != settings.admin_chat_id:
+        return
+
+    if not retention.enabled:
+        await message.reply("Сроки хранения не заданы (RETENTION_DAYS в .env).")
+        return
+    if retention.running:
+        await message.reply("⏳ Очистка уже идёт, прогресс — в сообщении выше.")
+        return
+
+    parts = (message.text or "").split()
+    dry_run = not (len(parts) > 1 and parts[1].lower() == "run")
+    await message.reply(
+        f"Сроки хранения: {retention.describe_policies()}.\n"
+        + ("Запускаю пробный прогон…" if dry_run else "Запускаю очистку…")
+    )
+
+    report = await retention.sweep(bot, dry_run=dry_run)
+    if report.tickets == 0 and report.profiles == 0:
+        await message.reply("Под сроки хранения сейчас ничего не попадает.")
+
+
+@admin_router.message(Command("shift"))
+async def admin_shift(
+    message: Message,
+    settings: Settings,
+    assignment: AssignmentEngine,
+):
+    """
+    /shift on — получать новые тикеты автоматически,
+    /shift off — уйти со смены, /shift — кто сейчас на смене.
+    """
+    if message.chat.id not in settings.admin_chat_ids:
+        return
+
+    parts = (message.text or "").split()
+    action = parts[1].lower() if len(parts) > 1 else ""
+    if action in ("on", "off"):
+        on_shift = action == "on"
+        user = message.from_user
+        await assignment.set_shift(user.id, user.username, on_shift)
+        if on_shift:
+            await message.reply(
+                "🟢 Ты на смене: новые тикеты будут назначаться автоматически.\n"
+                f"Сейчас у тебя активных тикетов: {assignment.load_of(user.id)}."
+            )
+        else:
+            await message.reply(
+                "⚪ Смена завершена: новые тикеты больше не назначаются. "
+                "Уже назначенные остаются за тобой."
+            )
+        return
+    if action:
+        await message.reply("Использование: /shift on | /shift off | /shift")
+        return
+
+    overview = await assignment.shift_overview()
+    if not overview:
+        await message.reply(
+            "Сейчас никого нет на смене — новые тикеты ждут ручного взятия.\n"
+            "Встать на смену: /shift on"
+        )
+        return
+
+    lines = ["👥 На смене (активных тикетов):"]
+    lines.extend(f"• {admin.title} — {load}" for admin, load in overview)
+    if assignment.max_load > 0:
+        lines.append(f"\nЛимит на админа: {assignment.max_load}")
+    await message.reply("\n".join(lines))
 
 
 @admin_router.message(Command("userinfo"))
@@ -666,10 +953,10 @@ async def admin_show_ticket_user_info(
     - /userinfo ID
     - /userinfo внутри темы тикета
     """
-    if message.chat.id != settings.admin_chat_id:
+    if message.chat.id not in settings.admin_chat_ids:
         return
 
-    ticket = await resolve_ticket_for_admin_command(message, "/userinfo")
+    ticket = await resolve_ticket_for_admin_command(message, settings, "/userinfo")
     if ticket is None:
         return
 
@@ -683,92 +970,27 @@ async def admin_show_ticket_user_info(
 
 @admin_router.callback_query(F.data.startswith("close_ticket:"))
 async def close_ticket_callback(
-    callback: CallbackQuery,
-    settings: Settings,
-    bot: Bot,
+    callback: CallbackQuery, settings: Settings, notifier: TicketNotifier
 ):
     """Обработка нажатия инлайн-кнопки 'Закрыть тикет'."""
     if callback.message is None:
         return
 
-    if callback.message.chat.id != settings.admin_chat_id:
+    if callback.message.chat.id not in settings.admin_chat_ids:
         await callback.answer("Не тот чат.", show_alert=True)
         return
 
-    data = callback.data or ""
-    try:
-        _, ticket_id_str = data.split(":", 1)
-        ticket_id = int(ticket_id_str)
-    except (ValueError, IndexError):
+    ticket_id = parse_callback_ticket_id(callback.data, "close_ticket:")
+    if ticket_id is None:
         await callback.answer("Некорректный ID тикета.", show_alert=True)
         return
 
-    ticket = await get_ticket(ticket_id)
-    if not ticket:
-        await callback.answer("Тикет не найден.", show_alert=True)
-        return
-
-    if ticket["status"] == "closed":
-        await callback.answer("Этот тикет уже закрыт.", show_alert=False)
-        return
-
-    user_id = ticket["user_id"]
-    thread_id = ticket["admin_thread_id"]
-
-    await set_ticket_status(ticket_id, "closed")
-    await add_ticket_message(
-        ticket_id, "admin", f"[Тикет закрыт через кнопку #{callback.from_user.id}]"
+    error = await close_ticket_from_admin_chat(
+        ticket_id, f"[Тикет закрыт через кнопку #{callback.from_user.id}]", notifier
     )
-
-    try:
-        await bot.send_message(
-            chat_id=user_id,
-            text=(
-                f"✅ Твой тикет #{ticket_id} был закрыт администрацией.\n"
-                f"Если проблема не решена — создай новый тикет."
-            ),
-        )
-        LOGGER.info(
-            "📤 Пользователь %s уведомлен о закрытии тикета #%s",
-            user_id,
-            ticket_id,
-        )
-    except Exception:
-        LOGGER.exception(
-            "❌ Не удалось уведомить пользователя о закрытии тикета #%s (user_id=%s)",
-            ticket_id,
-            user_id,
-        )
-
-    if thread_id:
-        try:
-            await bot.close_forum_topic(
-                chat_id=settings.admin_chat_id,
-                message_thread_id=thread_id,
-            )
-            LOGGER.info("🧵 Тема тикета #%s закрыта (thread_id=%s)", ticket_id, thread_id)
-        except Exception:
-            LOGGER.exception(
-                "❌ Не удалось закрыть тему тикета #%s (thread_id=%s)",
-                ticket_id,
-                thread_id,
-            )
-
-        try:
-            await bot.send_message(
-                chat_id=settings.admin_chat_id,
-                message_thread_id=thread_id,
-                text="🔒 Тикет закрыт, тема закрыта.",
-            )
-            LOGGER.info(
-                "📣 В тему тикета #%s отправлено сообщение о закрытии",
-                ticket_id,
-            )
-        except Exception:
-            LOGGER.exception(
-                "❌ Не удалось отправить сообщение о закрытии в тему тикета #%s",
-                ticket_id,
-            )
+    if error:
+        await callback.answer(error, show_alert=error == TICKET_NOT_FOUND)
+        return
 
     try:
         old_text = callback.message.text or ""
@@ -798,7 +1020,7 @@ async def take_ticket_callback(
     if callback.message is None:
         return
 
-    if callback.message.chat.id != settings.admin_chat_id:
+    if callback.message.chat.id not in settings.admin_chat_ids:
         await callback.answer("Не тот чат.", show_alert=True)
         return
 
@@ -845,9 +1067,11 @@ async def take_ticket_callback(
 
     try:
         await bot.send_message(
-            chat_id=settings.admin_chat_id,
+            chat_id=ticket_chat_id(settings, ticket),
             message_thread_id=ticket["admin_thread_id"],
-            text=f"🛠 Тикет #{ticket_id} взят в работу админом: {admin_title}.",
+            **TICKET_TAKEN_NOTICE.render(
+                ticket=f"#{ticket_id}", admin=(admin_title, admin_id)
+            ).as_kwargs(),
         )
         LOGGER.info(
             "📣 Отправлено сообщение в тему о взятии тикета #%s в работу",
@@ -884,8 +1108,10 @@ async def take_ticket_callback(
         mark_line = f"\n\n🛠 В работе: {admin_title}"
         new_text = old_text if "🛠 В работе:" in old_text else old_text + mark_line
 
+        # дописываем в конец, поэтому entities поста (жирный ID, ссылка) не сдвигаются
         await callback.message.edit_text(
             new_text,
+            entities=callback.message.entities,
             reply_markup=build_close_ticket_markup(ticket_id),
         )
     except Exception:
@@ -899,16 +1125,25 @@ async def take_ticket_callback(
 # ==========================
 
 
-async def handle_panel_status_action(callback: CallbackQuery, status: str):
-    if callback.message is None:
-        return
-
+async def render_status_view(status: str) -> str:
     rows = await get_tickets_by_status(status, limit=20)
     if not rows:
-        await callback.message.answer("Нет тикетов с таким статусом.")
+        return "Нет тикетов с таким статусом."
+    return format_status_rows(status, rows)
+
+
+async def handle_panel_status_action(
+    callback: CallbackQuery, status: str, view_cache: ViewCache
+):
+    if callback.message is None:
         return
 
-    await callback.message.answer(format_status_rows(status, rows))
+    text = await view_cache.get_or_render(
+        ("status", status),
+        data_versions().rows,
+        lambda: render_status_view(status),
+    )
+    await callback.message.answer(text)
 
 
 async def handle_panel_my_action(
@@ -971,7 +1206,7 @@ async def handle_panel_archive_action(
 
         try:
             await bot.delete_forum_topic(
-                chat_id=settings.admin_chat_id,
+                chat_id=ticket_chat_id(settings, row),
                 message_thread_id=thread_id,
             )
             success += 1
@@ -999,12 +1234,13 @@ async def admin_panel_callback(
     callback: CallbackQuery,
     settings: Settings,
     bot: Bot,
+    view_cache: ViewCache,
 ):
     """Обработка кнопок панели /panel."""
     if callback.message is None:
         return
 
-    if callback.message.chat.id != settings.admin_chat_id:
+    if callback.message.chat.id not in settings.admin_chat_ids:
         await callback.answer("Не тот чат.", show_alert=True)
         return
 
@@ -1012,7 +1248,7 @@ async def admin_panel_callback(
     action = action_data.split(":", 1)[1] if ":" in action_data else ""
 
     if action in ("open", "in_work", "closed"):
-        await handle_panel_status_action(callback, action)
+        await handle_panel_status_action(callback, action, view_cache)
         await callback.answer()
         return
 
@@ -1063,6 +1299,39 @@ def default_admin_media_text(message: Message, media_type: str) -> str:
     return text_map.get(media_type, "[Медиа от администрации]")
 
 
+async def acknowledge_admin(
+    bot: Bot,
+    settings: Settings,
+    *,
+    chat_id: int,
+    thread_id: int | None,
+    message_id: int,
+    text: str,
+    ok: bool = True,
+    reply: bool = True,
+):
+    """
+    Итог пересылки игроку в теме тикета. В режиме ACK_MODE_ADMIN=reaction
+    успех — только реакция на сообщение админа; ошибка — реакция и текст.
+    """
+    if settings.ack_mode_admin == ACK_REACTION:
+        reacted = await set_reaction(
+            bot,
+            chat_id,
+            message_id,
+            ACK_OK_EMOJI if ok else ACK_FAIL_EMOJI,
+        )
+        if reacted and ok:
+            return
+
+    send_kwargs = {"chat_id": chat_id, "text": text}
+    if thread_id:
+        send_kwargs["message_thread_id"] = thread_id
+    if reply:
+        send_kwargs["reply_to_message_id"] = message_id
+    await bot.send_message(**send_kwargs)
+
+
 async def flush_admin_photo_album(
     key: tuple[int, int, str],
     *,
@@ -1096,7 +1365,7 @@ async def flush_admin_photo_album(
     ticket_was_open = payload["ticket_was_open"]
     caption_text = payload["caption"]
     base_text = caption_text or f"[Альбом фото от администрации: {len(photos)} шт.]"
-    user_caption = caption_text or None
+    user_caption = truncate_utf16(caption_text, TELEGRAM_CAPTION_LIMIT) or None
 
     try:
         if ticket_was_open:
@@ -1109,7 +1378,7 @@ async def flush_admin_photo_album(
                 if idx == 0 and chunk_idx == 0:
                     if user_caption:
                         media_group.append(
-                            InputMediaPhoto(media=file_id, caption=user_caption[:1024])
+                            InputMediaPhoto(media=file_id, caption=user_caption)
                         )
                     else:
                         media_group.append(InputMediaPhoto(media=file_id))
@@ -1118,10 +1387,15 @@ async def flush_admin_photo_album(
             await bot.send_media_group(chat_id=user_id, media=media_group)
 
         await add_ticket_message(ticket_id, "admin", base_text)
-        await bot.send_message(
-            chat_id=settings.admin_chat_id,
-            message_thread_id=thread_id,
+        await mark_first_admin_reply(ticket_id)
+        await acknowledge_admin(
+            bot,
+            settings,
+            chat_id=key[0],
+            thread_id=thread_id,
+            message_id=payload["message_id"],
             text=f"Ответ (альбом из {len(photos)} фото) отправлен пользователю.",
+            reply=False,
         )
         LOGGER.info(
             "📤 Альбом администратора отправлен пользователю (ticket_id=%s, user_id=%s, photos=%s)",
@@ -1137,13 +1411,18 @@ async def flush_admin_photo_album(
             user_id,
             len(photos),
         )
-        await bot.send_message(
-            chat_id=settings.admin_chat_id,
-            message_thread_id=thread_id,
+        await acknowledge_admin(
+            bot,
+            settings,
+            chat_id=key[0],
+            thread_id=thread_id,
+            message_id=payload["message_id"],
             text=(
                 "Не удалось отправить альбом пользователю: "
                 f"{exc!r}"
             ),
+            ok=False,
+            reply=False,
         )
 
 
@@ -1169,6 +1448,7 @@ async def handle_admin_photo_album_message(
             "user_id": ticket["user_id"],
             "thread_id": thread_id,
             "ticket_was_open": ticket["status"] == "open",
+            "message_id": message.message_id,
             "photos": [],
             "caption": "",
             "last_update": asyncio.get_running_loop().time(),
@@ -1262,14 +1542,16 @@ async def admin_thread_message(
     settings: Settings,
 ):
     """Любое сообщение админа внутри темы тикета."""
-    if message.chat.id != settings.admin_chat_id:
+    if message.chat.id not in settings.admin_chat_ids:
         return
 
     thread_id = message.message_thread_id
     if not thread_id:
         return
 
-    ticket = await get_ticket_by_thread_id(thread_id)
+    ticket = await get_ticket_by_thread_id(
+        thread_id, stored_chat_id(settings, message.chat.id)
+    )
     if not ticket:
         return
 
@@ -1303,6 +1585,7 @@ async def admin_thread_message(
             caption=caption,
             media_type=media_type,
         )
+        await mark_first_admin_reply(ticket_id)
 
         LOGGER.info(
             "📨 Ответ администратора отправлен пользователю (ticket_id=%s, user_id=%s, media_type=%s)",
@@ -1310,7 +1593,14 @@ async def admin_thread_message(
             user_id,
             media_type or "text",
         )
-        await message.reply("Ответ отправлен пользователю.")
+        await acknowledge_admin(
+            bot,
+            settings,
+            chat_id=message.chat.id,
+            thread_id=message.message_thread_id,
+            message_id=message.message_id,
+            text="Ответ отправлен пользователю.",
+        )
     except Exception as exc:
         LOGGER.exception(
             "❌ Не удалось отправить ответ администратора пользователю "
@@ -1318,4 +1608,12 @@ async def admin_thread_message(
             ticket_id,
             user_id,
         )
-        await message.reply(f"Не удалось отправить сообщение пользователю: {exc!r}")
+        await acknowledge_admin(
+            bot,
+            settings,
+            chat_id=message.chat.id,
+            thread_id=message.message_thread_id,
+            message_id=message.message_id,
+            text=f"Не удалось отправить сообщение пользователю: {exc!r}",
+            ok=False,
+        )
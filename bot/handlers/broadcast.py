@@ -0,0 +1,173 @@
+import logging
+
+from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command
+from aiogram.types import (
+    Message,
+    CallbackQuery,
+    InlineKeyboardMarkup,
+    InlineKeyboardButton,
+)
+
+from config import Settings
+from db import (
+    BROADCAST_AUDIENCE_ALL,
+    count_broadcast_recipients,
+    create_broadcast,
+    set_broadcast_status,
+)
+from services.templates import truncate_utf16, utf16_len
+from services.broadcast import (
+    BROADCAST_AUDIENCES,
+    BROADCAST_CALLBACK_PREFIX,
+    BroadcastService,
+)
+from services.sender import GLOBAL_RATE
+
+
+broadcast_router = Router()
+LOGGER = logging.getLogger("support_bot.broadcast")
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+PREVIEW_TEXT_LIMIT = 1500
+
+BROADCAST_USAGE = (
+    "Использование: /broadcast [active|all] текст\n"
+    "active — игрокам с открытыми тикетами и тикетами в работе, "
+    "all — всем, кто когда-либо писал боту (по умолчанию).\n"
+    "Сначала бот покажет предпросмотр и число получателей, "
+    "отправка — только после подтверждения кнопкой."
+)
+
+
+def parse_broadcast_command(text: str | None) -> tuple[str, str] | None:
+    """/broadcast [active|all] текст -> (аудитория, текст) или None."""
+    parts = (text or "").split(maxsplit=1)
+    if len(parts) < 2:
+        return None
+    body = parts[1].strip()
+    first, _, rest = body.partition(" ")
+    if first.lower() in BROADCAST_AUDIENCES:
+        audience, body = first.lower(), rest.strip()
+    else:
+        audience = BROADCAST_AUDIENCE_ALL
+    if not body:
+        return None
+    return audience, body
+
+
+def build_confirm_keyboard(broadcast_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="📢 Отправить",
+                    callback_data=f"{BROADCAST_CALLBACK_PREFIX}:send:{broadcast_id}",
+                ),
+                InlineKeyboardButton(
+                    text="✖ Отмена",
+                    callback_data=f"{BROADCAST_CALLBACK_PREFIX}:cancel:{broadcast_id}",
+                ),
+            ]
+        ]
+    )
+
+
+# ==========================
+#  Команда и кнопки
+# ==========================
+
+
+@broadcast_router.message(Command("broadcast"))
+async def admin_broadcast(
+    message: Message,
+    settings: Settings,
+    broadcasts: BroadcastService,
+):
+    """Пробный прогон рассылки: предпросмотр, число получателей, кнопки."""
+    # прогресс рассылки показывается в основном админ-чате
+    if message.chat.id != settings.admin_chat_id:
+        return
+
+    parsed = parse_broadcast_command(message.text)
+    if parsed is None:
+        await message.reply(BROADCAST_USAGE)
+        return
+
+    audience, text = parsed
+    player_text = broadcasts.format_player_text(text)
+    if utf16_len(player_text) > TELEGRAM_MESSAGE_LIMIT:
+        await message.reply(
+            f"Текст слишком длинный: {utf16_len(player_text)} символов "
+            f"с заголовком, Telegram допускает {TELEGRAM_MESSAGE_LIMIT}."
+        )
+        return
+
+    total = await count_broadcast_recipients(audience)
+    if total == 0:
+        await message.reply("Получателей для такой рассылки нет.")
+        return
+
+    user = message.from_user
+    broadcast_id = await create_broadcast(text, audience, user.id if user else 0, total)
+    await message.reply(
+        f"📢 Рассылка #{broadcast_id} — предпросмотр\n"
+        f"Получатели: {BROADCAST_AUDIENCES[audience]}, ~{total}.\n"
+        f"Отправка займёт примерно {max(1, round(total / GLOBAL_RATE / 60))} мин.\n\n"
+        "Игроки получат:\n"
+        f"{truncate_utf16(player_text, PREVIEW_TEXT_LIMIT)}",
+        reply_markup=build_confirm_keyboard(broadcast_id),
+    )
+
+
+@broadcast_router.callback_query(F.data.startswith(f"{BROADCAST_CALLBACK_PREFIX}:"))
+async def broadcast_callback(
+    callback: CallbackQuery,
+    settings: Settings,
+    broadcasts: BroadcastService,
+):
+    if callback.message is None or callback.message.chat.id != settings.admin_chat_id:
+        await callback.answer()
+        return
+
+    parts = (callback.data or "").split(":")
+    if len(parts) != 3 or not parts[2].isdigit():
+        await callback.answer()
+        return
+    action, broadcast_id = parts[1], int(parts[2])
+
+    who = callback.from_user.username or callback.from_user.id
+    if action == "send":
+        if not await set_broadcast_status(broadcast_id, "running", "draft"):
+            await callback.answer("Рассылка уже запущена или отменена.", show_alert=True)
+            return
+        broadcasts.enqueue(broadcast_id)
+        LOGGER.info("📢 Рассылка #%s запущена (%s)", broadcast_id, who)
+        note = f"▶ Запущена ({who}), прогресс — в следующем сообщении."
+    elif action == "cancel":
+        if not await set_broadcast_status(broadcast_id, "cancelled", "draft"):
+            await callback.answer("Рассылка уже запущена или отменена.", show_alert=True)
+            return
+        note = f"✖ Отменена ({who})."
+    elif action == "stop":
+        if not await set_broadcast_status(broadcast_id, "cancelled", "running"):
+            await callback.answer("Рассылка уже завершена.", show_alert=True)
+            return
+        LOGGER.info("📢 Рассылка #%s остановлена (%s)", broadcast_id, who)
+        await callback.answer("Останавливаю после текущей порции…")
+        return
+    else:
+        await callback.answer()
+        return
+
+    try:
+        await callback.message.edit_text(
+            truncate_utf16(
+                f"{callback.message.text or ''}\n\n{note}", TELEGRAM_MESSAGE_LIMIT
+            ),
+            reply_markup=None,
+        )
+    except TelegramBadRequest as e:
+        LOGGER.warning("⚠️ Не удалось обновить предпросмотр рассылки: %s", e)
+    await callback.answer()
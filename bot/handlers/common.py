@@ -0,0 +1,83 @@
+"""Общие справочники для хендлеров игрока и админов."""
+
+import logging
+
+from aiogram import Bot
+from aiogram.types import ReactionTypeEmoji
+
+LOGGER = logging.getLogger("support_bot.common")
+
+CATEGORY_TITLES = {
+    "donate": "💳 Донат",
+    "bug": "🛠 Баг / тех. проблема",
+    # "complaint": "⚖️ Жалоба",
+    # "question": "❓ Вопрос",
+    "other": "📦 Другое",
+}
+
+STATUS_TITLES = {
+    "open": "🟢 Открыт",
+    "in_work": "🟡 В работе",
+    "closed": "⚪ Закрыт",
+}
+
+ACK_REACTION = "reaction"
+# Реакции в Telegram — только из фиксированного набора эмодзи (✅ и ⚠️ в нём нет)
+ACK_OK_EMOJI = "👍"
+ACK_FAIL_EMOJI = "👎"
+
+
+def category_title(category: str | None) -> str:
+    return CATEGORY_TITLES.get(category or "other", "📦 Другое")
+
+
+def status_title(status: str) -> str:
+    return STATUS_TITLES.get(status, status)
+
+
+def topic_link(chat_id: int, thread_id: int | None) -> str | None:
+    """Ссылка на тему форума супергруппы (t.me/c/...), если она есть."""
+    raw_chat_id = str(chat_id)
+    if not thread_id or not raw_chat_id.startswith("-100"):
+        return None
+    return f"https://t.me/c/{raw_chat_id[4:]}/{thread_id}"
+
+
+def format_duration(seconds: int | None) -> str:
+    """Длительность кратко: 45 с, 12 мин, 3 ч 5 мин, 2 д 4 ч."""
+    if seconds is None:
+        return "—"
+    if seconds < 60:
+        return f"{seconds} с"
+    minutes = seconds // 60
+    if minutes < 60:
+        return f"{minutes} мин"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours} ч {minutes} мин" if minutes else f"{hours} ч"
+    days, hours = divmod(hours, 24)
+    return f"{days} д {hours} ч" if hours else f"{days} д"
+
+
+async def set_reaction(bot: Bot, chat_id: int, message_id: int | None, emoji: str) -> bool:
+    """Поставить реакцию на сообщение. False — не вышло, подтверждаем текстом."""
+    if not message_id:
+        return False
+    try:
+        await bot.set_message_reaction(
+            chat_id=chat_id,
+            message_id=message_id,
+            reaction=[ReactionTypeEmoji(emoji=emoji)],
+        )
+        return True
+    except Exception as e:
+        LOGGER.warning("⚠️ Не удалось поставить реакцию (chat_id=%s): %s", chat_id, e)
+        return False
+
+
+def bot_scoped(bot: Bot, key: int) -> tuple[int, int]:
+    """
+    Ключ состояния игрока в памяти процесса: с TENANTS один процесс
+    обслуживает несколько ботов, и один игрок может писать каждому из них.
+    """
+    return bot.id, key
@@ -0,0 +1,295 @@
+import logging
+
+from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import (
+    Message,
+    CallbackQuery,
+    InlineKeyboardMarkup,
+    InlineKeyboardButton,
+)
+
+from config import Settings
+from db import data_versions, get_ticket, get_ticket_messages_page
+from handlers.common import category_title, status_title
+from services.templates import (
+    HISTORY_HEADER_ADMIN,
+    HISTORY_HEADER_PLAYER,
+    TELEGRAM_TEXT_LIMIT,
+    truncate_utf16,
+    utf16_len,
+)
+from services.view_cache import ViewCache
+
+
+history_router = Router()
+LOGGER = logging.getLogger("support_bot.history")
+
+# Сколько сообщений тикета читаем из БД за один шаг листания.
+HISTORY_FETCH_LIMIT = 30
+HISTORY_CALLBACK_PREFIX = "hist"
+
+DIRECTION_LATEST = "l"
+DIRECTION_OLDER = "o"
+DIRECTION_NEWER = "n"
+
+
+# ==========================
+#  Рендер страницы
+# ==========================
+
+
+def format_history_header(ticket: dict, viewer: str) -> str:
+    values = {
+        "ticket_id": ticket["id"],
+        "status": status_title(ticket["status"]),
+        "category": category_title(ticket.get("category")),
+        "topic": ticket["topic"],
+        "created_at": ticket["created_at"],
+    }
+    if viewer != "admin":
+        return HISTORY_HEADER_PLAYER.text(**values)
+
+    assignee_username = ticket.get("assigned_admin_username")
+    return HISTORY_HEADER_ADMIN.text(
+        **values,
+        username=ticket.get("username") or "без username",
+        user_id=ticket["user_id"],
+        assignee=f"@{assignee_username}" if assignee_username else "не назначен",
+    )
+
+
+def format_history_message(msg: dict, viewer: str) -> str:
+    if viewer == "admin":
+        who = "👤 Игрок" if msg["sender"] == "user" else "🛡 Админ"
+    else:
+        who = "Ты" if msg["sender"] == "user" else "Администрация"
+    return f"\n{who} [{msg['created_at']}]:\n{msg['text']}\n"
+
+
+def fit_page(
+    blocks: list[str],
+    budget: int,
+    *,
+    from_end: bool,
+) -> tuple[int, int]:
+    """
+    Подобрать непрерывный диапазон блоков [start, end), влезающий в budget.
+    from_end=True — набираем от последнего блока к первому (листание назад),
+    иначе от первого к последнему (листание вперёд).
+    """
+    order = range(len(blocks) - 1, -1, -1) if from_end else range(len(blocks))
+    used = 0
+    taken = 0
+    for index in order:
+        size = utf16_len(blocks[index])
+        if used + size > budget:
+            break
+        used += size
+        taken += 1
+
+    if from_end:
+        return len(blocks) - taken, len(blocks)
+    return 0, taken
+
+
+def build_history_keyboard(
+    ticket_id: int,
+    first_id: int | None,
+    last_id: int | None,
+    *,
+    has_older: bool,
+    has_newer: bool,
+) -> InlineKeyboardMarkup | None:
+    buttons = []
+    if has_older and first_id is not None:
+        buttons.append(
+            InlineKeyboardButton(
+                text="◀ Раньше",
+                callback_data=(
+                    f"{HISTORY_CALLBACK_PREFIX}:{ticket_id}:"
+                    f"{DIRECTION_OLDER}:{first_id}"
+                ),
+            )
+        )
+    if has_newer and last_id is not None:
+        buttons.append(
+            InlineKeyboardButton(
+                text="Позже ▶",
+                callback_data=(
+                    f"{HISTORY_CALLBACK_PREFIX}:{ticket_id}:"
+                    f"{DIRECTION_NEWER}:{last_id}"
+                ),
+            )
+        )
+    if has_newer:
+        buttons.append(
+            InlineKeyboardButton(
+                text="⏭",
+                callback_data=(
+                    f"{HISTORY_CALLBACK_PREFIX}:{ticket_id}:{DIRECTION_LATEST}:0"
+                ),
+            )
+        )
+
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+
+async def render_history_page(
+    ticket: dict,
+    viewer: str,
+    direction: str = DIRECTION_LATEST,
+    anchor: int = 0,
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    """
+    Страница истории тикета, подобранная под лимит сообщения Telegram.
+    Из БД читается не больше HISTORY_FETCH_LIMIT + 1 сообщений —
+    лишнее сообщение нужно только чтобы понять, есть ли что-то дальше.
+    """
+    ticket_id = ticket["id"]
+    fetch_limit = HISTORY_FETCH_LIMIT + 1
+
+    if direction == DIRECTION_NEWER:
+        messages = await get_ticket_messages_page(
+            ticket_id, after_id=anchor, limit=fetch_limit
+        )
+    elif direction == DIRECTION_OLDER:
+        messages = await get_ticket_messages_page(
+            ticket_id, before_id=anchor, limit=fetch_limit
+        )
+    else:
+        messages = await get_ticket_messages_page(ticket_id, limit=fetch_limit)
+
+    more_in_direction = len(messages) > HISTORY_FETCH_LIMIT
+    if more_in_direction:
+        # лишнее сообщение — самое дальнее от якоря
+        if direction == DIRECTION_NEWER:
+            messages = messages[:HISTORY_FETCH_LIMIT]
+        else:
+            messages = messages[1:]
+
+    header = format_history_header(ticket, viewer)
+    # запас под подпись страницы, она зависит от результата подбора
+    budget = TELEGRAM_TEXT_LIMIT - utf16_len(header) - 64
+
+    blocks = [format_history_message(msg, viewer) for msg in messages]
+    from_end = direction != DIRECTION_NEWER
+    start, end = fit_page(blocks, budget, from_end=from_end)
+    if start == end and blocks:
+        # одно сообщение длиннее лимита — показываем его обрезанным
+        index = len(blocks) - 1 if from_end else 0
+        blocks[index] = truncate_utf16(blocks[index], budget)
+        start, end = index, index + 1
+
+    page = messages[start:end]
+    if direction == DIRECTION_NEWER:
+        has_older = True
+        has_newer = more_in_direction or end < len(messages)
+    else:
+        has_older = more_in_direction or start > 0
+        has_newer = direction == DIRECTION_OLDER
+
+    if not page:
+        if direction == DIRECTION_LATEST:
+            body = "Пока нет сообщений."
+        else:
+            body = "Здесь сообщений нет."
+            has_newer = True
+        text = header + body
+        first_id = last_id = None
+    else:
+        first_id, last_id = page[0]["id"], page[-1]["id"]
+        text = header + "".join(blocks[start:end])
+        if has_older or has_newer:
+            text += f"\n— сообщения #{first_id}…#{last_id}"
+
+    keyboard = build_history_keyboard(
+        ticket_id,
+        first_id,
+        last_id,
+        has_older=has_older,
+        has_newer=has_newer,
+    )
+    return text, keyboard
+
+
+async def render_history_view(
+    view_cache: ViewCache,
+    ticket: dict,
+    viewer: str,
+    direction: str = DIRECTION_LATEST,
+    anchor: int = 0,
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    """render_history_page, повторные просмотры неизменившегося тикета — из кэша."""
+    return await view_cache.get_or_render(
+        ("history", ticket["id"], viewer, direction, anchor),
+        data_versions().ticket(ticket["id"]),
+        lambda: render_history_page(ticket, viewer, direction, anchor),
+    )
+
+
+async def send_ticket_history(
+    message: Message, ticket: dict, viewer: str, view_cache: ViewCache
+):
+    """Ответить первой (самой свежей) страницей истории тикета."""
+    text, keyboard = await render_history_view(view_cache, ticket, viewer)
+    await message.reply(text, reply_markup=keyboard)
+
+
+def parse_history_callback(data: str | None) -> tuple[int, str, int] | None:
+    parts = (data or "").split(":")
+    if len(parts) != 4 or parts[0] != HISTORY_CALLBACK_PREFIX:
+        return None
+    _, ticket_id, direction, anchor = parts
+    if direction not in (DIRECTION_LATEST, DIRECTION_OLDER, DIRECTION_NEWER):
+        return None
+    try:
+        return int(ticket_id), direction, int(anchor)
+    except ValueError:
+        return None
+
+
+# ==========================
+#  Листание
+# ==========================
+
+
+@history_router.callback_query(F.data.startswith(f"{HISTORY_CALLBACK_PREFIX}:"))
+async def history_page_callback(
+    callback: CallbackQuery, settings: Settings, view_cache: ViewCache
+):
+    parsed = parse_history_callback(callback.data)
+    if parsed is None or callback.message is None:
+        await callback.answer("Некорректные данные.", show_alert=True)
+        return
+
+    ticket_id, direction, anchor = parsed
+    ticket = await get_ticket(ticket_id)
+    if not ticket:
+        await callback.answer("Тикет не найден.", show_alert=True)
+        return
+
+    # в чате админов историю видят все, в личке — только автор тикета
+    if callback.message.chat.id in settings.admin_chat_ids:
+        viewer = "admin"
+    elif ticket["user_id"] == callback.from_user.id:
+        viewer = "user"
+    else:
+        await callback.answer("У тебя нет доступа к этому тикету.", show_alert=True)
+        return
+
+    text, keyboard = await render_history_view(
+        view_cache, ticket, viewer, direction, anchor
+    )
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            LOGGER.warning(
+                "⚠️ Не удалось обновить страницу истории тикета #%s: %s",
+                ticket_id,
+                e,
+            )
+    await callback.answer()
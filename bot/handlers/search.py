@@ -0,0 +1,228 @@
+import logging
+import secrets
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command
+from aiogram.types import (
+    Message,
+    CallbackQuery,
+    InlineKeyboardMarkup,
+    InlineKeyboardButton,
+)
+
+from config import Settings
+from db import search_tickets
+from handlers.common import CATEGORY_TITLES, STATUS_TITLES, category_title, topic_link
+
+
+search_router = Router()
+LOGGER = logging.getLogger("support_bot.search")
+
+SEARCH_PAGE_SIZE = 8
+SEARCH_CALLBACK_PREFIX = "srch"
+# Сколько последних поисков помнить для листания (запрос не влезает в callback_data).
+SEARCH_STATES_LIMIT = 200
+TOPIC_PREVIEW_LIMIT = 80
+
+SEARCH_USAGE = (
+    "Использование: /search запрос [фильтры]\n"
+    "Запрос: слово, слово*, \"фраза\", -исключение.\n"
+    "Фильтры: status:open|in_work|closed, cat:donate|bug|other, "
+    "user:<user_id>, from:ГГГГ-ММ-ДД, to:ГГГГ-ММ-ДД.\n"
+    "Пример: /search донат* -возврат cat:donate from:2024-05-01"
+)
+
+STATUS_ICONS = {"open": "🟢", "in_work": "🟡", "closed": "⚪"}
+
+
+@dataclass
+class SearchState:
+    query: str
+    filters: dict
+    # cursors[i] — ключ (score, id), с которого начинается страница i
+    cursors: list[tuple[float, int] | None] = field(default_factory=lambda: [None])
+
+
+SEARCH_STATES: "OrderedDict[str, SearchState]" = OrderedDict()
+
+
+# ==========================
+#  Хелперы
+# ==========================
+
+
+def parse_search_command(text: str | None) -> tuple[str, dict] | None:
+    """/search ... -> (строка запроса, фильтры search_tickets) или None."""
+    words = []
+    filters: dict = {}
+    for token in (text or "").split()[1:]:
+        key, sep, value = token.partition(":")
+        key = key.lower()
+        if not sep or not value:
+            words.append(token)
+            continue
+
+        try:
+            if key == "status" and value in STATUS_TITLES:
+                filters["status"] = value
+            elif key in ("cat", "category") and value in CATEGORY_TITLES:
+                filters["category"] = value
+            elif key == "user":
+                filters["user_id"] = int(value)
+            elif key == "from":
+                filters["created_from"] = datetime.strptime(value, "%Y-%m-%d")
+            elif key == "to":
+                # дата конца включительно
+                filters["created_to"] = datetime.strptime(
+                    value, "%Y-%m-%d"
+                ) + timedelta(days=1)
+            else:
+                words.append(token)
+        except ValueError:
+            return None
+
+    query = " ".join(words).strip()
+    if not query:
+        return None
+    return query, filters
+
+
+def remember_search(state: SearchState) -> str:
+    token = secrets.token_urlsafe(6)
+    SEARCH_STATES[token] = state
+    while len(SEARCH_STATES) > SEARCH_STATES_LIMIT:
+        SEARCH_STATES.popitem(last=False)
+    return token
+
+
+def format_search_hit(row: dict, admin_chat_id: int) -> str:
+    topic = row["topic"]
+    if len(topic) > TOPIC_PREVIEW_LIMIT:
+        topic = topic[:TOPIC_PREVIEW_LIMIT] + "…"
+    created = row["created_at"]
+    created = created.strftime("%d.%m.%Y") if hasattr(created, "strftime") else created
+
+    line = (
+        f"{STATUS_ICONS.get(row['status'], '•')} #{row['id']} "
+        f"{category_title(row.get('category'))} — {topic}\n"
+        f"    {created} · user_id {row['user_id']}"
+    )
+    # 0 — тема в основном админ-чате
+    chat_id = row.get("admin_chat_id") or admin_chat_id
+    link = topic_link(chat_id, row.get("admin_thread_id"))
+    if link:
+        line += f"\n    {link}"
+    return line
+
+
+async def render_search_page(
+    token: str,
+    state: SearchState,
+    page: int,
+    admin_chat_id: int,
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    rows = await search_tickets(
+        state.query,
+        after=state.cursors[page],
+        limit=SEARCH_PAGE_SIZE + 1,
+        **state.filters,
+    )
+    has_more = len(rows) > SEARCH_PAGE_SIZE
+    rows = rows[:SEARCH_PAGE_SIZE]
+
+    if has_more:
+        last = rows[-1]
+        del state.cursors[page + 1:]
+        state.cursors.append((last["score"], last["id"]))
+
+    if not rows:
+        text = f"🔎 По запросу «{state.query}» ничего не найдено."
+    else:
+        lines = [f"🔎 Поиск «{state.query}» — страница {page + 1}:\n"]
+        lines.extend(format_search_hit(row, admin_chat_id) for row in rows)
+        lines.append("\nОткрыть историю: /ticket ID")
+        text = "\n".join(lines)
+
+    buttons = []
+    if page > 0:
+        buttons.append(
+            InlineKeyboardButton(
+                text="◀",
+                callback_data=f"{SEARCH_CALLBACK_PREFIX}:{token}:{page - 1}",
+            )
+        )
+    if has_more:
+        buttons.append(
+            InlineKeyboardButton(
+                text="▶",
+                callback_data=f"{SEARCH_CALLBACK_PREFIX}:{token}:{page + 1}",
+            )
+        )
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return text, keyboard
+
+
+# ==========================
+#  Команда и листание
+# ==========================
+
+
+@search_router.message(Command("search"))
+async def admin_search(message: Message, settings: Settings):
+    """Поиск по тикетам: /search донат* cat:donate"""
+    if message.chat.id not in settings.admin_chat_ids:
+        return
+
+    parsed = parse_search_command(message.text)
+    if parsed is None:
+        await message.reply(SEARCH_USAGE)
+        return
+
+    query, filters = parsed
+    state = SearchState(query=query, filters=filters)
+    token = remember_search(state)
+    try:
+        text, keyboard = await render_search_page(
+            token, state, 0, settings.admin_chat_id
+        )
+    except ValueError:
+        # в запросе не осталось ни одного слова (только исключения / знаки)
+        await message.reply(SEARCH_USAGE)
+        return
+
+    await message.reply(text, reply_markup=keyboard)
+
+
+@search_router.callback_query(F.data.startswith(f"{SEARCH_CALLBACK_PREFIX}:"))
+async def search_page_callback(callback: CallbackQuery, settings: Settings):
+    if (
+        callback.message is None
+        or callback.message.chat.id not in settings.admin_chat_ids
+    ):
+        await callback.answer()
+        return
+
+    parts = (callback.data or "").split(":")
+    state = SEARCH_STATES.get(parts[1]) if len(parts) == 3 else None
+    if state is None or not parts[2].isdigit():
+        await callback.answer("Поиск устарел, повтори /search.", show_alert=True)
+        return
+
+    page = int(parts[2])
+    if page >= len(state.cursors):
+        await callback.answer("Поиск устарел, повтори /search.", show_alert=True)
+        return
+
+    text, keyboard = await render_search_page(
+        parts[1], state, page, settings.admin_chat_id
+    )
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            LOGGER.warning("⚠️ Не удалось обновить страницу поиска: %s", e)
+    await callback.answer()
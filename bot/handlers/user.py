@@ -4,8 +4,6 @@ from aiogram.types import (
     Message,
     ReplyKeyboardMarkup,
     KeyboardButton,
-    InlineKeyboardMarkup,
-    InlineKeyboardButton,
     InputMediaPhoto,
 )
 from aiogram.fsm.state import StatesGroup, State
@@ -17,16 +15,30 @@ import time  # ← если ещё нет
 from config import Settings
 from db import (
     create_ticket,
-    set_ticket_thread,
     get_user_tickets,
     get_user_last_active_ticket,
     add_ticket_message,
-    get_ticket_with_messages,
+    get_ticket,
     get_user_active_tickets,
     get_user_active_tickets_count,
     get_user_profile,
+    queue_ticket_relay,
     upsert_user_profile,
 )
+from handlers.common import (
+    ACK_FAIL_EMOJI,
+    ACK_OK_EMOJI,
+    ACK_REACTION,
+    CATEGORY_TITLES,
+    bot_scoped,
+    set_reaction,
+)
+from handlers.history import send_ticket_history
+from services.assignment import AssignmentEngine, ShiftAdmin
+from services.publisher import TicketPublisher
+from services.templates import TELEGRAM_CAPTION_LIMIT, truncate_utf16, utf16_len
+from services.ticket_chats import ticket_chat_id
+from services.view_cache import ViewCache
 
 CATEGORY_BUTTONS = [
     ("💳 Донат", "donate"),
@@ -36,18 +48,10 @@ CATEGORY_BUTTONS = [
     ("📦 Другое", "other"),
 ]
 
-CATEGORY_TITLES = {
-    "donate": "💳 Донат",
-    "bug": "🛠 Баг / тех. проблема",
-    # "complaint": "⚖️ Жалоба",
-    # "question": "❓ Вопрос",
-    "other": "📦 Другое",
-}
-
 MAX_ACTIVE_TICKETS_PER_USER = 1
 
-# Антиспам по пользователям
-USER_COOLDOWNS: dict[int, float] = {}
+# Антиспам по пользователям: (bot_id, user_id) -> время последнего сообщения
+USER_COOLDOWNS: dict[tuple[int, int], float] = {}
 COOLDOWN_SECONDS = 5  # можно поставить 3, 10, 30 — как удобнее
 
 PHOTO_ALBUM_FLUSH_DELAY = 4.0
@@ -57,6 +61,16 @@ NEW_TICKET_PHOTO_ALBUMS: dict[tuple[int, str], dict] = {}
 USER_PHOTO_ALBUM_LOCKS: dict[tuple[int, str], asyncio.Lock] = {}
 NEW_TICKET_PHOTO_ALBUM_LOCKS: dict[tuple[int, str], asyncio.Lock] = {}
 
+# Склейка текстовых сообщений игрока (MESSAGE_COALESCE_SECONDS):
+# (bot_id, user_id) -> пачка
+USER_TEXT_BURSTS: dict[tuple[int, int], dict] = {}
+# Длина склеенного текста в единицах UTF-16: с заголовком должно влезть в 4096
+TEXT_BURST_MAX_LENGTH = 3500
+
+# Игроки, у которых сейчас открыта главная клавиатура (с рестарта бота):
+# (bot_id, chat_id)
+MAIN_KEYBOARD_USERS: set[tuple[int, int]] = set()
+
 user_router = Router()
 LOGGER = logging.getLogger("support_bot.user")
 
@@ -92,22 +106,56 @@ def main_keyboard() -> ReplyKeyboardMarkup:
     )
 
 
-def is_on_cooldown(user_id: int) -> bool:
+def is_on_cooldown(bot: Bot, user_id: int) -> bool:
     """
     Проверяем, не слишком ли часто пишет пользователь.
     True  -> пользователь ещё на кулдауне
     False -> можно писать, кулдаун обновлён
     """
     now = time.time()
-    last = USER_COOLDOWNS.get(user_id, 0)
+    key = bot_scoped(bot, user_id)
+    last = USER_COOLDOWNS.get(key, 0)
 
     if now - last < COOLDOWN_SECONDS:
         return True
 
-    USER_COOLDOWNS[user_id] = now
+    USER_COOLDOWNS[key] = now
     return False
 
 
+async def answer_on_cooldown(message: Message):
+    await message.answer(
+        f"⏳ Ты слишком часто отправляешь сообщения.\n"
+        f"Можно писать раз в {COOLDOWN_SECONDS} секунд.",
+        reply_markup=main_keyboard(),
+    )
+
+
+async def acknowledge_player(
+    bot: Bot,
+    settings: Settings,
+    *,
+    chat_id: int,
+    message_id: int | None,
+    text: str,
+    ok: bool = True,
+):
+    """
+    Итог пересылки в тикет для игрока. В режиме ACK_MODE_PLAYER=reaction
+    успех — реакция на его сообщение, а текст с главной клавиатурой уходит,
+    только если клавиатуры у игрока может не быть.
+    """
+    if settings.ack_mode_player == ACK_REACTION:
+        reacted = await set_reaction(
+            bot, chat_id, message_id, ACK_OK_EMOJI if ok else ACK_FAIL_EMOJI
+        )
+        if reacted and ok and bot_scoped(bot, chat_id) in MAIN_KEYBOARD_USERS:
+            return
+
+    await bot.send_message(chat_id=chat_id, text=text, reply_markup=main_keyboard())
+    MAIN_KEYBOARD_USERS.add(bot_scoped(bot, chat_id))
+
+
 def normalize_nickname(raw: str) -> str:
     return " ".join((raw or "").strip().split())
 
@@ -127,119 +175,85 @@ def get_album_lock(
     return lock
 
 
-def truncate_caption(text: str, limit: int = 1024) -> str:
-    if len(text) <= limit:
-        return text
-    return text[: limit - 1] + "…"
+def format_assignee_line(assignee: ShiftAdmin | None) -> str:
+    if assignee is None:
+        return ""
+    return f"🛠 Тикет сразу взят в работу, ответственный: {assignee.title}.\n"
 
 
-def build_ticket_admin_keyboard(ticket_id: int) -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="🛠 Взять в работу",
-                    callback_data=f"take_ticket:{ticket_id}",
-                ),
-                InlineKeyboardButton(
-                    text="✔ Закрыть тикет",
-                    callback_data=f"close_ticket:{ticket_id}",
-                ),
-            ]
-        ]
-    )
-
-
-async def create_and_publish_new_ticket(
+async def create_new_ticket(
     *,
-    bot: Bot,
     settings: Settings,
     user_id: int,
     username: str | None,
     topic: str,
     text: str,
     category: str,
-    game_nickname: str,
+    publisher: TicketPublisher,
     photo_ids: list[str] | None = None,
-) -> tuple[int, str]:
+    assignment: AssignmentEngine | None = None,
+) -> tuple[int, str, ShiftAdmin | None]:
+    """
+    Записать тикет в БД и сразу вернуть его игроку: тему и пост в админ-чате
+    создаёт TicketPublisher в фоне.
+    """
     ticket_id = await create_ticket(
         user_id=user_id,
         username=username,
         topic=topic,
         text=text,
         category=category,
+        photo_ids=photo_ids,
     )
 
-    cat_title = CATEGORY_TITLES.get(category, "📦 Другое")
-    topic_name = f"[{cat_title}] #{ticket_id}: {topic[:30]}"
-    forum_topic = await bot.create_forum_topic(
-        chat_id=settings.admin_chat_id,
-        name=topic_name,
-    )
-    thread_id = forum_topic.message_thread_id
-    await set_ticket_thread(ticket_id, thread_id)
-
-    username_str = f"@{username}" if username else "без username"
-    kb = build_ticket_admin_keyboard(ticket_id)
-
-    if photo_ids:
-        caption = truncate_caption(
-            (
-                f"🆕 Новый тикет #{ticket_id}\n"
-                f"Никнейм на сервере: {game_nickname}\n"
-                f"Категория: {cat_title}\n"
-                f"От: {username_str} (ID: {user_id})\n"
-                f"Тема: {topic}\n\n"
-                f"{text}"
-            )
+    assignee = None
+    if assignment is not None:
+        try:
+            assignee = await assignment.auto_assign(ticket_id, category)
+        except Exception:
+            LOGGER.exception("❌ Не удалось автоматически назначить тикет #%s", ticket_id)
+    if assignee is not None:
+        await add_ticket_message(
+            ticket_id,
+            "admin",
+            f"[Тикет автоматически назначен админу {assignee.title}]",
         )
-        send_kwargs = {
-            "chat_id": settings.admin_chat_id,
-            "message_thread_id": thread_id,
-        }
 
-        for idx in range(0, len(photo_ids), 10):
-            chunk = photo_ids[idx : idx + 10]
-            media_group: list[InputMediaPhoto] = []
-            for chunk_idx, file_id in enumerate(chunk):
-                if idx == 0 and chunk_idx == 0 and caption:
-                    media_group.append(InputMediaPhoto(media=file_id, caption=caption))
-                else:
-                    media_group.append(InputMediaPhoto(media=file_id))
-            await bot.send_media_group(media=media_group, **send_kwargs)
+    publisher.enqueue(ticket_id)
+    return ticket_id, CATEGORY_TITLES.get(category, "📦 Другое"), assignee
 
-        await bot.send_message(
-            chat_id=settings.admin_chat_id,
-            message_thread_id=thread_id,
-            text="Все ответы по этому тикету пишите в этой теме.",
-            reply_markup=kb,
-        )
-    else:
-        admin_text = (
-            f"🆕 Новый тикет #{ticket_id}\n"
-            f"Никнейм на сервере: {game_nickname}\n"
-            f"Категория: {cat_title}\n"
-            f"От: {username_str} (ID: {user_id})\n"
-            f"Тема: {topic}\n\n"
-            f"{text}\n\n"
-            f"Все ответы по этому тикету пишите в этой теме."
-        )
-        await bot.send_message(
-            chat_id=settings.admin_chat_id,
-            message_thread_id=thread_id,
-            text=admin_text,
-            reply_markup=kb,
-        )
 
+async def queue_for_unpublished_ticket(
+    bot: Bot,
+    settings: Settings,
+    *,
+    ticket_id: int,
+    chat_id: int,
+    message_ids: list[int],
+    text: str,
+    ack_text: str,
+) -> bool:
+    """
+    Тема тикета ещё не создана (TicketPublisher): сообщения сохраняются
+    в истории и ждут в очереди, публикатор скопирует их в тему следом
+    за постом о тикете. False — тема уже появилась, пересылаем сразу.
+    """
+    if not await queue_ticket_relay(ticket_id, chat_id, message_ids):
+        return False
+    await add_ticket_message(ticket_id, "user", text)
+    await acknowledge_player(
+        bot,
+        settings,
+        chat_id=chat_id,
+        message_id=message_ids[-1],
+        text=f"{ack_text} Тикет ещё передаётся администрации — ожидай ответа.",
+    )
     LOGGER.info(
-        "📨 Новый тикет #%s отправлен в админ-чат (user_id=%s, thread_id=%s, photos=%s)",
+        "⏳ Сообщения пользователя ждут создания темы тикета #%s (messages=%s)",
         ticket_id,
-        user_id,
-        thread_id,
-        len(photo_ids or []),
+        len(message_ids),
     )
-
-    return ticket_id, cat_title
+    return True
 
 
 async def flush_new_ticket_photo_album(
@@ -247,6 +261,8 @@ async def flush_new_ticket_photo_album(
     *,
     bot: Bot,
     settings: Settings,
+    publisher: TicketPublisher,
+    assignment: AssignmentEngine | None = None,
 ):
     lock = get_album_lock(NEW_TICKET_PHOTO_ALBUM_LOCKS, key)
     while True:
@@ -278,33 +294,32 @@ async def flush_new_ticket_photo_album(
     username = payload["username"]
     state: FSMContext = payload["state"]
 
-    profile = await get_user_profile(user_id)
-    game_nickname = profile["game_nickname"] if profile else "не указан"
-
     await state.clear()
 
     try:
-        ticket_id, cat_title = await create_and_publish_new_ticket(
-            bot=bot,
+        ticket_id, cat_title, assignee = await create_new_ticket(
             settings=settings,
             user_id=user_id,
             username=username,
             topic=topic,
             text=caption_text,
             category=category,
-            game_nickname=game_nickname,
+            publisher=publisher,
             photo_ids=photos,
+            assignment=assignment,
         )
         await bot.send_message(
             chat_id=chat_id,
             text=(
                 f"✅ Тикет #{ticket_id} создан!\n"
                 f"Категория: {cat_title}\n"
+                f"{format_assignee_line(assignee)}"
                 f"Мы получили альбом ({len(photos)} фото). "
                 "Администраторы ответят, как только рассмотрят обращение."
             ),
             reply_markup=main_keyboard(),
         )
+        MAIN_KEYBOARD_USERS.add(bot_scoped(bot, chat_id))
         LOGGER.info(
             "✅ Тикет #%s создан из альбома пользователя (user_id=%s, photos=%s)",
             ticket_id,
@@ -329,6 +344,8 @@ async def handle_new_ticket_photo_album_message(
     state: FSMContext,
     bot: Bot,
     settings: Settings,
+    publisher: TicketPublisher,
+    assignment: AssignmentEngine | None = None,
 ) -> bool:
     user = message.from_user
     media_group_id = message.media_group_id
@@ -358,6 +375,8 @@ async def handle_new_ticket_photo_album_message(
                     key,
                     bot=bot,
                     settings=settings,
+                    publisher=publisher,
+                    assignment=assignment,
                 )
             )
 
@@ -408,13 +427,32 @@ async def flush_user_photo_album(
     user_chat_id = payload["user_chat_id"]
     caption_text = payload["caption"]
     base_text = caption_text or f"[Альбом фото от игрока: {len(photos)} шт.]"
-    admin_caption = caption_text or None
-
-    send_kwargs = {"chat_id": settings.admin_chat_id}
-    if thread_id:
-        send_kwargs["message_thread_id"] = thread_id
+    admin_caption = truncate_utf16(caption_text, TELEGRAM_CAPTION_LIMIT) or None
 
     try:
+        admin_chat_id = payload["admin_chat_id"]
+        if not payload["published"]:
+            if await queue_for_unpublished_ticket(
+                bot,
+                settings,
+                ticket_id=ticket_id,
+                chat_id=user_chat_id,
+                message_ids=payload["message_ids"],
+                text=base_text,
+                ack_text=(
+                    f"Твой альбом ({len(photos)} фото) добавлен в тикет #{ticket_id}."
+                ),
+            ):
+                return
+            # тему создали, пока альбом собирался
+            ticket = await get_ticket(ticket_id)
+            admin_chat_id = ticket_chat_id(settings, ticket)
+            thread_id = ticket["admin_thread_id"]
+
+        send_kwargs = {"chat_id": admin_chat_id}
+        if thread_id:
+            send_kwargs["message_thread_id"] = thread_id
+
         for idx in range(0, len(photos), 10):
             chunk = photos[idx : idx + 10]
             media_group: list[InputMediaPhoto] = []
@@ -422,7 +460,7 @@ async def flush_user_photo_album(
                 if idx == 0 and chunk_idx == 0:
                     if admin_caption:
                         media_group.append(
-                            InputMediaPhoto(media=file_id, caption=admin_caption[:1024])
+                            InputMediaPhoto(media=file_id, caption=admin_caption)
                         )
                     else:
                         media_group.append(InputMediaPhoto(media=file_id))
@@ -432,13 +470,15 @@ async def flush_user_photo_album(
             await bot.send_media_group(media=media_group, **send_kwargs)
 
         await add_ticket_message(ticket_id, "user", base_text)
-        await bot.send_message(
+        await acknowledge_player(
+            bot,
+            settings,
             chat_id=user_chat_id,
+            message_id=payload["message_id"],
             text=(
                 f"Твой альбом ({len(photos)} фото) добавлен в тикет #{ticket_id}. "
                 "Ожидай ответа администрации."
             ),
-            reply_markup=main_keyboard(),
         )
         LOGGER.info(
             "📤 Альбом пользователя отправлен в тикет #%s (photos=%s)",
@@ -451,10 +491,13 @@ async def flush_user_photo_album(
             ticket_id,
             len(photos),
         )
-        await bot.send_message(
+        await acknowledge_player(
+            bot,
+            settings,
             chat_id=user_chat_id,
+            message_id=payload["message_id"],
             text=f"⚠ Не удалось отправить альбом в тикет: {exc!r}",
-            reply_markup=main_keyboard(),
+            ok=False,
         )
 
 
@@ -488,8 +531,12 @@ async def handle_user_photo_album_message(
 
             payload = {
                 "ticket_id": ticket["id"],
+                "admin_chat_id": ticket_chat_id(settings, ticket),
                 "thread_id": ticket.get("admin_thread_id"),
+                "published": bool(ticket["published"]),
                 "user_chat_id": message.chat.id,
+                "message_id": message.message_id,
+                "message_ids": [],
                 "photos": [],
                 "caption": "",
                 "last_update": time.monotonic(),
@@ -504,6 +551,7 @@ async def handle_user_photo_album_message(
             )
 
         payload["photos"].append(message.photo[-1].file_id)
+        payload["message_ids"].append(message.message_id)
         payload["last_update"] = time.monotonic()
         caption_text = (message.caption or "").strip()
         if caption_text and not payload["caption"]:
@@ -512,8 +560,226 @@ async def handle_user_photo_album_message(
     return True
 
 
+async def deliver_user_text_burst(
+    payload: dict,
+    *,
+    bot: Bot,
+    settings: Settings,
+):
+    """Одна запись в БД, один пост в тему и одно подтверждение на всю пачку."""
+    parts: list[str] = payload["parts"]
+    ticket_id = payload["ticket_id"]
+    thread_id = payload["thread_id"]
+    user_chat_id = payload["user_chat_id"]
+    text = "\n".join(parts)
+
+    msg_kwargs = {
+        "chat_id": payload["admin_chat_id"],
+        "text": f"💬 Ответ от игрока по тикету #{ticket_id}:\n\n{text}",
+    }
+    if thread_id:
+        msg_kwargs["message_thread_id"] = thread_id
+
+    if len(parts) > 1:
+        ack = f"Твои сообщения ({len(parts)} шт.) добавлены в тикет #{ticket_id}."
+    else:
+        ack = f"Твоё сообщение добавлено в тикет #{ticket_id}."
+
+    try:
+        if not payload["published"]:
+            if await queue_for_unpublished_ticket(
+                bot,
+                settings,
+                ticket_id=ticket_id,
+                chat_id=user_chat_id,
+                message_ids=payload["message_ids"],
+                text=text,
+                ack_text=ack,
+            ):
+                return
+            # тему создали, пока копилась пачка
+            ticket = await get_ticket(ticket_id)
+            msg_kwargs["chat_id"] = ticket_chat_id(settings, ticket)
+            if ticket["admin_thread_id"]:
+                msg_kwargs["message_thread_id"] = ticket["admin_thread_id"]
+
+        await add_ticket_message(ticket_id, "user", text)
+        await bot.send_message(**msg_kwargs)
+        LOGGER.info(
+            "📨 Сообщения пользователя отправлены в тикет #%s (user_id=%s, parts=%s)",
+            ticket_id,
+            user_chat_id,
+            len(parts),
+        )
+        await acknowledge_player(
+            bot,
+            settings,
+            chat_id=user_chat_id,
+            message_id=payload["message_id"],
+            text=ack + " Ожидай ответа от администрации.",
+        )
+    except Exception as exc:
+        LOGGER.exception(
+            "❌ Не удалось отправить сообщения пользователя в тикет #%s (user_id=%s)",
+            ticket_id,
+            user_chat_id,
+        )
+        await acknowledge_player(
+            bot,
+            settings,
+            chat_id=user_chat_id,
+            message_id=payload["message_id"],
+            text=f"⚠ Не удалось отправить сообщение в тикет: {exc!r}",
+            ok=False,
+        )
+
+
+async def flush_user_text_burst(
+    user_id: int,
+    payload: dict,
+    *,
+    bot: Bot,
+    settings: Settings,
+):
+    """
+    Пачка уходит, когда игрок MESSAGE_COALESCE_SECONDS ничего не пишет
+    (переполненная — сразу), но не раньше COOLDOWN_SECONDS после его
+    предыдущего поста в тему.
+    """
+    key = bot_scoped(bot, user_id)
+    if payload["previous"] is not None:
+        # сначала уходит переполненная пачка перед этой
+        await payload["previous"]
+    while True:
+        if USER_TEXT_BURSTS.get(key) is not payload and not payload["sealed"]:
+            # пачку уже отправили раньше: следом пришло медиа
+            return
+        coalesce_left = 0.0
+        if not payload["sealed"]:
+            coalesce_left = settings.message_coalesce_seconds - (
+                time.monotonic() - payload["last_update"]
+            )
+        cooldown_left = COOLDOWN_SECONDS - (time.time() - USER_COOLDOWNS.get(key, 0))
+        sleep_for = max(coalesce_left, cooldown_left)
+        if sleep_for <= 0:
+            break
+        await asyncio.sleep(sleep_for)
+
+    if USER_TEXT_BURSTS.get(key) is payload:
+        USER_TEXT_BURSTS.pop(key)
+    USER_COOLDOWNS[key] = time.time()
+    await deliver_user_text_burst(payload, bot=bot, settings=settings)
+
+
+def start_user_text_burst(
+    user_id: int,
+    ticket_id: int,
+    admin_chat_id: int,
+    thread_id: int | None,
+    user_chat_id: int,
+    published: bool,
+    *,
+    bot: Bot,
+    settings: Settings,
+    previous: asyncio.Task | None = None,
+) -> dict:
+    payload = {
+        "ticket_id": ticket_id,
+        "admin_chat_id": admin_chat_id,
+        "thread_id": thread_id,
+        "published": published,
+        "user_chat_id": user_chat_id,
+        "parts": [],
+        "message_id": None,
+        "message_ids": [],
+        "length": 0,
+        "last_update": time.monotonic(),
+        # переполненная пачка больше не пополняется и ждёт только кулдауна
+        "sealed": False,
+        "previous": previous,
+    }
+    USER_TEXT_BURSTS[bot_scoped(bot, user_id)] = payload
+    payload["task"] = asyncio.create_task(
+        flush_user_text_burst(user_id, payload, bot=bot, settings=settings)
+    )
+    return payload
+
+
+async def flush_user_text_burst_now(user_id: int, *, bot: Bot, settings: Settings):
+    """Отправить накопленный текст сразу, чтобы он не обогнал следующее медиа."""
+    payload = USER_TEXT_BURSTS.pop(bot_scoped(bot, user_id), None)
+    if payload:
+        if payload["previous"] is not None:
+            await payload["previous"]
+        await deliver_user_text_burst(payload, bot=bot, settings=settings)
+
+
+async def handle_user_text_burst_message(
+    message: Message,
+    bot: Bot,
+    settings: Settings,
+) -> bool:
+    """
+    Текстовое сообщение в активный тикет копится в пачке игрока и уходит
+    вместе с остальными, когда он MESSAGE_COALESCE_SECONDS ничего не пишет.
+    Антиспам считается по постам в тему, а не по сообщениям: пачка уходит
+    не раньше COOLDOWN_SECONDS после предыдущей и пока ждёт — копит текст,
+    так что ни одна строка не теряется.
+    False — склейка не применима, сообщение обрабатывается как обычно.
+    """
+    user = message.from_user
+    text = (message.text or "").strip()
+    if user is None or not text:
+        return False
+
+    size = utf16_len(text) + 1
+    key = bot_scoped(bot, user.id)
+    payload = USER_TEXT_BURSTS.get(key)
+    if payload is None:
+        ticket = await get_user_last_active_ticket(user.id)
+        if not ticket:
+            return False
+        # пока ждали БД, пачку могло начать соседнее сообщение
+        payload = USER_TEXT_BURSTS.get(key) or start_user_text_burst(
+            user.id,
+            ticket["id"],
+            ticket_chat_id(settings, ticket),
+            ticket.get("admin_thread_id"),
+            message.chat.id,
+            bool(ticket["published"]),
+            bot=bot,
+            settings=settings,
+        )
+    elif payload["length"] + size > TEXT_BURST_MAX_LENGTH:
+        # пачка не влезет в одно сообщение Telegram: она уйдёт, как только
+        # позволит кулдаун, а текст копится уже в следующей
+        payload["sealed"] = True
+        USER_TEXT_BURSTS.pop(key, None)
+        previous = payload["task"]
+        payload = start_user_text_burst(
+            user.id,
+            payload["ticket_id"],
+            payload["admin_chat_id"],
+            payload["thread_id"],
+            payload["user_chat_id"],
+            payload["published"],
+            bot=bot,
+            settings=settings,
+            previous=previous,
+        )
+
+    payload["parts"].append(text)
+    # реакцию ставим на последнее сообщение пачки
+    payload["message_id"] = message.message_id
+    payload["message_ids"].append(message.message_id)
+    payload["length"] += size
+    payload["last_update"] = time.monotonic()
+    return True
+
+
 async def prompt_ticket_category(message: Message, state: FSMContext):
     await state.set_state(NewTicket.waiting_for_category)
+    MAIN_KEYBOARD_USERS.discard(bot_scoped(message.bot, message.chat.id))
     await message.answer(
         "Выбери категорию обращения:",
         reply_markup=category_keyboard(),
@@ -732,8 +998,12 @@ async def ticket_text_received(
     state: FSMContext,
     bot: Bot,
     settings: Settings,
+    assignment: AssignmentEngine,
+    publisher: TicketPublisher,
 ):
-    if await handle_new_ticket_photo_album_message(message, state, bot, settings):
+    if await handle_new_ticket_photo_album_message(
+        message, state, bot, settings, publisher, assignment
+    ):
         return
 
     if any(
@@ -745,7 +1015,7 @@ async def ticket_text_received(
         )
         return
 
-    if is_on_cooldown(message.from_user.id):
+    if is_on_cooldown(bot, message.from_user.id):
         await message.answer(
             f"⏳ Не спамь, можно отправлять сообщения раз в {COOLDOWN_SECONDS} секунд.",
             reply_markup=main_keyboard(),
@@ -773,27 +1043,26 @@ async def ticket_text_received(
     await state.clear()
 
     username = message.from_user.username if message.from_user else None
-    profile = await get_user_profile(message.from_user.id)
-    game_nickname = profile["game_nickname"] if profile else "не указан"
-
-    ticket_id, cat_title = await create_and_publish_new_ticket(
-        bot=bot,
+    ticket_id, cat_title, assignee = await create_new_ticket(
         settings=settings,
         user_id=message.from_user.id,
         username=username,
         topic=topic,
         text=text,
         category=category,
-        game_nickname=game_nickname,
+        publisher=publisher,
         photo_ids=photo_ids,
+        assignment=assignment,
     )
 
     await message.answer(
         f"✅ Тикет #{ticket_id} создан!\n"
         f"Категория: {cat_title}\n"
+        f"{format_assignee_line(assignee)}"
         f"Наши администраторы ответят тебе, как только рассмотрят обращение.",
         reply_markup=main_keyboard(),
     )
+    MAIN_KEYBOARD_USERS.add(bot_scoped(bot, message.chat.id))
     LOGGER.info(
         "✅ Новый тикет #%s создан пользователем %s (photos=%s)",
         ticket_id,
@@ -803,7 +1072,7 @@ async def ticket_text_received(
 
 
 @user_router.message(Command("ticket"), F.chat.type == "private")
-async def user_show_ticket(message: Message):
+async def user_show_ticket(message: Message, view_cache: ViewCache):
     """Пользователь смотрит историю своего тикета: /ticket ID"""
     parts = message.text.split()
     if len(parts) < 2:
@@ -821,14 +1090,11 @@ async def user_show_ticket(message: Message):
         )
         return
 
-    data = await get_ticket_with_messages(ticket_id)
-    if not data:
+    ticket = await get_ticket(ticket_id)
+    if not ticket:
         await message.reply("Тикет с таким ID не найден.", reply_markup=main_keyboard())
         return
 
-    ticket = data["ticket"]
-    messages = data["messages"]
-
     # проверяем, что тикет принадлежит этому пользователю
     if ticket["user_id"] != message.from_user.id:
         await message.reply(
@@ -836,38 +1102,7 @@ async def user_show_ticket(message: Message):
         )
         return
 
-    status_map = {
-        "open": "🟢 Открыт",
-        "in_work": "🟡 В работе",
-        "closed": "⚪ Закрыт",
-    }
-    status = status_map.get(ticket["status"], ticket["status"])
-    cat_title = CATEGORY_TITLES.get(ticket.get("category", "other"), "📦 Другое")
-
-    header = (
-        f"📄 Тикет #{ticket['id']} — {status}\n"
-        f"Категория: {cat_title}\n"
-        f"Тема: {ticket['topic']}\n"
-        f"Создан: {ticket['created_at']}\n\n"
-        f"История сообщений:\n"
-    )
-
-    lines = [header]
-
-    if not messages:
-        lines.append("Пока нет сообщений.")
-    else:
-        for msg in messages:
-            who = "Ты" if msg["sender"] == "user" else "Администрация"
-            created = msg["created_at"]
-            text = msg["text"]
-            lines.append(f"\n{who} [{created}]:\n{text}\n")
-
-    full_text = "".join(lines)
-    if len(full_text) > 4000:
-        full_text = full_text[:4000] + "\n\n…обрезано, слишком длинная история."
-
-    await message.reply(full_text, reply_markup=main_keyboard())
+    await send_ticket_history(message, ticket, "user", view_cache)
 
 
 @user_router.message(Command("mytickets"), F.chat.type == "private")
@@ -918,16 +1153,23 @@ async def user_text_router(
         await cmd_profile(message)
         return
 
+    # 2. Текст склеиваем с соседними сообщениями игрока, медиа отправляем
+    # только после уже накопленного текста — чтобы не нарушить порядок
+    if settings.message_coalesce_seconds > 0:
+        if message.text:
+            if await handle_user_text_burst_message(message, bot, settings):
+                return
+        else:
+            await flush_user_text_burst_now(
+                message.from_user.id, bot=bot, settings=settings
+            )
+
     if await handle_user_photo_album_message(message, bot, settings):
         return
 
-    # 2. Антиспам для любых ответов в тикеты
-    if is_on_cooldown(message.from_user.id):
-        await message.answer(
-            f"⏳ Ты слишком часто отправляешь сообщения.\n"
-            f"Можно писать раз в {COOLDOWN_SECONDS} секунд.",
-            reply_markup=main_keyboard(),
-        )
+    # Антиспам для остальных ответов в тикеты
+    if is_on_cooldown(bot, message.from_user.id):
+        await answer_on_cooldown(message)
         return
 
     # 3. Берём последний активный тикет
@@ -941,6 +1183,7 @@ async def user_text_router(
         return
 
     ticket_id = ticket["id"]
+    admin_chat_id = ticket_chat_id(settings, ticket)
     thread_id = ticket.get("admin_thread_id")
 
     # --- определяем медиа ---
@@ -991,6 +1234,23 @@ async def user_text_router(
         await message.answer("Пустое сообщение я не могу приложить к тикету.")
         return
 
+    # тема ещё не создана — сообщение дождётся её в очереди публикатора
+    if not ticket["published"]:
+        if await queue_for_unpublished_ticket(
+            bot,
+            settings,
+            ticket_id=ticket_id,
+            chat_id=message.chat.id,
+            message_ids=[message.message_id],
+            text=text,
+            ack_text=f"Твоё сообщение добавлено в тикет #{ticket_id}.",
+        ):
+            return
+        # тему создали, пока мы читали тикет
+        ticket = await get_ticket(ticket_id)
+        admin_chat_id = ticket_chat_id(settings, ticket)
+        thread_id = ticket["admin_thread_id"]
+
     # 4. Лог в БД
     await add_ticket_message(ticket_id, "user", text)
 
@@ -1001,7 +1261,7 @@ async def user_text_router(
         if is_media:
             # базовые параметры для отправки медиа
             send_kwargs = {
-                "chat_id": settings.admin_chat_id,
+                "chat_id": admin_chat_id,
                 "caption": caption,
             }
             if thread_id:
@@ -1040,7 +1300,7 @@ async def user_text_router(
             elif has_sticker:
                 # у стикеров нет caption — отправляем стикер + отдельный текст
                 sticker_kwargs = {
-                    "chat_id": settings.admin_chat_id,
+                    "chat_id": admin_chat_id,
                     "sticker": message.sticker.file_id,
                 }
                 if thread_id:
@@ -1049,7 +1309,7 @@ async def user_text_router(
                 s = await bot.send_sticker(**sticker_kwargs)
 
                 msg_kwargs = {
-                    "chat_id": settings.admin_chat_id,
+                    "chat_id": admin_chat_id,
                     "text": caption,
                     "reply_to_message_id": s.message_id,
                 }
@@ -1060,7 +1320,7 @@ async def user_text_router(
             else:
                 # на всякий случай — только текст
                 msg_kwargs = {
-                    "chat_id": settings.admin_chat_id,
+                    "chat_id": admin_chat_id,
                     "text": caption,
                 }
                 if thread_id:
@@ -1069,7 +1329,7 @@ async def user_text_router(
         else:
             # только текст
             msg_kwargs = {
-                "chat_id": settings.admin_chat_id,
+                "chat_id": admin_chat_id,
                 "text": caption,
             }
             if thread_id:
@@ -1082,10 +1342,15 @@ async def user_text_router(
             message.from_user.id,
             is_media,
         )
-        await message.answer(
-            f"Твоё сообщение добавлено в тикет #{ticket_id}. "
-            f"Ожидай ответа от администрации.",
-            reply_markup=main_keyboard(),
+        await acknowledge_player(
+            bot,
+            settings,
+            chat_id=message.chat.id,
+            message_id=message.message_id,
+            text=(
+                f"Твоё сообщение добавлено в тикет #{ticket_id}. "
+                f"Ожидай ответа от администрации."
+            ),
         )
     except Exception as exc:
         LOGGER.exception(
@@ -1093,7 +1358,11 @@ async def user_text_router(
             ticket_id,
             message.from_user.id,
         )
-        await message.answer(
-            f"⚠ Не удалось отправить сообщение в тикет: {exc!r}",
-            reply_markup=main_keyboard(),
+        await acknowledge_player(
+            bot,
+            settings,
+            chat_id=message.chat.id,
+            message_id=message.message_id,
+            text=f"⚠ Не удалось отправить сообщение в тикет: {exc!r}",
+            ok=False,
         )
@@ -0,0 +1 @@
+"""Фоновые и вспомогательные сервисы бота (не привязанные к конкретному роутеру)."""
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from config import Settings
+from db import archive_ticket_messages, get_archivable_tickets
+
+LOGGER = logging.getLogger("support_bot.archiver")
+
+# Пауза между пачками, чтобы не держать блокировки и не забивать пул подряд.
+ARCHIVE_CHUNK_PAUSE = 0.5
+
+
+class MessageArchiver:
+    """
+    Фоновый перенос сообщений давно закрытых тикетов в ticket_messages_archive.
+    Горячая таблица ticket_messages и её индексы остаются маленькими,
+    история при этом читается как раньше (db.py смотрит в оба места).
+    """
+
+    def __init__(self, settings: Settings):
+        self.after_days = settings.archive_after_days
+        self.batch_tickets = max(1, settings.archive_batch_tickets)
+        self.interval = max(1, settings.archive_interval_minutes) * 60
+        # (closed_at, id) последнего заархивированного тикета: следующий проход
+        # продолжает с него, а не сканирует всё закрытое с начала.
+        self._watermark: tuple[datetime, int] | None = None
+
+    async def run_once(self) -> dict[str, int]:
+        totals = {"tickets": 0, "messages": 0}
+        while True:
+            tickets = await get_archivable_tickets(
+                self.after_days,
+                after=self._watermark,
+                limit=self.batch_tickets,
+            )
+            if not tickets:
+                break
+
+            result = await archive_ticket_messages([row["id"] for row in tickets])
+            self._watermark = (tickets[-1]["closed_at"], tickets[-1]["id"])
+            totals["tickets"] += result["tickets"]
+            totals["messages"] += result["messages"]
+            await asyncio.sleep(ARCHIVE_CHUNK_PAUSE)
+
+        if totals["tickets"]:
+            LOGGER.info(
+                "🗃️ Архивация: перенесено %s сообщений из %s тикетов",
+                totals["messages"],
+                totals["tickets"],
+            )
+        return totals
+
+    async def run(self):
+        LOGGER.info(
+            "🗃️ Архиватор запущен: тикеты, закрытые больше %s дн. назад, раз в %s мин",
+            self.after_days,
+            self.interval // 60,
+        )
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                LOGGER.exception("❌ Ошибка архивации сообщений: %s", e)
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from config import Settings
+from db import (
+    auto_assign_ticket,
+    get_active_assignments,
+    get_admin_shifts,
+    set_admin_shift,
+)
+from services.events import (
+    EventBus,
+    TicketAssigned,
+    TicketClosed,
+    TicketDeleted,
+    TicketEvent,
+)
+
+LOGGER = logging.getLogger("support_bot.assignment")
+
+DEFAULT_POLICY = "*"
+STRATEGY_LEAST_LOAD = "least_load"
+STRATEGY_ROUND_ROBIN = "round_robin"
+STRATEGY_OFF = "off"
+STRATEGIES = (STRATEGY_LEAST_LOAD, STRATEGY_ROUND_ROBIN, STRATEGY_OFF)
+# Как часто сверять смены и нагрузку с БД: события шины могут теряться.
+ASSIGNMENT_RELOAD_INTERVAL = 60.0
+
+
+@dataclass
+class ShiftAdmin:
+    admin_id: int
+    username: str | None
+
+    @property
+    def title(self) -> str:
+        if self.username:
+            return f"@{self.username}"
+        return f"admin {self.admin_id}"
+
+
+class AssignmentEngine:
+    """
+    Автоназначение новых тикетов админам на смене.
+    Нагрузка (активные тикеты с исполнителем) читается из БД и между
+    чтениями поддерживается в памяти по событиям тикетов (services/events.py):
+    взятие, закрытие и удаление. Шина может потерять событие, поэтому раз
+    в ASSIGNMENT_RELOAD_INTERVAL счётчики перечитываются из БД целиком.
+    """
+
+    def __init__(self, settings: Settings):
+        self.strategies = dict(settings.assignment_strategy)
+        self.max_load = settings.assignment_max_load
+        for category, strategy in self.strategies.items():
+            if strategy not in STRATEGIES:
+                raise ValueError(
+                    f"ASSIGNMENT_STRATEGY: неизвестная стратегия {strategy!r} "
+                    f"для категории {category!r}"
+                )
+
+        self._on_shift: dict[int, ShiftAdmin] = {}
+        # ticket_id -> admin_id; по нему повторные события не портят счётчики
+        self._owners: dict[int, int] = {}
+        self._load: Counter[int] = Counter()
+        self._last_assigned: dict[int, float] = {}
+        # категория -> admin_id, получивший последний тикет по кругу
+        self._rr_cursor: dict[str, int] = {}
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self._loaded_at = 0.0
+        # В режиме WORKERS тикеты берут и закрывают другие процессы,
+        # поэтому смены и нагрузка перечитываются из БД перед каждым решением.
+        self.reload_each_time = settings.workers > 0
+
+    def strategy_for(self, category: str | None) -> str:
+        return self.strategies.get(
+            category or "", self.strategies.get(DEFAULT_POLICY, STRATEGY_OFF)
+        )
+
+    async def _ensure_loaded(self):
+        stale = time.monotonic() - self._loaded_at >= ASSIGNMENT_RELOAD_INTERVAL
+        if self._loaded and not self.reload_each_time and not stale:
+            return
+        first_load = not self._loaded
+        self._on_shift.clear()
+        self._owners.clear()
+        self._load.clear()
+        for row in await get_admin_shifts():
+            if row["on_shift"]:
+                self._on_shift[row["admin_id"]] = ShiftAdmin(
+                    row["admin_id"], row["admin_username"]
+                )
+        for row in await get_active_assignments():
+            self.ticket_assigned(row["id"], row["assigned_admin_id"])
+        self._loaded = True
+        self._loaded_at = time.monotonic()
+        if not first_load:
+            return
+        LOGGER.info(
+            "👥 Автоназначение: на смене %s админ(ов), активных тикетов с исполнителем %s",
+            len(self._on_shift),
+            len(self._owners),
+        )
+
+    def load_of(self, admin_id: int) -> int:
+        return self._load[admin_id]
+
+    # ==========================
+    #  События тикетов
+    # ==========================
+
+    def subscribe(self, events: EventBus):
+        events.subscribe(
+            self.ticket_event,
+            TicketAssigned,
+            TicketClosed,
+            TicketDeleted,
+            name="assignment",
+        )
+
+    def ticket_event(self, event: TicketEvent):
+        if isinstance(event, TicketAssigned):
+            self.ticket_assigned(event.ticket_id, event.admin_id)
+        else:
+            self.ticket_closed(event.ticket_id)
+
+    def ticket_assigned(self, ticket_id: int, admin_id: int):
+        previous = self._owners.get(ticket_id)
+        if previous == admin_id:
+            return
+        if previous is not None:
+            self._load[previous] -= 1
+        self._owners[ticket_id] = admin_id
+        self._load[admin_id] += 1
+
+    def ticket_closed(self, ticket_id: int):
+        admin_id = self._owners.pop(ticket_id, None)
+        if admin_id is not None:
+            self._load[admin_id] -= 1
+
+    # ==========================
+    #  Смены
+    # ==========================
+
+    async def set_shift(self, admin_id: int, username: str | None, on_shift: bool):
+        async with self._lock:
+            await self._ensure_loaded()
+            await set_admin_shift(admin_id, username, on_shift)
+            if on_shift:
+                self._on_shift[admin_id] = ShiftAdmin(admin_id, username)
+            else:
+                self._on_shift.pop(admin_id, None)
+        LOGGER.info(
+            "👥 Админ %s %s смену",
+            admin_id,
+            "начал" if on_shift else "завершил",
+        )
+
+    async def shift_overview(self) -> list[tuple[ShiftAdmin, int]]:
+        """Админы на смене и их активная нагрузка, по возрастанию нагрузки."""
+        async with self._lock:
+            await self._ensure_loaded()
+            admins = list(self._on_shift.values())
+        admins.sort(key=lambda admin: (self.load_of(admin.admin_id), admin.admin_id))
+        return [(admin, self.load_of(admin.admin_id)) for admin in admins]
+
+    # ==========================
+    #  Назначение
+    # ==========================
+
+    def _pick(self, category: str, strategy: str) -> ShiftAdmin | None:
+        candidates = sorted(
+            (
+                admin
+                for admin in self._on_shift.values()
+                if self.max_load <= 0 or self.load_of(admin.admin_id) < self.max_load
+            ),
+            key=lambda admin: admin.admin_id,
+        )
+        if not candidates:
+            return None
+
+        if strategy == STRATEGY_ROUND_ROBIN:
+            cursor = self._rr_cursor.get(category)
+            for admin in candidates:
+                if cursor is None or admin.admin_id > cursor:
+                    return admin
+            return candidates[0]
+
+        # при равной нагрузке — тот, кто дольше не получал тикетов
+        return min(
+            candidates,
+            key=lambda admin: (
+                self.load_of(admin.admin_id),
+                self._last_assigned.get(admin.admin_id, 0.0),
+            ),
+        )
+
+    async def auto_assign(self, ticket_id: int, category: str) -> ShiftAdmin | None:
+        """
+        Назначить новый тикет по стратегии его категории.
+        None — стратегия off, никого нет на смене или все упёрлись в лимит.
+        """
+        strategy = self.strategy_for(category)
+        if strategy == STRATEGY_OFF:
+            return None
+
+        async with self._lock:
+            await self._ensure_loaded()
+            admin = self._pick(category, strategy)
+            if admin is None:
+                return None
+            if not await auto_assign_ticket(ticket_id, admin.admin_id, admin.username):
+                return None
+
+            self.ticket_assigned(ticket_id, admin.admin_id)
+            self._last_assigned[admin.admin_id] = time.monotonic()
+            self._rr_cursor[category] = admin.admin_id
+
+        LOGGER.info(
+            "👥 Тикет #%s (%s) назначен админу %s (%s, нагрузка %s)",
+            ticket_id,
+            category,
+            admin.admin_id,
+            strategy,
+            self.load_of(admin.admin_id),
+        )
+        return admin
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from aiogram import Bot
+
+from config import Settings
+from db import close_inactive_tickets
+from services.sender import (
+    SEND_BLOCKED,
+    SEND_DELIVERED,
+    SEND_FAILED,
+    RateLimitedSender,
+)
+from services.ticket_chats import ticket_chat_id
+
+LOGGER = logging.getLogger("support_bot.autoclose")
+
+AUTO_CLOSE_BATCH = 100
+AUTO_CLOSE_CHUNK_PAUSE = 0.5
+SUMMARY_MAX_IDS = 50
+
+
+class AutoCloseService:
+    """
+    Закрытие тикетов, в которых AUTO_CLOSE_DAYS дней не было сообщений.
+    Тикеты закрываются пачками; игроки и темы уведомляются через общий
+    для бота RateLimitedSender (с ним же идут рассылки), в админ-чат
+    уходит одна сводка за проход.
+    """
+
+    def __init__(self, settings: Settings, sender: RateLimitedSender):
+        self.settings = settings
+        self.sender = sender
+        self.admin_chat_id = settings.admin_chat_id
+        self.days = settings.auto_close_days
+        self.interval = max(1, settings.auto_close_interval_minutes) * 60
+
+    @property
+    def enabled(self) -> bool:
+        return self.days > 0
+
+    async def _notify_player(self, row: dict) -> str:
+        return await self.sender.send_message(
+            row["user_id"],
+            f"⌛ Твой тикет #{row['id']} закрыт автоматически: "
+            f"в нём не было сообщений {self.days} дн.\n"
+            "Если вопрос ещё актуален — создай новый тикет.",
+        )
+
+    async def _close_topic(self, row: dict) -> str:
+        """Пометить и закрыть тему тикета, вернуть SEND_* закрытия."""
+        sender = self.sender
+        chat_id = ticket_chat_id(self.settings, row)
+        thread_id = row["admin_thread_id"]
+        await sender.send_message(
+            chat_id,
+            f"⌛ Тикет закрыт автоматически: нет активности {self.days} дн.",
+            message_thread_id=thread_id,
+        )
+        return await sender.call(
+            chat_id,
+            lambda: sender.bot.close_forum_topic(
+                chat_id=chat_id, message_thread_id=thread_id
+            ),
+        )
+
+    async def sweep(self, bot: Bot) -> int:
+        """Один проход: возвращает число закрытых тикетов."""
+        if not self.enabled:
+            return 0
+
+        note = f"[Тикет закрыт автоматически: нет активности {self.days} дн.]"
+        # sender общий с рассылками, поэтому его stats — не итог этого прохода
+        players: Counter[str] = Counter()
+        topics: Counter[str] = Counter()
+        closed_ids: list[int] = []
+        started = time.monotonic()
+        while True:
+            rows = await close_inactive_tickets(self.days, note, limit=AUTO_CLOSE_BATCH)
+            if not rows:
+                break
+            closed_ids.extend(row["id"] for row in rows)
+            # в личку можно слать быстро, в группу — ~20 сообщений в минуту,
+            # поэтому сначала игроки, потом темы
+            for row in rows:
+                players[await self._notify_player(row)] += 1
+            for row in rows:
+                if row["admin_thread_id"]:
+                    topics[await self._close_topic(row)] += 1
+            await asyncio.sleep(AUTO_CLOSE_CHUNK_PAUSE)
+
+        if not closed_ids:
+            return 0
+
+        shown = ", ".join(f"#{ticket_id}" for ticket_id in closed_ids[:SUMMARY_MAX_IDS])
+        if len(closed_ids) > SUMMARY_MAX_IDS:
+            shown += f" и ещё {len(closed_ids) - SUMMARY_MAX_IDS}"
+        summary = (
+            f"⌛ Автозакрытие: закрыто тикетов без активности дольше "
+            f"{self.days} дн. — {len(closed_ids)}.\n{shown}\n\n"
+            f"Игроки: уведомлено {players[SEND_DELIVERED]}, "
+            f"бот заблокирован {players[SEND_BLOCKED]}, "
+            f"ошибок {players[SEND_FAILED]}.\n"
+            f"Темы: закрыто {topics[SEND_DELIVERED]} из {sum(topics.values())}."
+        )
+        await self.sender.send_message(self.admin_chat_id, summary)
+
+        LOGGER.info(
+            "⌛ Автозакрытие: закрыто %s тикетов за %.1f с",
+            len(closed_ids),
+            time.monotonic() - started,
+        )
+        return len(closed_ids)
+
+    async def run(self, bot: Bot):
+        LOGGER.info(
+            "⌛ Автозакрытие неактивных тикетов запущено: %s дн., проверка раз в %s мин",
+            self.days,
+            self.interval // 60,
+        )
+        while True:
+            try:
+                await self.sweep(bot)
+            except Exception as e:
+                LOGGER.exception("❌ Ошибка автозакрытия тикетов: %s", e)
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import Settings
+from db import (
+    BROADCAST_AUDIENCE_ACTIVE,
+    BROADCAST_AUDIENCE_ALL,
+    get_broadcast,
+    get_broadcast_recipients,
+    get_running_broadcast_ids,
+    save_broadcast_progress,
+    set_broadcast_status,
+)
+from services.progress import ProgressMessage
+from services.sender import SEND_BLOCKED, SEND_DELIVERED, RateLimitedSender
+
+LOGGER = logging.getLogger("support_bot.broadcast")
+
+BROADCAST_AUDIENCES = {
+    BROADCAST_AUDIENCE_ACTIVE: "игрокам с активными тикетами",
+    BROADCAST_AUDIENCE_ALL: "всем игрокам",
+}
+# Получателей в одной порции: после каждой порции курсор и счётчики
+# сохраняются в БД, так что после рестарта повторно уйдёт не больше порции.
+BROADCAST_CHUNK = 100
+# Одновременных запросов к Telegram: общий темп всё равно держит sender.
+BROADCAST_CONCURRENCY = 8
+BROADCAST_CALLBACK_PREFIX = "bc"
+# Как часто искать в БД рассылки, запущенные другим процессом.
+BROADCAST_POLL_INTERVAL = 10.0
+
+
+def build_stop_keyboard(broadcast_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="⏹ Остановить",
+                    callback_data=f"{BROADCAST_CALLBACK_PREFIX}:stop:{broadcast_id}",
+                )
+            ]
+        ]
+    )
+
+
+def render_progress(broadcast: dict, state: str) -> str:
+    processed = broadcast["delivered"] + broadcast["blocked"] + broadcast["failed"]
+    audience = BROADCAST_AUDIENCES.get(broadcast["audience"], broadcast["audience"])
+    return (
+        f"📢 Рассылка #{broadcast['id']} {audience} — {state}\n"
+        f"Обработано: {processed} из ~{broadcast['total']}\n"
+        f"✅ Доставлено: {broadcast['delivered']}\n"
+        f"🚫 Бот заблокирован: {broadcast['blocked']}\n"
+        f"⚠ Ошибок: {broadcast['failed']}"
+    )
+
+
+class BroadcastService:
+    """
+    Рассылки игрокам по команде /broadcast. Рассылки выполняются по одной
+    в фоновой задаче run(): получатели читаются из БД порциями по курсору
+    user_id, отправка идёт через общий для бота RateLimitedSender (с ним же
+    работает автозакрытие). Рассылки в статусе running после рестарта
+    продолжаются с сохранённого курсора.
+    """
+
+    def __init__(self, settings: Settings, sender: RateLimitedSender):
+        self.sender = sender
+        self.admin_chat_id = settings.admin_chat_id
+        self.project_name = settings.project_name
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+
+    def format_player_text(self, text: str) -> str:
+        return f"📢 Сообщение от администрации {self.project_name}:\n\n{text}"
+
+    def enqueue(self, broadcast_id: int):
+        self._queue.put_nowait(broadcast_id)
+
+    async def _send_chunk(
+        self, sender: RateLimitedSender, user_ids: list[int], text: str
+    ) -> list[str]:
+        semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+        async def send_one(user_id: int) -> str:
+            async with semaphore:
+                return await sender.send_message(user_id, text)
+
+        return await asyncio.gather(*(send_one(user_id) for user_id in user_ids))
+
+    async def _run_broadcast(self, bot: Bot, broadcast_id: int):
+        broadcast = await get_broadcast(broadcast_id)
+        if not broadcast or broadcast["status"] != "running":
+            return
+
+        progress = ProgressMessage(
+            bot,
+            self.admin_chat_id,
+            message_id=broadcast["progress_message_id"],
+            reply_markup=build_stop_keyboard(broadcast_id),
+        )
+        text = self.format_player_text(broadcast["text"])
+        started = time.monotonic()
+        await progress.update(render_progress(broadcast, "идёт…"), force=True)
+
+        finished = False
+        while True:
+            current = await get_broadcast(broadcast_id)
+            if not current or current["status"] != "running":
+                break
+
+            user_ids = await get_broadcast_recipients(
+                broadcast["audience"], broadcast["cursor_user_id"], BROADCAST_CHUNK
+            )
+            if not user_ids:
+                finished = True
+                break
+
+            for result in await self._send_chunk(self.sender, user_ids, text):
+                if result == SEND_DELIVERED:
+                    broadcast["delivered"] += 1
+                elif result == SEND_BLOCKED:
+                    broadcast["blocked"] += 1
+                else:
+                    broadcast["failed"] += 1
+            broadcast["cursor_user_id"] = user_ids[-1]
+            await save_broadcast_progress(
+                broadcast_id,
+                cursor_user_id=broadcast["cursor_user_id"],
+                delivered=broadcast["delivered"],
+                blocked=broadcast["blocked"],
+                failed=broadcast["failed"],
+                progress_message_id=progress.message_id,
+            )
+            await progress.update(render_progress(broadcast, "идёт…"))
+
+        if finished:
+            await set_broadcast_status(broadcast_id, "done", "running")
+        progress.reply_markup = None
+        await progress.update(
+            render_progress(broadcast, "завершена" if finished else "остановлена"),
+            force=True,
+        )
+        LOGGER.info(
+            "📢 Рассылка #%s %s за %.1f с: доставлено %s, заблокировали %s, ошибок %s",
+            broadcast_id,
+            "завершена" if finished else "остановлена",
+            time.monotonic() - started,
+            broadcast["delivered"],
+            broadcast["blocked"],
+            broadcast["failed"],
+        )
+
+    async def run(self, bot: Bot):
+        for broadcast_id in await get_running_broadcast_ids():
+            LOGGER.info("📢 Продолжаю рассылку #%s после перезапуска", broadcast_id)
+            self.enqueue(broadcast_id)
+
+        while True:
+            try:
+                broadcast_id = await asyncio.wait_for(
+                    self._queue.get(), BROADCAST_POLL_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                # в режиме WORKERS рассылку запускают из процесса-обработчика
+                for broadcast_id in await get_running_broadcast_ids():
+                    self.enqueue(broadcast_id)
+                continue
+            try:
+                await self._run_broadcast(bot, broadcast_id)
+            except Exception as e:
+                LOGGER.exception("❌ Ошибка рассылки #%s: %s", broadcast_id, e)
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from config import Settings
+from db import (
+    get_dashboard_counters,
+    get_dashboard_message_id,
+    set_dashboard_message_id,
+)
+from services.assignment import ShiftAdmin
+from services.events import EventBus, TicketEvent
+from services.templates import TELEGRAM_TEXT_LIMIT, truncate_utf16
+
+LOGGER = logging.getLogger("support_bot.dashboard")
+
+# Как часто проверять, были ли события тикетов (без запросов к БД).
+DASHBOARD_CHECK_INTERVAL = 1.0
+DASHBOARD_STATUSES = (("open", "🟢 Открытые"), ("in_work", "🟡 В работе"))
+
+
+async def build_dashboard_text() -> str:
+    from handlers.common import category_title, topic_link
+
+    counters = await get_dashboard_counters()
+    queues: dict[tuple[str, str | None], int] = counters["queues"]
+
+    lines = ["📌 Дашборд тикетов\n"]
+    for status, title in DASHBOARD_STATUSES:
+        by_category = sorted(
+            (
+                (category, count)
+                for (row_status, category), count in queues.items()
+                if row_status == status
+            ),
+            key=lambda item: (-item[1], category_title(item[0])),
+        )
+        lines.append(f"{title}: {sum(count for _, count in by_category)}")
+        for category, count in by_category:
+            lines.append(f"  • {category_title(category)}: {count}")
+    if counters["unpublished"]:
+        lines.append(f"⏳ Ждут создания темы: {counters['unpublished']}")
+    if counters["publish_failed"]:
+        lines.append(
+            f"❗ Ошибка публикации: {counters['publish_failed']} (/republish ID)"
+        )
+
+    oldest = counters["oldest_waiting"]
+    lines.append("")
+    if oldest is None:
+        lines.append("✅ Все активные тикеты получили ответ.")
+    else:
+        link = topic_link(oldest["admin_chat_id"], oldest["admin_thread_id"])
+        assignee = oldest.get("assigned_admin_username")
+        lines.append(
+            f"⏰ Дольше всех ждёт ответа: #{oldest['id']} "
+            f"[{category_title(oldest['category'])}] с {oldest['created_at']}"
+            + (f", у @{assignee}" if assignee else ", без исполнителя")
+            + (f" — {link}" if link else "")
+        )
+
+    lines.append("")
+    if counters["load"]:
+        lines.append("👥 Нагрузка исполнителей:")
+        for row in counters["load"]:
+            admin = ShiftAdmin(row["admin_id"], row["admin_username"])
+            lines.append(f"• {admin.title}: {row['tickets_count']}")
+    else:
+        lines.append("👥 Активных тикетов с исполнителем нет.")
+
+    return truncate_utf16("\n".join(lines), TELEGRAM_TEXT_LIMIT)
+
+
+class DashboardService:
+    """
+    Закреплённое сообщение-дашборд в основном админ-чате: очереди по статусам
+    и категориям, самый старый тикет без ответа и нагрузка исполнителей.
+    Сообщение редактируется не чаще DASHBOARD_INTERVAL_SECONDS и только если
+    с прошлого раза были события тикетов (services/events.py) и текст стал
+    другим. В режиме WORKERS тикеты меняют другие процессы, поэтому счётчики
+    перечитываются на каждом интервале. message_id хранится в admin_dashboards:
+    /dashboard в любом процессе публикует новый дашборд, лидер подхватывает
+    его из БД.
+    """
+
+    def __init__(self, settings: Settings):
+        self.admin_chat_id = settings.admin_chat_id
+        self.interval = settings.dashboard_interval_seconds
+        self.track_events = settings.workers == 0
+        self.message_id: int | None = None
+        self._last_text = ""
+        self._dirty = True
+        self._last_refresh = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def subscribe(self, events: EventBus):
+        events.subscribe(self.ticket_changed, TicketEvent, name="dashboard")
+
+    def ticket_changed(self, event: TicketEvent):
+        self._dirty = True
+
+    async def _pin(self, bot: Bot, message_id: int):
+        try:
+            await bot.pin_chat_message(
+                self.admin_chat_id, message_id, disable_notification=True
+            )
+        except Exception as e:
+            LOGGER.warning("⚠️ Не удалось закрепить дашборд: %s", e)
+
+    async def publish(self, bot: Bot, text: str | None = None) -> int:
+        """Новый дашборд вместо прежнего: отправить, закрепить, запомнить."""
+        previous = await get_dashboard_message_id(self.admin_chat_id)
+        text = text or await build_dashboard_text()
+        sent = await bot.send_message(self.admin_chat_id, text)
+        await set_dashboard_message_id(self.admin_chat_id, sent.message_id)
+        await self._pin(bot, sent.message_id)
+        if previous is not None:
+            try:
+                await bot.unpin_chat_message(self.admin_chat_id, message_id=previous)
+            except Exception as e:
+                LOGGER.debug("Не удалось открепить прежний дашборд: %s", e)
+        self.message_id = sent.message_id
+        self._last_text = text
+        LOGGER.info(
+            "📌 Дашборд опубликован в чате %s (message_id=%s)",
+            self.admin_chat_id,
+            sent.message_id,
+        )
+        return sent.message_id
+
+    async def refresh(self, bot: Bot) -> bool:
+        """Обновить дашборд, если тикеты менялись. True — сообщение изменено."""
+        if self.track_events and not self._dirty:
+            return False
+        # сбрасываем до запросов: события во время отрисовки не потеряются
+        self._dirty = False
+        self._last_refresh = time.monotonic()
+
+        text = await build_dashboard_text()
+        message_id = await get_dashboard_message_id(self.admin_chat_id)
+        if message_id is None:
+            await self.publish(bot, text)
+            return True
+        if text == self._last_text and message_id == self.message_id:
+            return False
+
+        self.message_id = message_id
+        try:
+            await bot.edit_message_text(
+                text, chat_id=self.admin_chat_id, message_id=message_id
+            )
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                self._last_text = text
+                return False
+            if "message to edit not found" not in str(e):
+                raise
+            # дашборд удалили из чата — публикуем заново
+            await self.publish(bot, text)
+            return True
+        self._last_text = text
+        return True
+
+    def _due(self) -> bool:
+        if time.monotonic() - self._last_refresh < self.interval:
+            return False
+        return not self.track_events or self._dirty
+
+    async def run(self, bot: Bot):
+        LOGGER.info(
+            "📌 Дашборд админ-чата запущен, обновление не чаще раза в %s с",
+            self.interval,
+        )
+        while True:
+            if self._due():
+                try:
+                    await self.refresh(bot)
+                except Exception as e:
+                    LOGGER.exception("❌ Ошибка обновления дашборда: %s", e)
+                    # повторить через интервал, даже если тикеты не менялись
+                    self._dirty = True
+            await asyncio.sleep(DASHBOARD_CHECK_INTERVAL)
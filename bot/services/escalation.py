@@ -0,0 +1,138 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+
+from config import Settings
+from db import get_escalation_candidates, set_ticket_escalation_level
+from services.ticket_chats import ticket_chat_id
+
+LOGGER = logging.getLogger("support_bot.escalation")
+
+DEFAULT_POLICY = "*"
+# Тикетов за один проход: остальные доберутся на следующих тиках.
+ESCALATION_BATCH = 50
+ESCALATION_SEND_PAUSE = 0.1
+SUMMARY_MAX_LINES = 30
+
+
+class EscalationService:
+    """
+    Эскалация тикетов, которые ждут первого ответа админа дольше порога
+    своей категории (ESCALATION_MINUTES). Первый уровень — пинг в теме тикета,
+    следующие — общая сводка в админ-чат. Уровень хранится в tickets.escalation_level,
+    поэтому каждый тикет эскалируется на каждый уровень не больше одного раза.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.admin_chat_id = settings.admin_chat_id
+        self.policies = dict(settings.escalation_minutes)
+        self.interval = max(10, settings.escalation_interval_seconds)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.policies)
+
+    def thresholds_for(self, category: str | None) -> tuple[int, ...]:
+        return self.policies.get(category or "", self.policies.get(DEFAULT_POLICY, ()))
+
+    def _scopes(self) -> list[tuple[str | None, tuple[str, ...], tuple[int, ...]]]:
+        explicit = [c for c in self.policies if c != DEFAULT_POLICY]
+        scopes = [(category, (), self.policies[category]) for category in explicit]
+        if DEFAULT_POLICY in self.policies:
+            scopes.append((None, tuple(explicit), self.policies[DEFAULT_POLICY]))
+        return scopes
+
+    async def _ping_topic(self, bot: Bot, row: dict, threshold: int):
+        from handlers.common import format_duration
+
+        assignee = row.get("assigned_admin_username")
+        if assignee:
+            who = f"Исполнитель: @{assignee}, ответь игроку."
+        elif row.get("assigned_admin_id"):
+            who = "Исполнитель назначен, но ещё не ответил игроку."
+        else:
+            who = "Исполнитель не назначен — возьмите тикет в работу."
+        try:
+            await bot.send_message(
+                chat_id=ticket_chat_id(self.settings, row),
+                message_thread_id=row["admin_thread_id"],
+                text=(
+                    f"⏰ Тикет #{row['id']} ждёт первого ответа уже "
+                    f"{format_duration(row['waiting_seconds'])} "
+                    f"(порог {format_duration(threshold * 60)}).\n{who}"
+                ),
+            )
+        except Exception as e:
+            LOGGER.warning("⚠️ Не удалось отправить эскалацию в тему тикета #%s: %s", row["id"], e)
+
+    async def _send_summary(self, bot: Bot, rows: list[dict]):
+        from handlers.common import category_title, format_duration, topic_link
+
+        lines = [f"🚨 Тикеты без ответа дольше порога: {len(rows)}"]
+        for row in rows[:SUMMARY_MAX_LINES]:
+            link = topic_link(
+                ticket_chat_id(self.settings, row), row["admin_thread_id"]
+            )
+            assignee = row.get("assigned_admin_username")
+            lines.append(
+                f"• #{row['id']} [{category_title(row['category'])}] "
+                f"{format_duration(row['waiting_seconds'])}"
+                + (f", у @{assignee}" if assignee else ", без исполнителя")
+                + (f" — {link}" if link else "")
+            )
+        if len(rows) > SUMMARY_MAX_LINES:
+            lines.append(f"…и ещё {len(rows) - SUMMARY_MAX_LINES}")
+        try:
+            await bot.send_message(self.admin_chat_id, "\n".join(lines))
+        except Exception as e:
+            LOGGER.warning("⚠️ Не удалось отправить сводку эскалаций: %s", e)
+
+    async def tick(self, bot: Bot) -> int:
+        """Один проход: возвращает число эскалированных тикетов."""
+        if not self.enabled:
+            return 0
+
+        rows = await get_escalation_candidates(self._scopes(), limit=ESCALATION_BATCH)
+        summary = []
+        escalated = 0
+        for row in rows:
+            thresholds = self.thresholds_for(row["category"])
+            waiting = row["waiting_seconds"] or 0
+            level = sum(1 for minutes in thresholds if waiting >= minutes * 60)
+            if level <= row["escalation_level"]:
+                continue
+            if not await set_ticket_escalation_level(row["id"], level):
+                continue
+
+            escalated += 1
+            if level == 1 and row["admin_thread_id"]:
+                await self._ping_topic(bot, row, thresholds[0])
+                await asyncio.sleep(ESCALATION_SEND_PAUSE)
+            else:
+                summary.append(row)
+
+        if summary:
+            await self._send_summary(bot, summary)
+        if escalated:
+            LOGGER.info(
+                "⏰ Эскалировано тикетов: %s (в сводке: %s)", escalated, len(summary)
+            )
+        return escalated
+
+    async def run(self, bot: Bot):
+        LOGGER.info(
+            "⏰ Эскалация тикетов без ответа запущена (%s), проверка раз в %s с",
+            ", ".join(
+                f"{category}: {'/'.join(map(str, levels))} мин"
+                for category, levels in sorted(self.policies.items())
+            ),
+            self.interval,
+        )
+        while True:
+            try:
+                await self.tick(bot)
+            except Exception as e:
+                LOGGER.exception("❌ Ошибка эскалации тикетов: %s", e)
+            await asyncio.sleep(self.interval)
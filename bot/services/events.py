@@ -0,0 +1,165 @@
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+LOGGER = logging.getLogger("support_bot.events")
+
+# Событий в очереди подписчика: дальше новые теряются (с записью в лог).
+EVENT_QUEUE_SIZE = 1000
+
+# Кто закрыл тикет (TicketClosed.reason)
+CLOSED_BY_ADMIN = "admin"
+CLOSED_BY_INACTIVITY = "inactivity"
+
+
+# ==========================
+#  События тикетов
+# ==========================
+
+
+@dataclass(frozen=True)
+class TicketEvent:
+    ticket_id: int
+
+
+@dataclass(frozen=True)
+class TicketCreated(TicketEvent):
+    user_id: int
+    category: str | None
+
+
+@dataclass(frozen=True)
+class TicketPublished(TicketEvent):
+    """Тема и пост тикета появились в админ-чате."""
+
+
+@dataclass(frozen=True)
+class TicketAssigned(TicketEvent):
+    admin_id: int
+    admin_username: str | None
+    # назначен AssignmentEngine, а не кнопкой «Взять в работу»
+    auto: bool = False
+
+
+@dataclass(frozen=True)
+class TicketMessageAdded(TicketEvent):
+    # user | admin
+    sender: str
+
+
+@dataclass(frozen=True)
+class TicketStatusChanged(TicketEvent):
+    status: str
+
+
+@dataclass(frozen=True)
+class TicketClosed(TicketStatusChanged):
+    status: str = "closed"
+    reason: str = CLOSED_BY_ADMIN
+
+
+@dataclass(frozen=True)
+class TicketDeleted(TicketEvent):
+    """Тикет удалён по сроку хранения (services/retention.py)."""
+
+
+# Имя события для внешних систем (вебхук) — по точному классу:
+# TicketClosed — не status_changed.
+TICKET_EVENT_NAMES: dict[type, str] = {
+    TicketCreated: "ticket.created",
+    TicketPublished: "ticket.published",
+    TicketAssigned: "ticket.assigned",
+    TicketMessageAdded: "ticket.message",
+    TicketStatusChanged: "ticket.status_changed",
+    TicketClosed: "ticket.closed",
+    TicketDeleted: "ticket.deleted",
+}
+
+
+EventHandler = Callable[[Any], Awaitable[None] | None]
+
+
+class Subscriber:
+    """Очередь и задача одного подписчика: события обрабатываются по порядку."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: EventHandler,
+        event_types: tuple[type, ...],
+        maxsize: int,
+    ):
+        self.name = name
+        self.handler = handler
+        self.event_types = event_types
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self._task: asyncio.Task | None = None
+
+    def offer(self, event: TicketEvent):
+        if self._task is None or self._task.done():
+            # задача наследует контекст публикующей: в TENANTS — БД её проекта
+            self._task = asyncio.create_task(self._run(), name=f"events_{self.name}")
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            LOGGER.warning(
+                "⚠️ Очередь подписчика %s переполнена, событие потеряно: %s "
+                "(всего потеряно: %s)",
+                self.name,
+                event,
+                self.dropped,
+            )
+
+    async def _run(self):
+        while True:
+            event = await self.queue.get()
+            try:
+                result = self.handler(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                LOGGER.exception(
+                    "❌ Подписчик %s не обработал событие %s", self.name, event
+                )
+            finally:
+                self.queue.task_done()
+
+
+class EventBus:
+    """
+    Шина событий тикетов внутри процесса. Переходы в db.py (создан,
+    опубликован, назначен, новое сообщение, смена статуса, закрыт, удалён)
+    публикуются сюда, а подписчики обрабатывают их в своих задачах через
+    ограниченные очереди, не задерживая хендлер, который сделал запись.
+    События одного процесса: в режиме WORKERS каждый процесс видит только
+    свои записи.
+    """
+
+    def __init__(self):
+        self._subscribers: list[Subscriber] = []
+
+    def subscribe(
+        self,
+        handler: EventHandler,
+        *event_types: type,
+        name: str,
+        maxsize: int = EVENT_QUEUE_SIZE,
+    ) -> Subscriber:
+        """handler получает события указанных типов (и их подтипов)."""
+        subscriber = Subscriber(name, handler, event_types or (TicketEvent,), maxsize)
+        self._subscribers.append(subscriber)
+        return subscriber
+
+    def publish(self, event: TicketEvent):
+        for subscriber in self._subscribers:
+            if isinstance(event, subscriber.event_types):
+                subscriber.offer(event)
+
+    async def drain(self):
+        """Дождаться, пока подписчики обработают уже опубликованные события."""
+        for subscriber in self._subscribers:
+            await subscriber.queue.join()
@@ -0,0 +1,212 @@
+import gzip
+import html
+import json
+import os
+import tempfile
+from contextlib import aclosing
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, TextIO
+
+from db import iter_ticket_export_rows
+
+EXPORT_FORMATS = ("jsonl", "html", "txt")
+# Лимит Telegram Bot API на отправку документа ботом.
+TELEGRAM_DOCUMENT_LIMIT = 50 * 1024 * 1024
+# Сколько строк копим перед записью в gzip, чтобы не дёргать zlib на каждое сообщение.
+WRITE_BATCH_ROWS = 500
+
+HTML_HEAD = (
+    "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+    "<title>{title}</title><style>"
+    "body{{font-family:sans-serif;max-width:900px;margin:auto}}"
+    ".t{{border-top:2px solid #888;margin-top:2em}}"
+    ".m{{margin:.6em 0;white-space:pre-wrap}}"
+    ".user b{{color:#1565c0}}.admin b{{color:#2e7d32}}"
+    "</style></head><body><h1>{title}</h1>\n"
+)
+HTML_TAIL = "</body></html>\n"
+
+
+@dataclass
+class ExportResult:
+    path: str
+    filename: str
+    tickets: int
+    messages: int
+    size: int
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return str(value)
+
+
+def _ticket_fields(row: dict) -> dict:
+    return {
+        "id": row["ticket_id"],
+        "user_id": row["user_id"],
+        "username": row["username"],
+        "category": row["category"],
+        "topic": row["topic"],
+        "status": row["status"],
+        "assignee": row["assigned_admin_username"],
+        "created_at": row["ticket_created_at"],
+    }
+
+
+# --- форматы: (начало тикета, сообщение) -> строки файла ---
+
+
+def _jsonl_ticket(row: dict, category: str, status: str) -> str:
+    del category, status  # в JSONL остаются исходные коды
+    record = {"type": "ticket", **_ticket_fields(row)}
+    return json.dumps(
+        record, ensure_ascii=False, separators=(",", ":"), default=_json_default
+    ) + "\n"
+
+
+def _jsonl_message(row: dict) -> str:
+    record = {
+        "type": "message",
+        "ticket_id": row["ticket_id"],
+        "id": row["msg_id"],
+        "sender": row["sender"],
+        "created_at": row["created_at"],
+        "text": row["text"],
+    }
+    return json.dumps(
+        record, ensure_ascii=False, separators=(",", ":"), default=_json_default
+    ) + "\n"
+
+
+def _txt_ticket(row: dict, category: str, status: str) -> str:
+    assignee = row["assigned_admin_username"]
+    return (
+        f"\n{'=' * 40}\n"
+        f"Тикет #{row['ticket_id']} — {status}\n"
+        f"Категория: {category}\n"
+        f"От: @{row['username'] or 'без username'} (user_id: {row['user_id']})\n"
+        f"Исполнитель: {'@' + assignee if assignee else 'не назначен'}\n"
+        f"Тема: {row['topic']}\n"
+        f"Создан: {row['ticket_created_at']}\n"
+        f"{'=' * 40}\n"
+    )
+
+
+def _txt_message(row: dict) -> str:
+    who = "Игрок" if row["sender"] == "user" else "Админ"
+    return f"\n[{row['created_at']}] {who}:\n{row['text']}\n"
+
+
+def _html_ticket(row: dict, category: str, status: str) -> str:
+    esc = html.escape
+    assignee = row["assigned_admin_username"]
+    return (
+        f"<div class=\"t\"><h2>Тикет #{row['ticket_id']} — "
+        f"{esc(status)}</h2><p>"
+        f"Категория: {esc(category)}<br>"
+        f"От: @{esc(row['username'] or 'без username')} "
+        f"(user_id: {row['user_id']})<br>"
+        f"Исполнитель: {esc('@' + assignee if assignee else 'не назначен')}<br>"
+        f"Тема: {esc(row['topic'])}<br>"
+        f"Создан: {row['ticket_created_at']}</p></div>\n"
+    )
+
+
+def _html_message(row: dict) -> str:
+    who = "Игрок" if row["sender"] == "user" else "Админ"
+    return (
+        f"<div class=\"m {row['sender']}\"><b>{who}</b> "
+        f"<small>{row['created_at']}</small><br>{html.escape(row['text'])}</div>\n"
+    )
+
+
+FORMATTERS: dict[
+    str, tuple[Callable[[dict, str, str], str], Callable[[dict], str]]
+] = {
+    "jsonl": (_jsonl_ticket, _jsonl_message),
+    "txt": (_txt_ticket, _txt_message),
+    "html": (_html_ticket, _html_message),
+}
+
+
+def _write_chunk(out: TextIO, chunk: list[str]):
+    out.write("".join(chunk))
+    chunk.clear()
+
+
+async def export_tickets(
+    fmt: str,
+    *,
+    filename_stem: str,
+    title: str,
+    ticket_id: int | None = None,
+    user_id: int | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+) -> ExportResult:
+    """
+    Выгрузить тикеты в gzip-файл во временной директории.
+    Строки БД читаются потоком и сразу пишутся в файл небольшими пачками,
+    так что в памяти одновременно не больше WRITE_BATCH_ROWS сообщений.
+    Файл удаляет вызывающий (после отправки).
+    """
+    # handlers импортируют этот модуль, поэтому справочники — лениво
+    from handlers.common import category_title, status_title
+
+    if fmt not in FORMATTERS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+    format_ticket, format_message = FORMATTERS[fmt]
+
+    fd, path = tempfile.mkstemp(prefix="export_", suffix=f".{fmt}.gz")
+    os.close(fd)
+
+    tickets = 0
+    messages = 0
+    current_ticket = None
+    chunk: list[str] = []
+    try:
+        with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as out:
+            if fmt == "html":
+                chunk.append(HTML_HEAD.format(title=html.escape(title)))
+
+            rows = iter_ticket_export_rows(
+                ticket_id=ticket_id,
+                user_id=user_id,
+                created_from=created_from,
+                created_to=created_to,
+            )
+            async with aclosing(rows):
+                async for row in rows:
+                    if row["ticket_id"] != current_ticket:
+                        current_ticket = row["ticket_id"]
+                        tickets += 1
+                        chunk.append(
+                            format_ticket(
+                                row,
+                                category_title(row["category"]),
+                                status_title(row["status"]),
+                            )
+                        )
+                    if row["msg_id"] is not None:
+                        messages += 1
+                        chunk.append(format_message(row))
+                    if len(chunk) >= WRITE_BATCH_ROWS:
+                        _write_chunk(out, chunk)
+
+            if fmt == "html":
+                chunk.append(HTML_TAIL)
+            _write_chunk(out, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return ExportResult(
+        path=path,
+        filename=f"{filename_stem}.{fmt}.gz",
+        tickets=tickets,
+        messages=messages,
+        size=os.path.getsize(path),
+    )
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import time
+from typing import Awaitable, Callable
+
+from config import Settings
+from db import acquire_lease, release_lease, renew_lease
+
+LOGGER = logging.getLogger("support_bot.leader")
+
+POLLER_LEASE = "poller"
+
+
+class LeaderElection:
+    """
+    Выбор единственного узла, который ведёт polling и фоновые задачи.
+    Роль — аренда в таблице bot_leases: лидер продлевает её каждые
+    LEADER_LEASE_SECONDS / 3, резервные узлы с той же частотой пытаются
+    забрать просроченную. Каждый захват увеличивает token, а продление
+    проходит только со своим token — так бывший лидер узнаёт, что роль ушла.
+    """
+
+    def __init__(self, settings: Settings, name: str = POLLER_LEASE):
+        self.name = name
+        self.ttl = max(3, settings.leader_lease_seconds)
+        self.interval = self.ttl / 3
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+        self.token: int | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.token is not None
+
+    async def wait_until_leader(self):
+        standby_logged = False
+        while True:
+            try:
+                token = await acquire_lease(self.name, self.holder, self.ttl)
+            except Exception as e:
+                LOGGER.warning("⚠️ Не удалось проверить аренду лидера: %s", e)
+                token = None
+            if token is not None:
+                self.token = token
+                LOGGER.info("👑 Узел %s стал лидером (token=%s)", self.holder, token)
+                return
+            if not standby_logged:
+                LOGGER.info(
+                    "⏸ Лидер уже работает, узел %s в резерве (проверка раз в %.0f с)",
+                    self.holder,
+                    self.interval,
+                )
+                standby_logged = True
+            await asyncio.sleep(self.interval)
+
+    async def keep_alive(self, on_lost: Callable[[], Awaitable]):
+        """
+        Продлевать аренду, пока узел лидер. Если её забрали или БД так долго
+        недоступна, что аренда вот-вот истечёт, — сложить полномочия через
+        on_lost() раньше, чем резервный узел сможет её захватить.
+        """
+        last_renewed = time.monotonic()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if await renew_lease(self.name, self.holder, self.token):
+                    last_renewed = time.monotonic()
+                    continue
+                LOGGER.error("❌ Аренду лидера забрал другой узел (token=%s)", self.token)
+            except Exception as e:
+                if time.monotonic() - last_renewed < self.ttl - self.interval:
+                    LOGGER.warning("⚠️ Не удалось продлить аренду лидера: %s", e)
+                    continue
+                LOGGER.error(
+                    "❌ Аренда лидера не продлевалась %.0f с, слагаю полномочия: %s",
+                    time.monotonic() - last_renewed,
+                    e,
+                )
+            self.token = None
+            await on_lost()
+            return
+
+    async def release(self):
+        if self.token is None:
+            return
+        try:
+            await release_lease(self.name, self.holder, self.token)
+            LOGGER.info("👋 Аренда лидера освобождена (token=%s)", self.token)
+        except Exception as e:
+            LOGGER.warning("⚠️ Не удалось освободить аренду лидера: %s", e)
+        self.token = None
@@ -0,0 +1,88 @@
+import logging
+
+from aiogram import Bot
+
+from config import Settings
+from db import get_ticket
+from services.ticket_chats import ticket_chat_id
+
+LOGGER = logging.getLogger("support_bot.notifications")
+
+
+class TicketNotifier:
+    """
+    Уведомления о закрытии тикета админом (/close и кнопка): игроку в ЛС
+    и в тему тикета, тема закрывается. Вызывается хендлером сразу после
+    записи в БД, а не через шину событий: её очереди при переполнении или
+    падении процесса теряют события, а уведомление должно дойти.
+    Автозакрытие уведомляет само, пачками (services/autoclose.py).
+    """
+
+    def __init__(self, settings: Settings, bot: Bot):
+        self.settings = settings
+        self.bot = bot
+
+    async def ticket_closed(self, ticket_id: int):
+        ticket = await get_ticket(ticket_id)
+        if ticket is None:
+            return
+        await self._notify_player(ticket)
+        if ticket["admin_thread_id"]:
+            await self._close_topic(ticket)
+
+    async def _notify_player(self, ticket: dict):
+        ticket_id = ticket["id"]
+        user_id = ticket["user_id"]
+        try:
+            await self.bot.send_message(
+                chat_id=user_id,
+                text=(
+                    f"✅ Твой тикет #{ticket_id} был закрыт администрацией.\n"
+                    f"Если проблема не решена — создай новый тикет."
+                ),
+            )
+            LOGGER.info(
+                "📤 Пользователь %s уведомлен о закрытии тикета #%s",
+                user_id,
+                ticket_id,
+            )
+        except Exception:
+            LOGGER.exception(
+                "❌ Не удалось уведомить пользователя о закрытии тикета #%s (user_id=%s)",
+                ticket_id,
+                user_id,
+            )
+
+    async def _close_topic(self, ticket: dict):
+        ticket_id = ticket["id"]
+        chat_id = ticket_chat_id(self.settings, ticket)
+        thread_id = ticket["admin_thread_id"]
+        try:
+            await self.bot.close_forum_topic(
+                chat_id=chat_id, message_thread_id=thread_id
+            )
+            LOGGER.info(
+                "🧵 Тема тикета #%s закрыта (thread_id=%s)", ticket_id, thread_id
+            )
+        except Exception:
+            LOGGER.exception(
+                "❌ Не удалось закрыть тему тикета #%s (thread_id=%s)",
+                ticket_id,
+                thread_id,
+            )
+
+        try:
+            await self.bot.send_message(
+                chat_id=chat_id,
+                message_thread_id=thread_id,
+                text="🔒 Тикет закрыт, тема закрыта.",
+            )
+            LOGGER.info(
+                "📣 В тему тикета #%s отправлено сообщение о закрытии",
+                ticket_id,
+            )
+        except Exception:
+            LOGGER.exception(
+                "❌ Не удалось отправить сообщение о закрытии в тему тикета #%s",
+                ticket_id,
+            )
@@ -0,0 +1,62 @@
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup
+
+LOGGER = logging.getLogger("support_bot.progress")
+
+# Как часто обновлять сообщение с прогрессом (лимиты Telegram на edit).
+PROGRESS_EDIT_INTERVAL = 5.0
+
+
+class ProgressMessage:
+    """
+    Сообщение с прогрессом в админ-чате: создаётся при первом обновлении
+    (или продолжает существующее message_id), дальше редактируется
+    не чаще PROGRESS_EDIT_INTERVAL. Ошибки Telegram не прерывают работу.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        chat_id: int,
+        *,
+        message_id: int | None = None,
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.reply_markup = reply_markup
+        self._last_text = ""
+        self._last_edit = 0.0
+
+    async def update(self, text: str, *, force: bool = False):
+        if text == self._last_text and not force:
+            return
+        now = time.monotonic()
+        if self.message_id and not force and now - self._last_edit < PROGRESS_EDIT_INTERVAL:
+            return
+
+        try:
+            if self.message_id is None:
+                sent = await self.bot.send_message(
+                    self.chat_id, text, reply_markup=self.reply_markup
+                )
+                self.message_id = sent.message_id
+            else:
+                await self.bot.edit_message_text(
+                    text,
+                    chat_id=self.chat_id,
+                    message_id=self.message_id,
+                    reply_markup=self.reply_markup,
+                )
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                LOGGER.warning("⚠️ Не удалось обновить сообщение с прогрессом: %s", e)
+        except Exception as e:
+            LOGGER.warning("⚠️ Не удалось отправить сообщение с прогрессом: %s", e)
+        self._last_text = text
+        self._last_edit = now
@@ -0,0 +1,361 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+    TelegramUnauthorizedError,
+)
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+
+from config import Settings
+from db import (
+    delete_ticket_relay_queue,
+    get_ticket_for_publication,
+    get_ticket_relay_queue,
+    get_unpublished_ticket_ids,
+    mark_ticket_published,
+    set_ticket_posted_photos,
+    set_ticket_publish_error,
+    set_ticket_thread,
+)
+from services.assignment import ShiftAdmin
+from services.templates import (
+    NEW_TICKET_FOOTER,
+    NEW_TICKET_HEADER,
+    NEW_TICKET_POST,
+    TELEGRAM_CAPTION_LIMIT,
+    TELEGRAM_TEXT_LIMIT,
+    TOPIC_NAME,
+    TOPIC_NAME_TOPIC_LIMIT,
+    as_caption_kwargs,
+    truncate_utf16,
+)
+from services.ticket_chats import pick_ticket_chat, stored_chat_id, ticket_chat_id
+
+LOGGER = logging.getLogger("support_bot.publisher")
+
+# Одновременно публикуемых тикетов: остальные ждут своей очереди.
+PUBLISH_CONCURRENCY = 4
+# Как часто искать в БД тикеты, созданные другим процессом (WORKERS)
+# или до рестарта.
+PUBLISH_POLL_INTERVAL = 2.0
+# Повтор после ошибки: 2, 4, 8, … секунд, но не реже раза в 5 минут.
+PUBLISH_RETRY_BASE = 2.0
+PUBLISH_RETRY_MAX = 300.0
+# Сообщений за один copyMessages (ограничение Bot API).
+RELAY_CHUNK = 100
+# Ошибки, которые повтор не исправит: неверный запрос, нет прав в чате.
+PUBLISH_FATAL_ERRORS = (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramUnauthorizedError,
+)
+
+
+def build_ticket_admin_keyboard(ticket_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="🛠 Взять в работу",
+                    callback_data=f"take_ticket:{ticket_id}",
+                ),
+                InlineKeyboardButton(
+                    text="✔ Закрыть тикет",
+                    callback_data=f"close_ticket:{ticket_id}",
+                ),
+            ]
+        ]
+    )
+
+
+class TicketPublisher:
+    """
+    Публикация новых тикетов в админ-чат: тема форума и пост с текстом,
+    фото и кнопками. Игрок получает ответ сразу после записи тикета в БД
+    (published = 0), а тема создаётся здесь, в фоне, с повторами при ошибках
+    Telegram. Неопубликованные тикеты подхватываются и после рестарта.
+    Сообщения, которые игрок написал, пока темы не было, ждут в
+    ticket_relay_queue и копируются в тему сразу после поста о тикете.
+    Публикует только лидер: в остальных процессах enqueue ничего не делает,
+    тикет найдёт опрос БД лидера. Ошибка, которую повтор не исправит
+    (PUBLISH_FATAL_ERRORS), сохраняется в tickets.publish_error: тикет ждёт
+    /republish, игрок и админ-чат получают уведомление.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.running = False
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+        self._in_flight: set[int] = set()
+        self._retry_pending: set[int] = set()
+        self._attempts: dict[int, int] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def enqueue(self, ticket_id: int):
+        if self.running:
+            self._queue.put_nowait(ticket_id)
+
+    def _retry_later(self, ticket_id: int, delay: float):
+        def retry():
+            self._retry_pending.discard(ticket_id)
+            self.enqueue(ticket_id)
+
+        self._retry_pending.add(ticket_id)
+        asyncio.get_running_loop().call_later(delay, retry)
+
+    async def publish(self, bot: Bot, ticket_id: int):
+        from handlers.common import category_title
+
+        ticket = await get_ticket_for_publication(ticket_id)
+        if ticket is None or ticket["publish_error"]:
+            return
+        if ticket["published"]:
+            # тема уже есть, осталась очередь сообщений игрока
+            await self.relay_queued(
+                bot,
+                ticket_id,
+                ticket_chat_id(self.settings, ticket),
+                ticket["admin_thread_id"],
+            )
+            return
+        if ticket["status"] == "closed":
+            # закрыли раньше, чем появилась тема, — публиковать уже нечего
+            await mark_ticket_published(ticket_id)
+            await self.relay_queued(bot, ticket_id, 0, None)
+            return
+
+        settings = self.settings
+        category = ticket["category"]
+        cat_title = category_title(category)
+        thread_id = ticket["admin_thread_id"]
+        if thread_id is None:
+            admin_chat_id = await pick_ticket_chat(settings, category)
+            forum_topic = await bot.create_forum_topic(
+                chat_id=admin_chat_id,
+                name=TOPIC_NAME.text(
+                    category=cat_title,
+                    ticket_id=ticket_id,
+                    topic=truncate_utf16(ticket["topic"], TOPIC_NAME_TOPIC_LIMIT),
+                ),
+            )
+            thread_id = forum_topic.message_thread_id
+            await set_ticket_thread(
+                ticket_id, thread_id, stored_chat_id(settings, admin_chat_id)
+            )
+        else:
+            # повтор: тема создана в прошлой попытке, не удалось отправить пост
+            admin_chat_id = ticket_chat_id(settings, ticket)
+
+        assignee_line = ""
+        if ticket["assigned_admin_id"]:
+            assignee = ShiftAdmin(
+                ticket["assigned_admin_id"], ticket["assigned_admin_username"]
+            )
+            assignee_line = f"\n\n🛠 В работе: {assignee.title}"
+
+        username = ticket["username"]
+        values = {
+            "ticket": f"#{ticket_id}",
+            "nickname": ticket["game_nickname"] or "не указан",
+            "category": cat_title,
+            "author": (
+                f"@{username}" if username else "без username",
+                ticket["user_id"],
+            ),
+            "user_id": ticket["user_id"],
+            "topic": ticket["topic"],
+            "text": ticket["text"] or "",
+        }
+        kb = build_ticket_admin_keyboard(ticket_id)
+        photo_ids: list[str] = ticket["photo_ids"]
+
+        if photo_ids:
+            header = NEW_TICKET_HEADER.render(limit=TELEGRAM_CAPTION_LIMIT, **values)
+            media = [InputMediaPhoto(media=file_id) for file_id in photo_ids]
+            media[0] = InputMediaPhoto(media=photo_ids[0], **as_caption_kwargs(header))
+            # повтор продолжает с неотправленных фото, а не шлёт альбом заново
+            for idx in range(ticket["posted_photos"], len(media), 10):
+                await bot.send_media_group(
+                    chat_id=admin_chat_id,
+                    message_thread_id=thread_id,
+                    media=media[idx : idx + 10],
+                )
+                await set_ticket_posted_photos(ticket_id, min(idx + 10, len(media)))
+
+            post = NEW_TICKET_FOOTER.render(assignee=assignee_line)
+        else:
+            post = NEW_TICKET_POST.render(
+                limit=TELEGRAM_TEXT_LIMIT, assignee=assignee_line, **values
+            )
+        await bot.send_message(
+            chat_id=admin_chat_id,
+            message_thread_id=thread_id,
+            reply_markup=kb,
+            **post.as_kwargs(),
+        )
+
+        await mark_ticket_published(ticket_id)
+        LOGGER.info(
+            "📨 Новый тикет #%s отправлен в чат %s (user_id=%s, thread_id=%s, photos=%s)",
+            ticket_id,
+            admin_chat_id,
+            ticket["user_id"],
+            thread_id,
+            len(photo_ids),
+        )
+        await self.relay_queued(bot, ticket_id, admin_chat_id, thread_id)
+
+    async def relay_queued(
+        self, bot: Bot, ticket_id: int, admin_chat_id: int, thread_id: int | None
+    ):
+        """Скопировать в тему сообщения игрока из ticket_relay_queue."""
+        rows = await get_ticket_relay_queue(ticket_id)
+        if not rows:
+            return
+        if thread_id is None:
+            # темы так и не появилось (тикет закрыли), в истории они есть
+            await delete_ticket_relay_queue([row["id"] for row in rows])
+            return
+
+        await bot.send_message(
+            chat_id=admin_chat_id,
+            message_thread_id=thread_id,
+            text=f"💬 Пока тема создавалась, игрок дописал в тикет #{ticket_id}:",
+        )
+        for idx in range(0, len(rows), RELAY_CHUNK):
+            chunk = rows[idx : idx + RELAY_CHUNK]
+            try:
+                await bot.copy_messages(
+                    chat_id=admin_chat_id,
+                    message_thread_id=thread_id,
+                    from_chat_id=chunk[0]["chat_id"],
+                    message_ids=[row["message_id"] for row in chunk],
+                )
+            except PUBLISH_FATAL_ERRORS as e:
+                # игрок заблокировал бота или удалил чат: текст остался в истории
+                LOGGER.warning(
+                    "⚠️ Не удалось скопировать сообщения игрока в тикет #%s: %s",
+                    ticket_id,
+                    e,
+                )
+            await delete_ticket_relay_queue([row["id"] for row in chunk])
+        LOGGER.info(
+            "📨 В тикет #%s переслано сообщений из очереди: %s", ticket_id, len(rows)
+        )
+
+    async def _publication_failed(self, bot: Bot, ticket_id: int, error: Exception):
+        """Остановить публикацию до /republish и сообщить игроку и админ-чату."""
+        if not await set_ticket_publish_error(ticket_id, str(error)):
+            # тема есть, не дошла очередь сообщений: текст остался в истории
+            rows = await get_ticket_relay_queue(ticket_id)
+            await delete_ticket_relay_queue([row["id"] for row in rows])
+            LOGGER.warning(
+                "⚠️ Очередь сообщений тикета #%s не переслана в тему: %s",
+                ticket_id,
+                error,
+            )
+            return
+
+        ticket = await get_ticket_for_publication(ticket_id)
+        if ticket is None:
+            return
+        try:
+            await bot.send_message(
+                chat_id=ticket["user_id"],
+                text=(
+                    f"⚠ Тикет #{ticket_id} пока не удалось передать администрации. "
+                    "Мы уже знаем о проблеме: всё, что ты напишешь в тикет, "
+                    "сохранится и дойдёт до админов, как только она будет исправлена."
+                ),
+            )
+        except Exception as e:
+            LOGGER.warning(
+                "⚠️ Не удалось уведомить игрока об ошибке публикации тикета #%s: %s",
+                ticket_id,
+                e,
+            )
+        try:
+            await bot.send_message(
+                chat_id=self.settings.admin_chat_id,
+                text=(
+                    f"❗ Не удалось опубликовать тикет #{ticket_id}: {error}\n"
+                    "Проверьте права бота и TICKET_CHATS, затем повторите: "
+                    f"/republish {ticket_id}"
+                ),
+            )
+        except Exception as e:
+            LOGGER.warning(
+                "⚠️ Не удалось сообщить админ-чату об ошибке публикации #%s: %s",
+                ticket_id,
+                e,
+            )
+
+    async def _publish(self, bot: Bot, ticket_id: int, semaphore: asyncio.Semaphore):
+        try:
+            async with semaphore:
+                await self.publish(bot, ticket_id)
+            self._attempts.pop(ticket_id, None)
+        except PUBLISH_FATAL_ERRORS as e:
+            self._attempts.pop(ticket_id, None)
+            LOGGER.error(
+                "❌ Тикет #%s не опубликован, повтор не поможет: %s", ticket_id, e
+            )
+            try:
+                await self._publication_failed(bot, ticket_id, e)
+            except Exception as save_error:
+                LOGGER.warning(
+                    "⚠️ Не удалось сохранить ошибку публикации тикета #%s: %s",
+                    ticket_id,
+                    save_error,
+                )
+                self._retry_later(ticket_id, PUBLISH_RETRY_MAX)
+        except Exception as e:
+            attempts = self._attempts.get(ticket_id, 0) + 1
+            self._attempts[ticket_id] = attempts
+            if isinstance(e, TelegramRetryAfter):
+                delay = float(e.retry_after)
+            else:
+                # степень ограничена: 2 ** 1024 не влезает во float
+                power = min(attempts - 1, 16)
+                delay = min(PUBLISH_RETRY_MAX, PUBLISH_RETRY_BASE * 2**power)
+            LOGGER.warning(
+                "⚠️ Тикет #%s не опубликован (попытка %s), повтор через %.0f с: %s",
+                ticket_id,
+                attempts,
+                delay,
+                e,
+            )
+            self._retry_later(ticket_id, delay)
+        finally:
+            self._in_flight.discard(ticket_id)
+
+    def _start(self, bot: Bot, ticket_ids: list[int], semaphore: asyncio.Semaphore):
+        for ticket_id in ticket_ids:
+            if ticket_id in self._in_flight or ticket_id in self._retry_pending:
+                continue
+            self._in_flight.add(ticket_id)
+            task = asyncio.create_task(self._publish(bot, ticket_id, semaphore))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def run(self, bot: Bot):
+        semaphore = asyncio.Semaphore(PUBLISH_CONCURRENCY)
+        self.running = True
+        while True:
+            try:
+                ticket_id = await asyncio.wait_for(
+                    self._queue.get(), PUBLISH_POLL_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                try:
+                    ticket_ids = await get_unpublished_ticket_ids()
+                except Exception as e:
+                    LOGGER.warning("⚠️ Не удалось получить неопубликованные тикеты: %s", e)
+                    continue
+                self._start(bot, ticket_ids, semaphore)
+                continue
+            self._start(bot, [ticket_id], semaphore)
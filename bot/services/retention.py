@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+from aiogram import Bot
+
+from config import Settings
+from db import (
+    count_ticket_messages,
+    delete_ticket_messages_chunk,
+    delete_tickets,
+    delete_user_profiles,
+    get_expired_ticket_ids,
+    get_orphan_user_profile_ids,
+)
+from services.progress import ProgressMessage
+
+LOGGER = logging.getLogger("support_bot.retention")
+
+DEFAULT_POLICY = "*"
+# Тикетов в одной пачке и сообщений в одном DELETE: маленькие транзакции
+# не держат блокировки заметное время.
+RETENTION_TICKETS_CHUNK = 200
+RETENTION_MESSAGES_CHUNK = 1000
+RETENTION_PROFILES_CHUNK = 500
+RETENTION_CHUNK_PAUSE = 0.5
+
+
+@dataclass
+class RetentionReport:
+    dry_run: bool
+    tickets: int = 0
+    messages: int = 0
+    profiles: int = 0
+    by_category: dict[str, int] = field(default_factory=dict)
+    finished: bool = False
+
+    def render(self) -> str:
+        mode = "🧪 Пробный прогон (ничего не удалено)" if self.dry_run else "🧹 Очистка"
+        verb = "к удалению" if self.dry_run else "удалено"
+        lines = [
+            f"{mode} по срокам хранения"
+            + (" — завершено" if self.finished else " — идёт…"),
+            f"Тикетов {verb}: {self.tickets}",
+            f"Сообщений {verb}: {self.messages}",
+            f"Профилей без тикетов {verb}: {self.profiles}",
+        ]
+        if self.by_category:
+            lines.append("")
+            lines.extend(
+                f"• {category}: {count}"
+                for category, count in sorted(self.by_category.items())
+            )
+        return "\n".join(lines)
+
+
+class RetentionService:
+    """
+    Удаление данных игроков по срокам хранения (RETENTION_DAYS по категориям).
+    Тикеты удаляются пачками по возрастанию id, их сообщения — заранее
+    отдельными маленькими DELETE, чтобы каскад не блокировал таблицы.
+    """
+
+    def __init__(self, settings: Settings):
+        self.admin_chat_id = settings.admin_chat_id
+        self.policies = dict(settings.retention_days)
+        self.dry_run = settings.retention_dry_run
+        self.interval = max(1, settings.retention_interval_hours) * 3600
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return any(days > 0 for days in self.policies.values())
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def describe_policies(self) -> str:
+        if not self.enabled:
+            return "сроки хранения не заданы (RETENTION_DAYS)"
+        parts = []
+        for category, days in sorted(self.policies.items()):
+            name = "остальные" if category == DEFAULT_POLICY else category
+            parts.append(f"{name}: {f'{days} дн.' if days > 0 else 'бессрочно'}")
+        return ", ".join(parts)
+
+    def _category_scopes(self):
+        """(метка, days, category, exclude_categories) для каждой политики."""
+        explicit = [c for c in self.policies if c != DEFAULT_POLICY]
+        for category in explicit:
+            yield category, self.policies[category], category, ()
+        if DEFAULT_POLICY in self.policies:
+            yield "остальные", self.policies[DEFAULT_POLICY], None, tuple(explicit)
+
+    async def _sweep_tickets(
+        self,
+        report: RetentionReport,
+        progress: ProgressMessage,
+        label: str,
+        days: int,
+        category: str | None,
+        exclude: tuple[str, ...],
+    ):
+        after_id = 0
+        while True:
+            ticket_ids = await get_expired_ticket_ids(
+                days,
+                category=category,
+                exclude_categories=exclude,
+                after_id=after_id,
+                limit=RETENTION_TICKETS_CHUNK,
+            )
+            if not ticket_ids:
+                return
+            after_id = ticket_ids[-1]
+
+            if report.dry_run:
+                report.messages += await count_ticket_messages(ticket_ids)
+                removed = len(ticket_ids)
+            else:
+                while True:
+                    deleted = await delete_ticket_messages_chunk(
+                        ticket_ids, RETENTION_MESSAGES_CHUNK
+                    )
+                    report.messages += deleted
+                    if deleted < RETENTION_MESSAGES_CHUNK:
+                        break
+                    await asyncio.sleep(RETENTION_CHUNK_PAUSE)
+                result = await delete_tickets(ticket_ids)
+                report.messages += result["archived_messages"]
+                removed = result["tickets"]
+
+            report.tickets += removed
+            report.by_category[label] = report.by_category.get(label, 0) + removed
+            await progress.update(report.render())
+            await asyncio.sleep(RETENTION_CHUNK_PAUSE)
+
+    async def _sweep_profiles(self, report: RetentionReport, progress: ProgressMessage):
+        days = min(days for days in self.policies.values() if days > 0)
+        after_id = 0
+        while True:
+            user_ids = await get_orphan_user_profile_ids(
+                days, after_id=after_id, limit=RETENTION_PROFILES_CHUNK
+            )
+            if not user_ids:
+                return
+            after_id = user_ids[-1]
+
+            if report.dry_run:
+                report.profiles += len(user_ids)
+            else:
+                report.profiles += await delete_user_profiles(user_ids)
+            await progress.update(report.render())
+            await asyncio.sleep(RETENTION_CHUNK_PAUSE)
+
+    async def sweep(self, bot: Bot, *, dry_run: bool | None = None) -> RetentionReport:
+        """
+        Один проход очистки. Прогресс публикуется в админ-чат,
+        только если есть что удалять.
+        """
+        report = RetentionReport(dry_run=self.dry_run if dry_run is None else dry_run)
+        if not self.enabled:
+            return report
+
+        async with self._lock:
+            progress = ProgressMessage(bot, self.admin_chat_id)
+            started = time.monotonic()
+            for label, days, category, exclude in self._category_scopes():
+                if days > 0:
+                    await self._sweep_tickets(
+                        report, progress, label, days, category, exclude
+                    )
+            await self._sweep_profiles(report, progress)
+
+            report.finished = True
+            if progress.message_id is not None:
+                await progress.update(report.render(), force=True)
+            LOGGER.info(
+                "🧹 Очистка по срокам хранения%s: тикетов %s, сообщений %s, "
+                "профилей %s за %.1f с",
+                " (dry-run)" if report.dry_run else "",
+                report.tickets,
+                report.messages,
+                report.profiles,
+                time.monotonic() - started,
+            )
+        return report
+
+    async def run(self, bot: Bot):
+        LOGGER.info(
+            "🧹 Очистка по срокам хранения запущена (%s%s), раз в %s ч",
+            self.describe_policies(),
+            ", dry-run" if self.dry_run else "",
+            self.interval // 3600,
+        )
+        while True:
+            try:
+                await self.sweep(bot)
+            except Exception as e:
+                LOGGER.exception("❌ Ошибка очистки по срокам хранения: %s", e)
+            await asyncio.sleep(self.interval)
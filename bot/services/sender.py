@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+
+LOGGER = logging.getLogger("support_bot.sender")
+
+# Лимиты Telegram: ~30 сообщений в секунду на бота, не больше одного
+# в секунду в один личный чат и ~20 в минуту в одну группу. Берём с запасом.
+GLOBAL_RATE = 25.0
+PRIVATE_CHAT_INTERVAL = 1.0
+GROUP_CHAT_INTERVAL = 3.0
+MAX_ATTEMPTS = 3
+# Когда чистить устаревшие отметки по чатам (рассылки идут по тысячам чатов).
+CHAT_SLOTS_PRUNE_SIZE = 10_000
+
+SEND_DELIVERED = "delivered"
+SEND_BLOCKED = "blocked"
+SEND_FAILED = "failed"
+
+
+class RateLimitedSender:
+    """
+    Массовые отправки в пределах лимитов Telegram. Каждый вызов бронирует
+    ближайший свободный слот (общий и по чату), поэтому отправлять можно
+    и последовательно, и из нескольких задач сразу. RetryAfter выжидается
+    и повторяется; результаты копятся в stats по SEND_*. Экземпляр один
+    на бота (create_services), иначе общий лимит превысят сразу несколько.
+    """
+
+    def __init__(self, bot: Bot, *, rate: float = GLOBAL_RATE):
+        self.bot = bot
+        self.stats: Counter[str] = Counter()
+        self._interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._chat_slots: dict[int, float] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _chat_interval(chat_id: int) -> float:
+        return GROUP_CHAT_INTERVAL if chat_id < 0 else PRIVATE_CHAT_INTERVAL
+
+    async def _wait_slot(self, chat_id: int):
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+            slot = max(slot, self._chat_slots.get(chat_id, 0.0))
+            self._chat_slots[chat_id] = slot + self._chat_interval(chat_id)
+            if len(self._chat_slots) > CHAT_SLOTS_PRUNE_SIZE:
+                self._chat_slots = {
+                    chat: at for chat, at in self._chat_slots.items() if at > now
+                }
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _postpone(self, chat_id: int, seconds: float):
+        async with self._lock:
+            resume = time.monotonic() + seconds
+            self._next_slot = max(self._next_slot, resume)
+            self._chat_slots[chat_id] = max(self._chat_slots.get(chat_id, 0.0), resume)
+
+    async def call(self, chat_id: int, request: Callable[[], Awaitable]) -> str:
+        """Выполнить запрос к Telegram в чат chat_id, вернуть SEND_*."""
+        result = SEND_FAILED
+        for _ in range(MAX_ATTEMPTS):
+            await self._wait_slot(chat_id)
+            try:
+                await request()
+                result = SEND_DELIVERED
+            except TelegramRetryAfter as e:
+                LOGGER.warning("⏳ Лимит Telegram, пауза %s с (chat_id=%s)", e.retry_after, chat_id)
+                await self._postpone(chat_id, e.retry_after)
+                continue
+            except TelegramForbiddenError:
+                result = SEND_BLOCKED
+            except TelegramBadRequest as e:
+                # игрок удалил чат с ботом / аккаунт удалён
+                if "chat not found" in str(e).lower():
+                    result = SEND_BLOCKED
+                else:
+                    LOGGER.warning("⚠️ Не удалось отправить в чат %s: %s", chat_id, e)
+            except Exception as e:
+                LOGGER.warning("⚠️ Не удалось отправить в чат %s: %s", chat_id, e)
+            break
+        self.stats[result] += 1
+        return result
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> str:
+        return await self.call(
+            chat_id, lambda: self.bot.send_message(chat_id, text, **kwargs)
+        )
@@ -0,0 +1,72 @@
+import math
+from dataclasses import dataclass, field
+
+from db import get_sla_samples
+
+# Окно, за которое считаются задержки в /stats.
+SLA_WINDOW_DAYS = 30
+SLA_PERCENTILES = (50, 90)
+
+
+def percentile(sorted_values: list[int], pct: int) -> int | None:
+    """Перцентиль по методу ближайшего ранга; значения уже отсортированы."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class LatencyStats:
+    tickets: int = 0
+    first_response: list[int] = field(default_factory=list)
+    time_to_close: list[int] = field(default_factory=list)
+
+    def add(self, row: dict):
+        self.tickets += 1
+        if row["first_response"] is not None:
+            self.first_response.append(max(0, int(row["first_response"])))
+        if row["time_to_close"] is not None:
+            self.time_to_close.append(max(0, int(row["time_to_close"])))
+
+    def finish(self):
+        self.first_response.sort()
+        self.time_to_close.sort()
+
+    def first_response_pct(self) -> tuple[int | None, ...]:
+        return tuple(percentile(self.first_response, p) for p in SLA_PERCENTILES)
+
+    def time_to_close_pct(self) -> tuple[int | None, ...]:
+        return tuple(percentile(self.time_to_close, p) for p in SLA_PERCENTILES)
+
+
+@dataclass
+class SlaReport:
+    days: int
+    total: LatencyStats = field(default_factory=LatencyStats)
+    by_category: dict[str, LatencyStats] = field(default_factory=dict)
+    # admin_id -> статистика по тикетам, где он исполнитель
+    by_admin: dict[int, LatencyStats] = field(default_factory=dict)
+    admin_usernames: dict[int, str | None] = field(default_factory=dict)
+
+
+async def build_sla_report(days: int = SLA_WINDOW_DAYS) -> SlaReport:
+    """
+    Перцентили задержек по тикетам за days дней. Считаются по колонкам
+    first_admin_reply_at / closed_at — без просмотра ticket_messages.
+    """
+    report = SlaReport(days=days)
+    for row in await get_sla_samples(days):
+        report.total.add(row)
+        category = row["category"] or "other"
+        report.by_category.setdefault(category, LatencyStats()).add(row)
+
+        admin_id = row["assigned_admin_id"]
+        if admin_id is not None:
+            report.by_admin.setdefault(admin_id, LatencyStats()).add(row)
+            report.admin_usernames[admin_id] = row["assigned_admin_username"]
+
+    report.total.finish()
+    for stats in (*report.by_category.values(), *report.by_admin.values()):
+        stats.finish()
+    return report
@@ -0,0 +1,216 @@
+import string
+import unicodedata
+from functools import lru_cache
+from typing import Any
+
+from aiogram.utils.formatting import Bold, Text, TextLink
+
+# Лимиты Telegram — в единицах UTF-16, а не в символах Python.
+TELEGRAM_TEXT_LIMIT = 4096
+TELEGRAM_CAPTION_LIMIT = 1024
+
+# Символы, которые продолжают предыдущий: между ними и соседом резать нельзя.
+ZWJ = "\u200d"
+KEYCAP = "\u20e3"
+
+
+def utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _is_regional_indicator(char: str) -> bool:
+    return 0x1F1E6 <= ord(char) <= 0x1F1FF
+
+
+def _extends_previous(text: str, index: int) -> bool:
+    """Символ text[index] — часть той же графемы, что и text[index - 1]."""
+    char = text[index]
+    code = ord(char)
+    if text[index - 1] == ZWJ or char == ZWJ or char == KEYCAP:
+        return True
+    if 0xFE00 <= code <= 0xFE0F or 0x1F3FB <= code <= 0x1F3FF:
+        # вариационные селекторы и оттенки кожи эмодзи
+        return True
+    if 0xE0020 <= code <= 0xE007F:
+        # теги флагов регионов (🏴 + теги)
+        return True
+    if unicodedata.combining(char) or unicodedata.category(char) in ("Mn", "Me"):
+        return True
+    if _is_regional_indicator(char):
+        # флаг — пара regional indicator: второй из пары продолжает первый
+        run = 0
+        while index - run - 1 >= 0 and _is_regional_indicator(text[index - run - 1]):
+            run += 1
+        return run % 2 == 1
+    return False
+
+
+def grapheme_boundary(text: str, index: int) -> int:
+    """Ближайшая к index слева граница графемы: срез text[:result] её не рвёт."""
+    index = min(max(index, 0), len(text))
+    while 0 < index < len(text) and _extends_previous(text, index):
+        index -= 1
+    return index
+
+
+def truncate_utf16(text: str, limit: int, suffix: str = "…") -> str:
+    """
+    Обрезать текст до limit единиц UTF-16 вместе с suffix, не разрывая
+    суррогатные пары и составные символы (эмодзи с модификаторами, флаги,
+    буквы с диакритикой).
+    """
+    if utf16_len(text) <= limit:
+        return text
+
+    budget = max(limit - utf16_len(suffix), 0)
+    used = 0
+    cut = len(text)
+    for index, char in enumerate(text):
+        used += 2 if ord(char) > 0xFFFF else 1
+        if used > budget:
+            cut = index
+            break
+    return text[: grapheme_boundary(text, cut)] + suffix
+
+
+class Template:
+    """
+    Шаблон текста для Telegram, разобранный один раз при импорте модуля.
+    Поля: {name} — как есть, {name:bold} — жирным, {name:mention} — ссылкой
+    на пользователя (значение — пара (текст, user_id)). render() собирает
+    Text с entities, так что пользовательский текст не нужно экранировать.
+    Поле truncate обрезается, чтобы весь текст влез в limit.
+    """
+
+    STYLES = ("", "bold", "mention")
+
+    def __init__(self, source: str, *, truncate: str | None = None):
+        self.parts: list[tuple[str, str | None, str]] = []
+        for literal, field, spec, _ in string.Formatter().parse(source):
+            if field is not None and spec not in self.STYLES:
+                raise ValueError(f"Неизвестный стиль поля {field!r}: {spec!r}")
+            self.parts.append((literal, field, spec or ""))
+        self.fields = {field for _, field, _ in self.parts if field is not None}
+        if truncate is not None and truncate not in self.fields:
+            raise ValueError(f"Поля {truncate!r} нет в шаблоне")
+        self.truncate = truncate
+
+    @staticmethod
+    def _plain(value: Any, style: str) -> str:
+        if style == "mention":
+            return str(value[0])
+        return str(value)
+
+    def _fit(self, values: dict[str, Any], limit: int | None) -> dict[str, Any]:
+        if limit is None or self.truncate is None:
+            return values
+        fixed = sum(
+            utf16_len(literal)
+            + (
+                utf16_len(self._plain(values[field], style))
+                if field is not None and field != self.truncate
+                else 0
+            )
+            for literal, field, style in self.parts
+        )
+        value = truncate_utf16(str(values[self.truncate]), max(limit - fixed, 0))
+        return {**values, self.truncate: value}
+
+    def render(self, *, limit: int | None = None, **values: Any) -> Text:
+        values = self._fit(values, limit)
+        nodes: list[Any] = []
+        for literal, field, style in self.parts:
+            if literal:
+                nodes.append(literal)
+            if field is None:
+                continue
+            value = values[field]
+            if style == "bold":
+                nodes.append(Bold(str(value)))
+            elif style == "mention":
+                title, user_id = value
+                nodes.append(TextLink(str(title), url=f"tg://user?id={user_id}"))
+            else:
+                nodes.append(str(value))
+        return Text(*nodes)
+
+    def text(self, *, limit: int | None = None, **values: Any) -> str:
+        """Тот же текст без entities — для мест, где он склеивается с другим."""
+        values = self._fit(values, limit)
+        return "".join(
+            literal + (self._plain(values[field], style) if field is not None else "")
+            for literal, field, style in self.parts
+        )
+
+    def cached_text(self, **values: Any) -> str:
+        """
+        text() с кэшем по значениям полей: строки неизменившихся тикетов
+        в списках /panel и /tickets не собираются заново.
+        """
+        return _render_cached(self, tuple(sorted(values.items())))
+
+
+@lru_cache(maxsize=4096)
+def _render_cached(template: Template, items: tuple[tuple[str, Any], ...]) -> str:
+    return template.text(**dict(items))
+
+
+def as_caption_kwargs(content: Text) -> dict[str, Any]:
+    return content.as_kwargs(text_key="caption", entities_key="caption_entities")
+
+
+# ==========================
+#  Тексты админ-чата
+# ==========================
+
+# Тема форума: Telegram ограничивает название 128 символами,
+# но в списке тем читается только начало.
+TOPIC_NAME = Template("[{category}] #{ticket_id}: {topic}")
+TOPIC_NAME_TOPIC_LIMIT = 30
+
+_NEW_TICKET_HEADER = (
+    "🆕 Новый тикет {ticket:bold}\n"
+    "Никнейм на сервере: {nickname}\n"
+    "Категория: {category}\n"
+    "От: {author:mention} (ID: {user_id:bold})\n"
+    "Тема: {topic}\n\n"
+    "{text}"
+)
+_NEW_TICKET_FOOTER = "Все ответы по этому тикету пишите в этой теме.{assignee}"
+
+# подпись к первому фото альбома
+NEW_TICKET_HEADER = Template(_NEW_TICKET_HEADER, truncate="text")
+# сообщение с кнопками: после альбома — только подвал, без фото — всё целиком
+NEW_TICKET_FOOTER = Template(_NEW_TICKET_FOOTER)
+NEW_TICKET_POST = Template(
+    _NEW_TICKET_HEADER + "\n\n" + _NEW_TICKET_FOOTER, truncate="text"
+)
+TICKET_TAKEN_NOTICE = Template(
+    "🛠 Тикет {ticket:bold} взят в работу админом: {admin:mention}."
+)
+
+HISTORY_HEADER_ADMIN = Template(
+    "📄 Тикет #{ticket_id} — {status}\n"
+    "Категория: {category}\n"
+    "От: @{username} (user_id: {user_id})\n"
+    "Исполнитель: {assignee}\n"
+    "Тема: {topic}\n"
+    "Создан: {created_at}\n\n"
+    "История сообщений:\n"
+)
+HISTORY_HEADER_PLAYER = Template(
+    "📄 Тикет #{ticket_id} — {status}\n"
+    "Категория: {category}\n"
+    "Тема: {topic}\n"
+    "Создан: {created_at}\n\n"
+    "История сообщений:\n"
+)
+
+TICKET_ROW = Template(
+    "#{ticket_id} — {topic} [{category}] "
+    "(user_id: {user_id}, status: {status}, {assignee}){mark}\n"
+)
+MY_TICKET_ROW = Template(
+    "#{ticket_id} — {topic} [{category}] "
+    "(status: {status}, user_id: {user_id}){mark}\n"
+)
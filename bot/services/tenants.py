@@ -0,0 +1,67 @@
+import asyncio
+import contextvars
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Coroutine
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.types import TelegramObject
+
+from config import Settings
+from db import use_backend
+from services.leader import LeaderElection
+from storage import StorageBackend
+
+# Проект, от имени которого выполняется задача: попадает в лог как [PROJECT_NAME]
+CURRENT_PROJECT: ContextVar[str] = ContextVar("current_project", default="")
+
+
+class Tenant:
+    """
+    Один проект в многопроектном процессе (TENANTS): настройки, БД, бот,
+    роль лидера и сервисы, которые получают его хендлеры.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        backend: StorageBackend,
+        bot: Bot,
+        services: dict[str, Any],
+    ):
+        self.settings = settings
+        self.backend = backend
+        self.bot = bot
+        self.services = services
+        self.leader = LeaderElection(settings)
+
+    def activate(self):
+        """Запросы к БД и лог текущей задачи — от имени этого проекта."""
+        use_backend(self.backend)
+        CURRENT_PROJECT.set(self.settings.project_name)
+
+    def spawn(self, coro: Coroutine, name: str) -> asyncio.Task:
+        """Задача проекта: она и задачи, созданные из неё, работают с его БД."""
+        context = contextvars.copy_context()
+        context.run(self.activate)
+        return asyncio.create_task(coro, name=name, context=context)
+
+
+class TenantMiddleware(BaseMiddleware):
+    """
+    Один Dispatcher на все боты процесса: по боту, получившему апдейт,
+    подставляет хендлерам settings и сервисы его проекта и выбирает его БД.
+    """
+
+    def __init__(self, tenants: list[Tenant]):
+        self.tenants = {tenant.bot.id: tenant for tenant in tenants}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        tenant = self.tenants[data["bot"].id]
+        tenant.activate()
+        data.update(tenant.services)
+        return await handler(event, data)
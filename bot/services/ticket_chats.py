@@ -0,0 +1,39 @@
+from config import Settings
+from db import count_active_tickets_by_chat
+
+# tickets.admin_chat_id основного админ-чата: тикеты, созданные до TICKET_CHATS,
+# и тикеты категорий без своего форума
+MAIN_ADMIN_CHAT = 0
+
+
+def stored_chat_id(settings: Settings, chat_id: int) -> int:
+    """Значение tickets.admin_chat_id для форума chat_id."""
+    return MAIN_ADMIN_CHAT if chat_id == settings.admin_chat_id else chat_id
+
+
+def ticket_chat_id(settings: Settings, ticket: dict) -> int:
+    """Форум, в котором живёт тема тикета."""
+    return ticket.get("admin_chat_id") or settings.admin_chat_id
+
+
+def category_chats(settings: Settings, category: str) -> tuple[int, ...]:
+    routes = settings.ticket_chats
+    return routes.get(category) or routes.get("*") or (settings.admin_chat_id,)
+
+
+async def pick_ticket_chat(settings: Settings, category: str) -> int:
+    """
+    Форум для темы нового тикета (TICKET_CHATS). Если у категории их
+    несколько, тикет уходит туда, где меньше всего открытых тикетов:
+    так нагрузка и лимиты Telegram на сообщения в чат делятся между ними.
+    """
+    chats = category_chats(settings, category)
+    if len(chats) == 1:
+        return chats[0]
+    load = await count_active_tickets_by_chat(
+        [stored_chat_id(settings, chat_id) for chat_id in chats]
+    )
+    # при равенстве — первый по порядку в TICKET_CHATS
+    return min(
+        chats, key=lambda chat_id: load.get(stored_chat_id(settings, chat_id), 0)
+    )
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from pydantic import BaseModel
+
+from config import Settings
+
+T = TypeVar("T")
+
+# Служебные расходы на запись сверх размера самого текста: ключ, кортежи, dict.
+ENTRY_OVERHEAD = 256
+
+
+def view_size(value: Any) -> int:
+    """Примерный размер отрисованного view в байтах."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, BaseModel):
+        return len(value.model_dump_json(exclude_none=True))
+    if isinstance(value, (tuple, list)):
+        return sum(view_size(item) for item in value)
+    return 64
+
+
+class ViewCache:
+    """
+    LRU отрисованных view: страниц истории тикета и списков /panel и
+    /tickets. Размер ограничен VIEW_CACHE_KB. Запись помнит версию данных
+    (db.DataVersions), из которых её отрисовали; другая версия — промах.
+    Версии знают только о записях своего процесса, поэтому в режиме
+    WORKERS кэш выключен.
+    """
+
+    def __init__(self, settings: Settings):
+        self.max_bytes = 0 if settings.workers > 0 else settings.view_cache_kb * 1024
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[Hashable, Any, int]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable, stamp: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != stamp:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, stamp: Hashable, value: Any):
+        if not self.enabled:
+            return
+        size = view_size(value) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        self.discard(key)
+        self._entries[key] = (stamp, value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+    def discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    async def get_or_render(
+        self,
+        key: Hashable,
+        stamp: Hashable,
+        render: Callable[[], Awaitable[T]],
+    ) -> T:
+        """
+        View из кэша или render(). stamp нужно взять до render(): если данные
+        изменятся во время отрисовки, запись сразу окажется устаревшей.
+        """
+        if not self.enabled:
+            return await render()
+        value = self.get(key, stamp)
+        if value is None:
+            value = await render()
+            self.put(key, stamp, value)
+        return value
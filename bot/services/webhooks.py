@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+
+import aiohttp
+
+from config import Settings
+from db import delete_webhook_events, get_webhook_batch
+from services.events import TICKET_EVENT_NAMES
+
+LOGGER = logging.getLogger("support_bot.webhooks")
+# Событий в одном POST; при очереди больше — следующая пачка сразу.
+WEBHOOK_BATCH_SIZE = 100
+WEBHOOK_TIMEOUT = 10.0
+# Повтор после ошибки: 2, 4, 8, … секунд, но не реже раза в 5 минут.
+WEBHOOK_RETRY_BASE = 2.0
+WEBHOOK_RETRY_MAX = 300.0
+
+
+class WebhookError(Exception):
+    pass
+
+
+def sign_payload(secret: str, timestamp: str, body: bytes) -> str:
+    """Подпись X-Webhook-Signature: HMAC-SHA256 от "<timestamp>." + тело."""
+    digest = hmac.new(
+        secret.encode("utf-8"), timestamp.encode("ascii") + b"." + body, hashlib.sha256
+    )
+    return "sha256=" + digest.hexdigest()
+
+
+class WebhookDispatcher:
+    """
+    Исходящий вебхук для внешних систем (WEBHOOK_URL): события тикетов
+    пишутся в webhook_outbox в той же транзакции, что и изменение тикета
+    (db.py, WEBHOOK_EVENTS), а лидер раз в WEBHOOK_FLUSH_SECONDS отправляет
+    их пачками, подписанными HMAC.
+    Событие удаляется из outbox только после ответа 2xx, при ошибке пачка
+    повторяется с растущей паузой, поэтому доставка «хотя бы один раз»:
+    получатель отбрасывает повторы по id события.
+    """
+
+    def __init__(self, settings: Settings):
+        self.url = settings.webhook_url
+        self.secret = settings.webhook_secret
+        self.project_name = settings.project_name
+        self.flush_seconds = max(0.1, settings.webhook_flush_seconds)
+        if self.url and not self.secret:
+            raise ValueError("WEBHOOK_SECRET обязателен, если задан WEBHOOK_URL")
+
+        known = set(TICKET_EVENT_NAMES.values())
+        unknown = [name for name in settings.webhook_events if name not in known]
+        if unknown:
+            raise ValueError(f"WEBHOOK_EVENTS: неизвестные события {unknown}")
+        self.event_names = tuple(
+            name
+            for name in TICKET_EVENT_NAMES.values()
+            if not settings.webhook_events or name in settings.webhook_events
+        )
+        self._failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    def build_body(self, rows: list[dict]) -> bytes:
+        events = [
+            {
+                "id": row["id"],
+                "type": row["event_type"],
+                "ticket_id": row["ticket_id"],
+                "created_at": str(row["created_at"]),
+                "data": json.loads(row["payload"]),
+            }
+            for row in rows
+        ]
+        body = {"project": self.project_name, "events": events}
+        return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+    async def flush(self, session: aiohttp.ClientSession) -> int:
+        """Отправить одну пачку из outbox: число доставленных событий."""
+        rows = await get_webhook_batch(WEBHOOK_BATCH_SIZE)
+        if not rows:
+            return 0
+
+        body = self.build_body(rows)
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "X-Webhook-Timestamp": timestamp,
+            "X-Webhook-Signature": sign_payload(self.secret, timestamp, body),
+        }
+        async with session.post(self.url, data=body, headers=headers) as response:
+            if not 200 <= response.status < 300:
+                raise WebhookError(f"HTTP {response.status}")
+
+        await delete_webhook_events([row["id"] for row in rows])
+        return len(rows)
+
+    async def run(self):
+        LOGGER.info(
+            "🔔 Вебхук событий тикетов запущен: %s, отправка раз в %s с (%s)",
+            self.url,
+            self.flush_seconds,
+            ", ".join(self.event_names),
+        )
+        timeout = aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                delay = self.flush_seconds
+                try:
+                    sent = await self.flush(session)
+                    if self._failures:
+                        LOGGER.info("✅ Вебхук снова доступен")
+                    self._failures = 0
+                    if sent == WEBHOOK_BATCH_SIZE:
+                        # в outbox накопилось больше пачки — не ждём интервал
+                        delay = 0
+                except Exception as e:
+                    self._failures += 1
+                    # степень ограничена: 2 ** 1024 не влезает во float
+                    power = min(self._failures - 1, 16)
+                    backoff = WEBHOOK_RETRY_BASE * 2**power
+                    delay = min(WEBHOOK_RETRY_MAX, backoff)
+                    LOGGER.warning(
+                        "⚠️ Вебхук не доставлен (попытка %s), повтор через %.0f с: %s",
+                        self._failures,
+                        delay,
+                        e,
+                    )
+                await asyncio.sleep(delay)
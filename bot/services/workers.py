@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from multiprocessing.process import BaseProcess
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import (
+    TelegramConflictError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from aiogram.types import Message, Update
+
+from config import Settings
+
+LOGGER = logging.getLogger("support_bot.workers")
+
+POLL_TIMEOUT = 10
+POLL_ERROR_PAUSE = 5.0
+WORKER_STOP_TIMEOUT = 30.0
+
+
+def shard_key(update: Update, admin_chat_ids: frozenset[int]) -> int:
+    """
+    Ключ разговора: в ЛС — user_id игрока, в админ-чатах — тема тикета
+    (0 — общий чат). Все апдейты одного разговора попадают в один процесс,
+    вместе с его альбомами, склейкой сообщений, кулдауном и FSM.
+    """
+    message = update.message or update.edited_message
+    user = None
+    if message is None and update.callback_query is not None:
+        user = update.callback_query.from_user
+        if isinstance(update.callback_query.message, Message):
+            message = update.callback_query.message
+    elif message is not None:
+        user = message.from_user
+
+    if message is not None and message.chat.id in admin_chat_ids:
+        return message.message_thread_id or 0
+    if user is not None:
+        return user.id
+    if message is not None:
+        return message.chat.id
+    return update.update_id
+
+
+class OrderedFeeder:
+    """
+    Обработка апдейтов в процессе-обработчике: разные разговоры идут
+    параллельно, апдейты одного разговора — строго по порядку.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot):
+        self.dp = dp
+        self.bot = bot
+        self._tails: dict[int, asyncio.Task] = {}
+
+    def submit(self, key: int, update: dict[str, Any]):
+        previous = self._tails.get(key)
+        task = asyncio.create_task(self._feed(previous, update))
+        self._tails[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+
+    def _forget(self, key: int, task: asyncio.Task):
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def _feed(self, previous: asyncio.Task | None, update: dict[str, Any]):
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        except Exception:
+            # aiogram уже записал исключение в лог (aiogram.event)
+            pass
+
+    async def drain(self):
+        if self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+
+def worker_log_path(index: int) -> str:
+    from bot import resolve_log_file_path
+
+    base, ext = os.path.splitext(resolve_log_file_path())
+    return f"{base}.worker{index}{ext or '.log'}"
+
+
+def run_worker(index: int, settings: Settings, queue: multiprocessing.Queue):
+    """Точка входа процесса-обработчика (multiprocessing, spawn)."""
+    from bot import configure_logging
+
+    configure_logging(worker_log_path(index))
+    try:
+        asyncio.run(_worker_main(index, settings, queue))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker_main(index: int, settings: Settings, queue: multiprocessing.Queue):
+    from bot import create_dispatcher
+    from db import close_db_pool, init_db_pool
+
+    await init_db_pool(settings)
+    bot = Bot(token=settings.bot_token)
+    dp = create_dispatcher(settings, bot)
+    feeder = OrderedFeeder(dp, bot)
+    loop = asyncio.get_running_loop()
+    LOGGER.info("🧵 Обработчик #%s запущен", index)
+    try:
+        while True:
+            item = await loop.run_in_executor(None, queue.get)
+            if item is None:
+                break
+            key, update = item
+            feeder.submit(key, update)
+        await feeder.drain()
+    finally:
+        await close_db_pool()
+        await bot.session.close()
+        LOGGER.info("🧵 Обработчик #%s остановлен", index)
+
+
+class WorkerPool:
+    """
+    Режим WORKERS: этот процесс только получает апдейты и раскладывает их
+    по N процессам-обработчикам по shard_key, у каждого своя очередь.
+    Упавший обработчик перезапускается, его очередь сохраняется.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.size = settings.workers
+        self._ctx = multiprocessing.get_context("spawn")
+        self._queues = [self._ctx.Queue() for _ in range(self.size)]
+        self._processes: list[BaseProcess | None] = [None] * self.size
+
+    def _spawn(self, index: int):
+        process = self._ctx.Process(
+            target=run_worker,
+            args=(index, self.settings, self._queues[index]),
+            name=f"support_bot_worker_{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+
+    def start(self):
+        for index in range(self.size):
+            self._spawn(index)
+        LOGGER.info("🧵 Запущено процессов-обработчиков: %s", self.size)
+
+    def ensure_alive(self):
+        for index, process in enumerate(self._processes):
+            if process is not None and not process.is_alive():
+                LOGGER.error(
+                    "❌ Обработчик #%s завершился (код %s), перезапускаю",
+                    index,
+                    process.exitcode,
+                )
+                self._spawn(index)
+
+    def route(self, update: Update):
+        key = shard_key(update, self.settings.admin_chat_ids)
+        payload = update.model_dump(mode="json", by_alias=True, exclude_none=True)
+        self._queues[key % self.size].put((key, payload))
+
+    async def poll(self, bot: Bot, stop: asyncio.Event, allowed_updates: list[str]):
+        """Long polling getUpdates, пока не выставлен stop."""
+        offset: int | None = None
+        while not stop.is_set():
+            try:
+                updates = await bot.get_updates(
+                    offset=offset,
+                    timeout=POLL_TIMEOUT,
+                    allowed_updates=allowed_updates,
+                )
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                continue
+            except (TelegramNetworkError, TelegramConflictError) as e:
+                LOGGER.warning("⚠️ Ошибка getUpdates: %s", e)
+                await asyncio.sleep(POLL_ERROR_PAUSE)
+                continue
+
+            for update in updates:
+                self.route(update)
+                offset = update.update_id + 1
+            self.ensure_alive()
+
+        if offset is not None:
+            # подтвердить Telegram последние разосланные апдейты
+            try:
+                await bot.get_updates(offset=offset, timeout=0, limit=1)
+            except Exception as e:
+                LOGGER.warning("⚠️ Не удалось подтвердить offset %s: %s", offset, e)
+
+    async def stop(self):
+        for queue in self._queues:
+            queue.put(None)
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, WORKER_STOP_TIMEOUT)
+            if process.is_alive():
+                LOGGER.warning("⚠️ Обработчик %s не остановился, завершаю", process.name)
+                process.terminate()
+        LOGGER.info("🧵 Процессы-обработчики остановлены")
@@ -0,0 +1,33 @@
+"""Storage backends behind db.py."""
+
+from config import Settings
+
+from .base import StorageBackend, StorageConnection, StorageCursor
+
+BACKEND_NAMES = ("mysql", "sqlite")
+
+
+def create_backend(settings: Settings) -> StorageBackend:
+    """Создать backend хранилища по settings.db_backend (mysql / sqlite)."""
+    name = (settings.db_backend or "mysql").lower()
+    if name == "mysql":
+        from .mysql import MySQLBackend
+
+        return MySQLBackend(settings)
+    if name == "sqlite":
+        from .sqlite import SQLiteBackend
+
+        return SQLiteBackend(settings.db_path)
+    raise ValueError(
+        f"Неизвестный DB_BACKEND={settings.db_backend!r}, "
+        f"допустимо: {', '.join(BACKEND_NAMES)}"
+    )
+
+
+__all__ = [
+    "BACKEND_NAMES",
+    "StorageBackend",
+    "StorageConnection",
+    "StorageCursor",
+    "create_backend",
+]
@@ -0,0 +1,253 @@
+import logging
+import re
+from abc import ABC, abstractmethod
+from contextlib import AbstractAsyncContextManager, asynccontextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, List, Optional, Sequence
+
+QueryHook = Callable[[str, Any], None]
+
+INTERVAL_UNITS = ("SECOND", "MINUTE", "HOUR", "DAY")
+
+LOGGER = logging.getLogger("support_bot.storage")
+
+# Переносимый DDL: одинаково работает в MySQL и SQLite.
+SCHEMA_MIGRATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER NOT NULL PRIMARY KEY,
+    name VARCHAR(128) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+SEARCH_TOKEN_RE = re.compile(r'(-?)"([^"]*)"|(-?)(\S+)')
+SEARCH_WORD_RE = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    Версионированное изменение схемы. Номера версий общие для всех backend'ов:
+    одна и та же логическая миграция в mysql.py и sqlite.py имеет один номер.
+    """
+
+    version: int
+    name: str
+    statements: Sequence[str]
+
+
+@dataclass(frozen=True)
+class SearchTerm:
+    text: str
+    # word / prefix (слово*) / phrase ("несколько слов")
+    kind: str = "word"
+
+
+@dataclass
+class SearchTerms:
+    required: list[SearchTerm] = field(default_factory=list)
+    excluded: list[SearchTerm] = field(default_factory=list)
+
+
+def parse_search_query(raw: str) -> SearchTerms:
+    """
+    Поисковая строка в общем для backend'ов виде:
+    слово, слово*, "фраза", -исключение. Все не исключённые термы обязательны.
+    Знаки, имеющие смысл в синтаксисе MySQL / FTS5, отбрасываются.
+    """
+    terms = SearchTerms()
+    for match in SEARCH_TOKEN_RE.finditer(raw or ""):
+        if match.group(2) is not None:
+            negative = match.group(1) == "-"
+            words = SEARCH_WORD_RE.findall(match.group(2))
+            if not words:
+                continue
+            term = (
+                SearchTerm(" ".join(words), "phrase")
+                if len(words) > 1
+                else SearchTerm(words[0])
+            )
+        else:
+            token = match.group(4)
+            negative = match.group(3) == "-"
+            words = SEARCH_WORD_RE.findall(token)
+            if len(words) != 1:
+                # «e-mail», «donate/bug» — ищем как фразу из частей
+                if not words:
+                    continue
+                term = SearchTerm(" ".join(words), "phrase")
+            else:
+                kind = "prefix" if token.endswith("*") else "word"
+                term = SearchTerm(words[0], kind)
+
+        (terms.excluded if negative else terms.required).append(term)
+    return terms
+
+
+class StorageCursor(ABC):
+    """
+    Курсор в стиле DB-API, общий для всех backend'ов.
+    Запросы пишутся с плейсхолдерами %s (как в aiomysql),
+    backend сам переводит их в свой диалект.
+    """
+
+    @abstractmethod
+    async def execute(self, sql: str, args: Sequence[Any] | None = None) -> int: ...
+
+    @abstractmethod
+    async def executemany(self, sql: str, rows: Sequence[Sequence[Any]]) -> int: ...
+
+    @abstractmethod
+    async def fetchone(self) -> Optional[Any]: ...
+
+    @abstractmethod
+    async def fetchmany(self, size: int) -> List[Any]: ...
+
+    @abstractmethod
+    async def fetchall(self) -> List[Any]: ...
+
+    @property
+    @abstractmethod
+    def lastrowid(self) -> int: ...
+
+    @property
+    @abstractmethod
+    def rowcount(self) -> int: ...
+
+
+class StorageConnection(ABC):
+    # Начало явной транзакции (соединения пула работают в autocommit).
+    begin_statement = "BEGIN"
+
+    @abstractmethod
+    def cursor(
+        self, dict_rows: bool = False, stream: bool = False
+    ) -> AbstractAsyncContextManager[StorageCursor]:
+        """
+        Курсор; dict_rows=True — строки как dict (аналог aiomysql.DictCursor).
+        stream=True — небуферизованный курсор: строки читаются с сервера
+        по мере fetchmany, а не целиком в память при execute.
+        """
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """Выполнить блок одной транзакцией: COMMIT при успехе, иначе ROLLBACK."""
+        async with self.cursor() as cur:
+            await cur.execute(self.begin_statement)
+        try:
+            yield
+        except BaseException:
+            async with self.cursor() as cur:
+                await cur.execute("ROLLBACK")
+            raise
+        async with self.cursor() as cur:
+            await cur.execute("COMMIT")
+
+
+class StorageBackend(ABC):
+    """
+    Backend хранилища: соединения + особенности SQL-диалекта.
+    db.py пишет запросы один раз, а непереносимые куски
+    (интервалы времени, upsert, схема) берёт у backend'а.
+    """
+
+    name = ""
+    # Миграции схемы поверх базовых таблиц, см. apply_migrations().
+    migrations: Sequence[Migration] = ()
+    # Можно ли откатить DDL транзакцией (SQLite — да, MySQL — нет).
+    transactional_ddl = False
+
+    def __init__(self):
+        # Хуки вызываются на каждый execute (счётчики запросов в tools/).
+        self.query_hooks: list[QueryHook] = []
+
+    def notify_query(self, sql: str, args: Any):
+        for hook in self.query_hooks:
+            hook(sql, args)
+
+    @abstractmethod
+    async def open(self): ...
+
+    @abstractmethod
+    async def close(self): ...
+
+    @abstractmethod
+    def acquire(self) -> AbstractAsyncContextManager[StorageConnection]: ...
+
+    @abstractmethod
+    async def ensure_schema(self):
+        """Создать недостающие таблицы и индексы (и применить миграции)."""
+
+    async def apply_migrations(self) -> list[int]:
+        """
+        Применить ещё не применённые миграции по возрастанию версии.
+        Применённые версии хранятся в schema_migrations.
+        """
+        applied_now = []
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SCHEMA_MIGRATIONS_DDL)
+                await cur.execute("SELECT version FROM schema_migrations")
+                applied = {row[0] for row in await cur.fetchall()}
+
+                for migration in sorted(self.migrations, key=lambda m: m.version):
+                    if migration.version in applied:
+                        continue
+
+                    LOGGER.info(
+                        "🧱 Миграция схемы %s: %s (%s)",
+                        migration.version,
+                        migration.name,
+                        self.name,
+                    )
+                    scope = conn.transaction() if self.transactional_ddl else nullcontext()
+                    async with scope:
+                        for statement in migration.statements:
+                            await cur.execute(statement)
+                        await cur.execute(
+                            "INSERT INTO schema_migrations (version, name) "
+                            "VALUES (%s, %s)",
+                            (migration.version, migration.name),
+                        )
+                    applied_now.append(migration.version)
+        return applied_now
+
+    @abstractmethod
+    def since(self, amount: int, unit: str) -> str:
+        """SQL-выражение «сейчас минус amount unit» (unit: SECOND/MINUTE/HOUR/DAY)."""
+
+    @abstractmethod
+    def seconds_between(self, start: str, end: str) -> str:
+        """SQL-выражение: целое число секунд от start до end (NULL, если любое NULL)."""
+
+    @abstractmethod
+    def upsert_clause(
+        self,
+        key_columns: Sequence[str],
+        update_columns: Sequence[str],
+        touch_columns: Sequence[str] = (),
+    ) -> str:
+        """
+        Хвост INSERT для обновления при конфликте ключа:
+        update_columns берутся из вставляемой строки,
+        touch_columns выставляются в CURRENT_TIMESTAMP.
+        """
+
+    @abstractmethod
+    def fulltext_query(self, terms: SearchTerms) -> str:
+        """Строка запроса полнотекстового поиска в синтаксисе backend'а."""
+
+    @abstractmethod
+    def fulltext_hits_sql(self) -> tuple[str, int]:
+        """
+        Подзапрос (ticket_id, score) по темам тикетов и текстам сообщений
+        и число плейсхолдеров в нём (все — строка из fulltext_query).
+        Чем больше score, тем релевантнее тикет.
+        """
+
+
+def check_interval(amount: int, unit: str) -> tuple[int, str]:
+    unit = unit.upper()
+    if unit not in INTERVAL_UNITS:
+        raise ValueError(f"Unsupported interval unit: {unit}")
+    return int(amount), unit
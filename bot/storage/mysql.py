@@ -0,0 +1,567 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional, Sequence
+
+import aiomysql
+
+from config import Settings
+
+from .base import (
+    Migration,
+    SearchTerm,
+    SearchTerms,
+    StorageBackend,
+    StorageConnection,
+    StorageCursor,
+    check_interval,
+)
+
+# Первое действие админа (кроме закрытия) и первый настоящий ответ игроку.
+SLA_BACKFILL_SQL = """
+    SELECT ticket_id,
+           MIN(CASE WHEN text NOT LIKE '[Тикет закрыт%' THEN created_at END)
+               AS taken_at,
+           MIN(CASE WHEN text NOT LIKE '[Тикет %' THEN created_at END)
+               AS first_reply_at
+    FROM ticket_messages
+    WHERE sender = 'admin'
+    GROUP BY ticket_id
+"""
+
+# Номера версий совпадают с storage/sqlite.py. Схема в db.sql — итоговая,
+# вместе с отметками в schema_migrations.
+MIGRATIONS = [
+    Migration(
+        1,
+        "fulltext_search",
+        [
+            "ALTER TABLE tickets ADD FULLTEXT INDEX ft_tickets_topic (topic)",
+            "ALTER TABLE ticket_messages ADD FULLTEXT INDEX ft_msg_text (text)",
+        ],
+    ),
+    Migration(
+        2,
+        "ticket_messages_archive",
+        [
+            """
+            ALTER TABLE tickets
+                ADD COLUMN closed_at TIMESTAMP NULL DEFAULT NULL
+                    AFTER assigned_admin_username,
+                ADD KEY idx_tickets_status_closed (status, closed_at)
+            """,
+            # updated_at = updated_at — чтобы не сработал ON UPDATE CURRENT_TIMESTAMP
+            """
+            UPDATE tickets SET closed_at = updated_at, updated_at = updated_at
+            WHERE status = 'closed'
+            """,
+            """
+            CREATE TABLE ticket_messages_archive (
+                ticket_id BIGINT UNSIGNED NOT NULL,
+                message_count INT UNSIGNED NOT NULL,
+                last_message_id BIGINT UNSIGNED NOT NULL,
+                payload LONGBLOB NOT NULL,
+                archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (ticket_id),
+                CONSTRAINT fk_ticket_messages_archive_ticket
+                    FOREIGN KEY (ticket_id) REFERENCES tickets (id)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE
+            ) ENGINE=InnoDB
+            DEFAULT CHARSET=utf8mb4
+            COLLATE=utf8mb4_unicode_ci
+            """,
+        ],
+    ),
+    Migration(
+        3,
+        "admin_shifts",
+        [
+            """
+            CREATE TABLE admin_shifts (
+                admin_id BIGINT NOT NULL,
+                admin_username VARCHAR(64) NULL,
+                on_shift TINYINT(1) NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    ON UPDATE CURRENT_TIMESTAMP,
+                PRIMARY KEY (admin_id)
+            ) ENGINE=InnoDB
+            DEFAULT CHARSET=utf8mb4
+            COLLATE=utf8mb4_unicode_ci
+            """,
+        ],
+    ),
+    Migration(
+        4,
+        "sla_timestamps",
+        [
+            """
+            ALTER TABLE tickets
+                ADD COLUMN taken_at TIMESTAMP NULL DEFAULT NULL
+                    AFTER assigned_admin_username,
+                ADD COLUMN first_admin_reply_at TIMESTAMP NULL DEFAULT NULL
+                    AFTER taken_at,
+                ADD KEY idx_tickets_created (created_at)
+            """,
+            # Заполняем по истории переписки. Служебные записи бота начинаются
+            # с «[Тикет …]»; сообщения уже перенесённых в архив тикетов не учитываются.
+            f"""
+            UPDATE tickets AS t
+            JOIN ({SLA_BACKFILL_SQL}) AS m ON m.ticket_id = t.id
+            SET t.taken_at = m.taken_at,
+                t.first_admin_reply_at = m.first_reply_at,
+                t.updated_at = t.updated_at
+            """,
+        ],
+    ),
+    Migration(
+        5,
+        "ticket_escalation",
+        [
+            """
+            ALTER TABLE tickets
+                ADD COLUMN escalation_level TINYINT UNSIGNED NOT NULL DEFAULT 0
+                    AFTER first_admin_reply_at,
+                ADD KEY idx_tickets_status_created (status, created_at)
+            """,
+        ],
+    ),
+    Migration(
+        6,
+        "ticket_last_message_at",
+        [
+            """
+            ALTER TABLE tickets
+                ADD COLUMN last_message_at TIMESTAMP NULL DEFAULT NULL
+                    AFTER escalation_level,
+                ADD KEY idx_tickets_status_last_message (status, last_message_at)
+            """,
+            # у тикетов с архивной перепиской сообщений в ticket_messages нет
+            """
+            UPDATE tickets AS t
+            LEFT JOIN (
+                SELECT ticket_id, MAX(created_at) AS last_at
+                FROM ticket_messages
+                GROUP BY ticket_id
+            ) AS m ON m.ticket_id = t.id
+            SET t.last_message_at = COALESCE(m.last_at, t.closed_at, t.created_at),
+                t.updated_at = t.updated_at
+            """,
+        ],
+    ),
+    Migration(
+        7,
+        "broadcasts",
+        [
+            """
+            CREATE TABLE broadcasts (
+                id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+                text TEXT NOT NULL,
+                audience VARCHAR(16) NOT NULL,
+                status ENUM('draft', 'running', 'done', 'cancelled')
+                    NOT NULL DEFAULT 'draft',
+                created_by BIGINT NOT NULL,
+                total INT UNSIGNED NOT NULL DEFAULT 0,
+                cursor_user_id BIGINT NOT NULL DEFAULT 0,
+                delivered INT UNSIGNED NOT NULL DEFAULT 0,
+                blocked INT UNSIGNED NOT NULL DEFAULT 0,
+                failed INT UNSIGNED NOT NULL DEFAULT 0,
+                progress_message_id BIGINT NULL DEFAULT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP NULL DEFAULT NULL,
+                finished_at TIMESTAMP NULL DEFAULT NULL,
+                PRIMARY KEY (id),
+                KEY idx_broadcasts_status (status)
+            ) ENGINE=InnoDB
+            DEFAULT CHARSET=utf8mb4
+            COLLATE=utf8mb4_unicode_ci
+            """,
+        ],
+    ),
+    Migration(
+        8,
+        "leader_lease",
+        [
+            """
+            CREATE TABLE bot_leases (
+                name VARCHAR(64) NOT NULL,
+                holder VARCHAR(128) NOT NULL DEFAULT '',
+                token BIGINT UNSIGNED NOT NULL DEFAULT 0,
+                heartbeats BIGINT UNSIGNED NOT NULL DEFAULT 0,
+                renewed_at DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00',
+                PRIMARY KEY (name)
+            ) ENGINE=InnoDB
+            DEFAULT CHARSET=utf8mb4
+            COLLATE=utf8mb4_unicode_ci
+            """,
+            "INSERT IGNORE INTO bot_leases (name) VALUES ('poller')",
+        ],
+    ),
+    Migration(
+        9,
+        "ticket_admin_chat",
+        [
+            # 0 — основной админ-чат (ADMIN_CHAT_ID)
+            """
+            ALTER TABLE tickets
+                ADD COLUMN admin_chat_id BIGINT NOT NULL DEFAULT 0 AFTER status,
+                DROP KEY idx_tickets_thread,
+                ADD KEY idx_tickets_chat_thread (admin_chat_id, admin_thread_id)
+            """,
+        ],
+    ),
+    Migration(
+        10,
+        "ticket_publication",
+        [
+            # старые тикеты уже опубликованы, новые создаются с published = 0
+            """
+            ALTER TABLE tickets
+                ADD COLUMN published TINYINT(1) NOT NULL DEFAULT 1 AFTER admin_thread_id,
+                ADD COLUMN photo_ids TEXT NULL AFTER published,
+                ADD KEY idx_tickets_published (published)
+            """,
+        ],
+    ),
+    Migration(
+        11,
+        "admin_dashboard",
+        [
+            """
+            CREATE TABLE admin_dashboards (
+                admin_chat_id BIGINT NOT NULL,
+                message_id BIGINT NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (admin_chat_id)
+            ) ENGINE=InnoDB
+            DEFAULT CHARSET=utf8mb4
+            COLLATE=utf8mb4_unicode_ci
+            """,
+        ],
+    ),
+    Migration(
+        12,
+        "webhook_outbox",
+        [
+            """
+            CREATE TABLE webhook_outbox (
+                id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+                event_type VARCHAR(32) NOT NULL,
+                ticket_id BIGINT UNSIGNED NOT NULL,
+                payload TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id)
+            ) ENGINE=InnoDB
+            DEFAULT CHARSET=utf8mb4
+            COLLATE=utf8mb4_unicode_ci
+            """,
+        ],
+    ),
+    Migration(
+        13,
+        "ticket_publication_progress",
+        [
+            # сколько фото тикета уже отправлено альбомом в тему
+            """
+            ALTER TABLE tickets
+                ADD COLUMN posted_photos SMALLINT UNSIGNED NOT NULL DEFAULT 0
+                AFTER photo_ids
+            """,
+        ],
+    ),
+    Migration(
+        14,
+        "ticket_relay_queue",
+        [
+            # сообщения игрока, пришедшие до создания темы тикета
+            """
+            CREATE TABLE ticket_relay_queue (
+                id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+                ticket_id BIGINT UNSIGNED NOT NULL,
+                chat_id BIGINT NOT NULL,
+                message_id BIGINT NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id),
+                KEY idx_relay_ticket_id (ticket_id),
+                CONSTRAINT fk_ticket_relay_queue_ticket
+                    FOREIGN KEY (ticket_id) REFERENCES tickets (id)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE
+            ) ENGINE=InnoDB
+            DEFAULT CHARSET=utf8mb4
+            COLLATE=utf8mb4_unicode_ci
+            """,
+        ],
+    ),
+    Migration(
+        15,
+        "ticket_publish_error",
+        [
+            # ошибка, из-за которой тема тикета не создаётся (ждёт /republish)
+            """
+            ALTER TABLE tickets
+                ADD COLUMN publish_error VARCHAR(255) NULL
+                AFTER posted_photos
+            """,
+        ],
+    ),
+]
+
+FULLTEXT_HITS_SQL = """
+    SELECT ticket_id, SUM(score) AS score
+    FROM (
+        SELECT id AS ticket_id,
+               MATCH (topic) AGAINST (%s IN BOOLEAN MODE) * 2 AS score
+        FROM tickets
+        WHERE MATCH (topic) AGAINST (%s IN BOOLEAN MODE)
+        UNION ALL
+        SELECT ticket_id,
+               MATCH (text) AGAINST (%s IN BOOLEAN MODE) AS score
+        FROM ticket_messages
+        WHERE MATCH (text) AGAINST (%s IN BOOLEAN MODE)
+    ) AS matches
+    GROUP BY ticket_id
+"""
+
+
+def _boolean_mode_term(term: SearchTerm) -> str:
+    if term.kind == "phrase":
+        return f'"{term.text}"'
+    if term.kind == "prefix":
+        return f"{term.text}*"
+    return term.text
+
+
+class MySQLCursor(StorageCursor):
+    def __init__(self, raw: aiomysql.Cursor, backend: StorageBackend):
+        self._raw = raw
+        self._backend = backend
+
+    async def execute(self, sql: str, args: Sequence[Any] | None = None) -> int:
+        self._backend.notify_query(sql, args)
+        return await self._raw.execute(sql, args)
+
+    async def executemany(self, sql: str, rows: Sequence[Sequence[Any]]) -> int:
+        self._backend.notify_query(sql, rows)
+        return await self._raw.executemany(sql, rows)
+
+    async def fetchone(self) -> Optional[Any]:
+        return await self._raw.fetchone()
+
+    async def fetchmany(self, size: int) -> List[Any]:
+        return list(await self._raw.fetchmany(size))
+
+    async def fetchall(self) -> List[Any]:
+        return list(await self._raw.fetchall())
+
+    @property
+    def lastrowid(self) -> int:
+        return self._raw.lastrowid
+
+    @property
+    def rowcount(self) -> int:
+        return self._raw.rowcount
+
+
+class MySQLConnection(StorageConnection):
+    def __init__(self, raw: aiomysql.Connection, backend: StorageBackend):
+        self.raw = raw
+        self._backend = backend
+
+    @asynccontextmanager
+    async def cursor(
+        self, dict_rows: bool = False, stream: bool = False
+    ) -> AsyncIterator[MySQLCursor]:
+        if stream:
+            # SSCursor держит соединение занятым, пока не прочитаны все строки;
+            # при выходе из контекста остаток результата вычитывается и отбрасывается.
+            cursor_class = aiomysql.SSDictCursor if dict_rows else aiomysql.SSCursor
+        else:
+            cursor_class = aiomysql.DictCursor if dict_rows else aiomysql.Cursor
+        async with self.raw.cursor(cursor_class) as raw_cursor:
+            yield MySQLCursor(raw_cursor, self._backend)
+
+
+class SharedPool:
+    """
+    Пул соединений к одному серверу MySQL. Несколько ботов в одном
+    процессе (TENANTS) с базами на этом сервере делят его, нужная база
+    выбирается при выдаче соединения.
+    """
+
+    def __init__(self, pool: aiomysql.Pool):
+        self.pool = pool
+        self.users = 0
+        # база, выбранная на соединении через select_db (aiomysql её не запоминает)
+        self.selected_db: "weakref.WeakKeyDictionary[aiomysql.Connection, str]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def use_db(self, raw: aiomysql.Connection, db: str):
+        if self.selected_db.get(raw, raw.db) != db:
+            await raw.select_db(db)
+            self.selected_db[raw] = db
+
+
+SHARED_POOLS: dict[tuple, SharedPool] = {}
+SHARED_POOLS_LOCK = asyncio.Lock()
+
+
+class MySQLBackend(StorageBackend):
+    """MySQL / MariaDB через пул aiomysql."""
+
+    name = "mysql"
+    migrations = MIGRATIONS
+
+    def __init__(self, settings: Settings):
+        super().__init__()
+        self.settings = settings
+        self.shared: SharedPool | None = None
+
+    def _server_key(self) -> tuple:
+        return (
+            self.settings.db_host,
+            self.settings.db_port,
+            self.settings.db_user,
+            self.settings.db_password,
+        )
+
+    async def open(self):
+        async with SHARED_POOLS_LOCK:
+            shared = SHARED_POOLS.get(self._server_key())
+            if shared is None:
+                pool = await aiomysql.create_pool(
+                    host=self.settings.db_host,
+                    port=self.settings.db_port,
+                    user=self.settings.db_user,
+                    password=self.settings.db_password,
+                    db=self.settings.db_name,
+                    autocommit=True,
+                    minsize=1,
+                    maxsize=5,
+                )
+                shared = SHARED_POOLS[self._server_key()] = SharedPool(pool)
+            shared.users += 1
+            self.shared = shared
+
+    async def close(self):
+        if self.shared is None:
+            return
+        async with SHARED_POOLS_LOCK:
+            self.shared.users -= 1
+            if self.shared.users == 0:
+                SHARED_POOLS.pop(self._server_key(), None)
+                self.shared.pool.close()
+                await self.shared.pool.wait_closed()
+        self.shared = None
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[MySQLConnection]:
+        assert self.shared is not None
+        async with self.shared.pool.acquire() as raw:
+            await self.shared.use_db(raw, self.settings.db_name)
+            yield MySQLConnection(raw, self)
+
+    def since(self, amount: int, unit: str) -> str:
+        amount, unit = check_interval(amount, unit)
+        return f"NOW() - INTERVAL {amount} {unit}"
+
+    def seconds_between(self, start: str, end: str) -> str:
+        return f"TIMESTAMPDIFF(SECOND, {start}, {end})"
+
+    def upsert_clause(
+        self,
+        key_columns: Sequence[str],
+        update_columns: Sequence[str],
+        touch_columns: Sequence[str] = (),
+    ) -> str:
+        assignments = [f"{col} = VALUES({col})" for col in update_columns]
+        assignments += [f"{col} = CURRENT_TIMESTAMP" for col in touch_columns]
+        return "ON DUPLICATE KEY UPDATE " + ", ".join(assignments)
+
+    def fulltext_query(self, terms: SearchTerms) -> str:
+        parts = [f"+{_boolean_mode_term(term)}" for term in terms.required]
+        parts += [f"-{_boolean_mode_term(term)}" for term in terms.excluded]
+        return " ".join(parts)
+
+    def fulltext_hits_sql(self) -> tuple[str, int]:
+        # Тема тикета весит вдвое больше одного сообщения.
+        return FULLTEXT_HITS_SQL, 4
+
+    async def ensure_schema(self):
+        """Create required tables if they are missing."""
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("SHOW TABLES LIKE %s", ("tickets",))
+                tickets_exists = await cur.fetchone() is not None
+                if not tickets_exists:
+                    await cur.execute(
+                        """
+                        CREATE TABLE tickets (
+                            id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+                            user_id BIGINT NOT NULL,
+                            username VARCHAR(64) NULL,
+                            category VARCHAR(32) NOT NULL DEFAULT 'other',
+                            topic VARCHAR(255) NOT NULL,
+                            status ENUM('open', 'in_work', 'closed') NOT NULL
+                                DEFAULT 'open',
+                            admin_thread_id BIGINT NULL,
+                            assigned_admin_id BIGINT NULL,
+                            assigned_admin_username VARCHAR(64) NULL,
+                            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                ON UPDATE CURRENT_TIMESTAMP,
+                            PRIMARY KEY (id),
+                            KEY idx_tickets_user_id (user_id),
+                            KEY idx_tickets_status (status),
+                            KEY idx_tickets_thread (admin_thread_id),
+                            KEY idx_tickets_assignee (assigned_admin_id)
+                        ) ENGINE=InnoDB
+                        DEFAULT CHARSET=utf8mb4
+                        COLLATE=utf8mb4_unicode_ci
+                        """
+                    )
+
+                await cur.execute("SHOW TABLES LIKE %s", ("ticket_messages",))
+                ticket_messages_exists = await cur.fetchone() is not None
+                if not ticket_messages_exists:
+                    await cur.execute(
+                        """
+                        CREATE TABLE ticket_messages (
+                            id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+                            ticket_id BIGINT UNSIGNED NOT NULL,
+                            sender ENUM('user', 'admin') NOT NULL,
+                            text TEXT NOT NULL,
+                            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                            PRIMARY KEY (id),
+                            KEY idx_msg_ticket_id (ticket_id),
+                            KEY idx_msg_created_at (created_at),
+                            CONSTRAINT fk_ticket_messages_ticket
+                                FOREIGN KEY (ticket_id) REFERENCES tickets (id)
+                                ON DELETE CASCADE
+                                ON UPDATE CASCADE
+                        ) ENGINE=InnoDB
+                        DEFAULT CHARSET=utf8mb4
+                        COLLATE=utf8mb4_unicode_ci
+                        """
+                    )
+
+                await cur.execute("SHOW TABLES LIKE %s", ("user_profiles",))
+                user_profiles_exists = await cur.fetchone() is not None
+                if not user_profiles_exists:
+                    await cur.execute(
+                        """
+                        CREATE TABLE user_profiles (
+                            user_id BIGINT NOT NULL,
+                            game_nickname VARCHAR(64) NOT NULL,
+                            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                ON UPDATE CURRENT_TIMESTAMP,
+                            PRIMARY KEY (user_id)
+                        ) ENGINE=InnoDB
+                        DEFAULT CHARSET=utf8mb4
+                        COLLATE=utf8mb4_unicode_ci
+                        """
+                    )
+
+        await self.apply_migrations()
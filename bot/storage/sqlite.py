@@ -0,0 +1,606 @@
+import asyncio
+import os
+import sqlite3
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, AsyncIterator, List, Optional, Sequence
+
+import aiosqlite
+
+from .base import (
+    Migration,
+    SearchTerm,
+    SearchTerms,
+    StorageBackend,
+    StorageConnection,
+    StorageCursor,
+    check_interval,
+)
+
+SQLITE_INTERVAL_UNITS = {
+    "SECOND": "seconds",
+    "MINUTE": "minutes",
+    "HOUR": "hours",
+    "DAY": "days",
+}
+
+TICKETS_UPDATED_AT_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_tickets_updated_at
+AFTER UPDATE ON tickets
+FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE tickets SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END
+"""
+
+SCHEMA = [
+    # ENUM эмулируется через CHECK, ON UPDATE CURRENT_TIMESTAMP — через триггер.
+    """
+    CREATE TABLE IF NOT EXISTS tickets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id BIGINT NOT NULL,
+        username VARCHAR(64) NULL,
+        category VARCHAR(32) NOT NULL DEFAULT 'other',
+        topic VARCHAR(255) NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'open'
+            CHECK (status IN ('open', 'in_work', 'closed')),
+        admin_thread_id BIGINT NULL,
+        assigned_admin_id BIGINT NULL,
+        assigned_admin_username VARCHAR(64) NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_tickets_user_id ON tickets (user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_thread ON tickets (admin_thread_id)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_assignee ON tickets (assigned_admin_id)",
+    TICKETS_UPDATED_AT_TRIGGER,
+    """
+    CREATE TABLE IF NOT EXISTS ticket_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticket_id INTEGER NOT NULL
+            REFERENCES tickets (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        sender VARCHAR(8) NOT NULL CHECK (sender IN ('user', 'admin')),
+        text TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_msg_ticket_id ON ticket_messages (ticket_id)",
+    "CREATE INDEX IF NOT EXISTS idx_msg_created_at ON ticket_messages (created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        user_id BIGINT NOT NULL PRIMARY KEY,
+        game_nickname VARCHAR(64) NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_user_profiles_updated_at
+    AFTER UPDATE ON user_profiles
+    FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+    BEGIN
+        UPDATE user_profiles SET updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = NEW.user_id;
+    END
+    """,
+]
+
+
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Номера версий совпадают с storage/mysql.py.
+MIGRATIONS = [
+    Migration(
+        1,
+        "fulltext_search",
+        [
+            # FTS5 с внешним содержимым: текст хранится только в основных
+            # таблицах, индекс поддерживается триггерами.
+            f"""
+            CREATE VIRTUAL TABLE tickets_fts USING fts5(
+                topic, content='tickets', content_rowid='id',
+                tokenize='{FTS_TOKENIZER}'
+            )
+            """,
+            f"""
+            CREATE VIRTUAL TABLE ticket_messages_fts USING fts5(
+                text, content='ticket_messages', content_rowid='id',
+                tokenize='{FTS_TOKENIZER}'
+            )
+            """,
+            """
+            CREATE TRIGGER trg_tickets_fts_insert AFTER INSERT ON tickets BEGIN
+                INSERT INTO tickets_fts (rowid, topic) VALUES (NEW.id, NEW.topic);
+            END
+            """,
+            """
+            CREATE TRIGGER trg_tickets_fts_delete AFTER DELETE ON tickets BEGIN
+                INSERT INTO tickets_fts (tickets_fts, rowid, topic)
+                VALUES ('delete', OLD.id, OLD.topic);
+            END
+            """,
+            """
+            CREATE TRIGGER trg_tickets_fts_update AFTER UPDATE OF topic ON tickets
+            BEGIN
+                INSERT INTO tickets_fts (tickets_fts, rowid, topic)
+                VALUES ('delete', OLD.id, OLD.topic);
+                INSERT INTO tickets_fts (rowid, topic) VALUES (NEW.id, NEW.topic);
+            END
+            """,
+            """
+            CREATE TRIGGER trg_msg_fts_insert AFTER INSERT ON ticket_messages BEGIN
+                INSERT INTO ticket_messages_fts (rowid, text) VALUES (NEW.id, NEW.text);
+            END
+            """,
+            """
+            CREATE TRIGGER trg_msg_fts_delete AFTER DELETE ON ticket_messages BEGIN
+                INSERT INTO ticket_messages_fts (ticket_messages_fts, rowid, text)
+                VALUES ('delete', OLD.id, OLD.text);
+            END
+            """,
+            """
+            CREATE TRIGGER trg_msg_fts_update AFTER UPDATE OF text ON ticket_messages
+            BEGIN
+                INSERT INTO ticket_messages_fts (ticket_messages_fts, rowid, text)
+                VALUES ('delete', OLD.id, OLD.text);
+                INSERT INTO ticket_messages_fts (rowid, text) VALUES (NEW.id, NEW.text);
+            END
+            """,
+            "INSERT INTO tickets_fts (tickets_fts) VALUES ('rebuild')",
+            "INSERT INTO ticket_messages_fts (ticket_messages_fts) VALUES ('rebuild')",
+        ],
+    ),
+    Migration(
+        2,
+        "ticket_messages_archive",
+        [
+            "ALTER TABLE tickets ADD COLUMN closed_at TIMESTAMP NULL",
+            """
+            CREATE INDEX idx_tickets_status_closed ON tickets (status, closed_at)
+            """,
+            # На время заполнения снимаем триггер, иначе он перепишет updated_at.
+            "DROP TRIGGER trg_tickets_updated_at",
+            "UPDATE tickets SET closed_at = updated_at WHERE status = 'closed'",
+            TICKETS_UPDATED_AT_TRIGGER,
+            """
+            CREATE TABLE ticket_messages_archive (
+                ticket_id INTEGER NOT NULL PRIMARY KEY
+                    REFERENCES tickets (id) ON DELETE CASCADE ON UPDATE CASCADE,
+                message_count INTEGER NOT NULL,
+                last_message_id INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    ),
+    Migration(
+        3,
+        "admin_shifts",
+        [
+            """
+            CREATE TABLE admin_shifts (
+                admin_id BIGINT NOT NULL PRIMARY KEY,
+                admin_username VARCHAR(64) NULL,
+                on_shift INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    ),
+    Migration(
+        4,
+        "sla_timestamps",
+        [
+            "ALTER TABLE tickets ADD COLUMN taken_at TIMESTAMP NULL",
+            "ALTER TABLE tickets ADD COLUMN first_admin_reply_at TIMESTAMP NULL",
+            "CREATE INDEX idx_tickets_created ON tickets (created_at)",
+            "DROP TRIGGER trg_tickets_updated_at",
+            # Служебные записи бота начинаются с «[Тикет …]»; сообщения уже
+            # перенесённых в архив тикетов не учитываются.
+            """
+            UPDATE tickets SET
+                taken_at = (
+                    SELECT MIN(created_at) FROM ticket_messages AS m
+                    WHERE m.ticket_id = tickets.id AND m.sender = 'admin'
+                      AND m.text NOT LIKE '[Тикет закрыт%'
+                ),
+                first_admin_reply_at = (
+                    SELECT MIN(created_at) FROM ticket_messages AS m
+                    WHERE m.ticket_id = tickets.id AND m.sender = 'admin'
+                      AND m.text NOT LIKE '[Тикет %'
+                )
+            """,
+            TICKETS_UPDATED_AT_TRIGGER,
+        ],
+    ),
+    Migration(
+        5,
+        "ticket_escalation",
+        [
+            """
+            ALTER TABLE tickets
+            ADD COLUMN escalation_level INTEGER NOT NULL DEFAULT 0
+            """,
+            """
+            CREATE INDEX idx_tickets_status_created ON tickets (status, created_at)
+            """,
+        ],
+    ),
+    Migration(
+        6,
+        "ticket_last_message_at",
+        [
+            "ALTER TABLE tickets ADD COLUMN last_message_at TIMESTAMP NULL",
+            """
+            CREATE INDEX idx_tickets_status_last_message
+            ON tickets (status, last_message_at)
+            """,
+            "DROP TRIGGER trg_tickets_updated_at",
+            # у тикетов с архивной перепиской сообщений в ticket_messages нет
+            """
+            UPDATE tickets SET last_message_at = COALESCE(
+                (
+                    SELECT MAX(created_at) FROM ticket_messages AS m
+                    WHERE m.ticket_id = tickets.id
+                ),
+                closed_at,
+                created_at
+            )
+            """,
+            TICKETS_UPDATED_AT_TRIGGER,
+        ],
+    ),
+    Migration(
+        7,
+        "broadcasts",
+        [
+            """
+            CREATE TABLE broadcasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT NOT NULL,
+                audience VARCHAR(16) NOT NULL,
+                status VARCHAR(16) NOT NULL DEFAULT 'draft'
+                    CHECK (status IN ('draft', 'running', 'done', 'cancelled')),
+                created_by BIGINT NOT NULL,
+                total INTEGER NOT NULL DEFAULT 0,
+                cursor_user_id BIGINT NOT NULL DEFAULT 0,
+                delivered INTEGER NOT NULL DEFAULT 0,
+                blocked INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                progress_message_id BIGINT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP NULL,
+                finished_at TIMESTAMP NULL
+            )
+            """,
+            "CREATE INDEX idx_broadcasts_status ON broadcasts (status)",
+        ],
+    ),
+    Migration(
+        8,
+        "leader_lease",
+        [
+            """
+            CREATE TABLE bot_leases (
+                name VARCHAR(64) PRIMARY KEY,
+                holder VARCHAR(128) NOT NULL DEFAULT '',
+                token INTEGER NOT NULL DEFAULT 0,
+                heartbeats INTEGER NOT NULL DEFAULT 0,
+                renewed_at TIMESTAMP NOT NULL DEFAULT '1970-01-01 00:00:00'
+            )
+            """,
+            "INSERT OR IGNORE INTO bot_leases (name) VALUES ('poller')",
+        ],
+    ),
+    Migration(
+        9,
+        "ticket_admin_chat",
+        [
+            # 0 — основной админ-чат (ADMIN_CHAT_ID)
+            "ALTER TABLE tickets ADD COLUMN admin_chat_id BIGINT NOT NULL DEFAULT 0",
+            "DROP INDEX IF EXISTS idx_tickets_thread",
+            """
+            CREATE INDEX idx_tickets_chat_thread
+            ON tickets (admin_chat_id, admin_thread_id)
+            """,
+        ],
+    ),
+    Migration(
+        10,
+        "ticket_publication",
+        [
+            # старые тикеты уже опубликованы, новые создаются с published = 0
+            "ALTER TABLE tickets ADD COLUMN published INTEGER NOT NULL DEFAULT 1",
+            "ALTER TABLE tickets ADD COLUMN photo_ids TEXT NULL",
+            "CREATE INDEX idx_tickets_published ON tickets (published)",
+        ],
+    ),
+    Migration(
+        11,
+        "admin_dashboard",
+        [
+            """
+            CREATE TABLE admin_dashboards (
+                admin_chat_id BIGINT PRIMARY KEY,
+                message_id BIGINT NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    ),
+    Migration(
+        12,
+        "webhook_outbox",
+        [
+            """
+            CREATE TABLE webhook_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_type VARCHAR(32) NOT NULL,
+                ticket_id BIGINT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    ),
+    Migration(
+        13,
+        "ticket_publication_progress",
+        [
+            # сколько фото тикета уже отправлено альбомом в тему
+            "ALTER TABLE tickets ADD COLUMN posted_photos INTEGER NOT NULL DEFAULT 0",
+        ],
+    ),
+    Migration(
+        14,
+        "ticket_relay_queue",
+        [
+            # сообщения игрока, пришедшие до создания темы тикета
+            """
+            CREATE TABLE ticket_relay_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ticket_id INTEGER NOT NULL
+                    REFERENCES tickets (id) ON DELETE CASCADE ON UPDATE CASCADE,
+                chat_id BIGINT NOT NULL,
+                message_id BIGINT NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "CREATE INDEX idx_relay_ticket_id ON ticket_relay_queue (ticket_id)",
+        ],
+    ),
+    Migration(
+        15,
+        "ticket_publish_error",
+        [
+            # ошибка, из-за которой тема тикета не создаётся (ждёт /republish)
+            "ALTER TABLE tickets ADD COLUMN publish_error VARCHAR(255) NULL",
+        ],
+    ),
+]
+
+FULLTEXT_HITS_SQL = """
+    SELECT ticket_id, SUM(score) AS score
+    FROM (
+        SELECT rowid AS ticket_id, -2 * bm25(tickets_fts) AS score
+        FROM tickets_fts
+        WHERE tickets_fts MATCH %s
+        UNION ALL
+        SELECT m.ticket_id, -bm25(ticket_messages_fts) AS score
+        FROM ticket_messages_fts
+        JOIN ticket_messages AS m ON m.id = ticket_messages_fts.rowid
+        WHERE ticket_messages_fts MATCH %s
+    )
+    GROUP BY ticket_id
+"""
+
+
+def _fts5_term(term: SearchTerm) -> str:
+    # Термы уже очищены parse_search_query, кавычки внутри не встречаются.
+    if term.kind == "prefix":
+        return f'"{term.text}" *'
+    return f'"{term.text}"'
+
+
+def _adapt_datetime(value: datetime) -> str:
+    # CURRENT_TIMESTAMP в SQLite — UTC; наивные datetime считаем локальными,
+    # как их возвращает MySQL в часовом поясе сервера.
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _convert_timestamp(raw: bytes) -> datetime:
+    value = datetime.fromisoformat(raw.decode("utf-8"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone().replace(tzinfo=None)
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+
+
+@lru_cache(maxsize=512)
+def translate_sql(sql: str) -> str:
+    """Плейсхолдеры aiomysql (%s, %%) -> qmark-стиль sqlite3."""
+    return sql.replace("%s", "?").replace("%%", "%")
+
+
+class SQLiteCursor(StorageCursor):
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        backend: StorageBackend,
+        dict_rows: bool,
+    ):
+        self._conn = conn
+        self._backend = backend
+        self._dict_rows = dict_rows
+        self._raw: aiosqlite.Cursor | None = None
+
+    def _row(self, row: Optional[tuple]) -> Optional[Any]:
+        if row is None or not self._dict_rows:
+            return row
+        assert self._raw is not None
+        columns = [col[0] for col in self._raw.description]
+        return dict(zip(columns, row))
+
+    async def execute(self, sql: str, args: Sequence[Any] | None = None) -> int:
+        self._backend.notify_query(sql, args)
+        if self._raw is not None:
+            await self._raw.close()
+        self._raw = await self._conn.execute(translate_sql(sql), tuple(args or ()))
+        return self._raw.rowcount
+
+    async def executemany(self, sql: str, rows: Sequence[Sequence[Any]]) -> int:
+        self._backend.notify_query(sql, rows)
+        if self._raw is not None:
+            await self._raw.close()
+        self._raw = await self._conn.executemany(translate_sql(sql), rows)
+        return self._raw.rowcount
+
+    async def fetchone(self) -> Optional[Any]:
+        assert self._raw is not None
+        return self._row(await self._raw.fetchone())
+
+    async def fetchmany(self, size: int) -> List[Any]:
+        assert self._raw is not None
+        return [self._row(row) for row in await self._raw.fetchmany(size)]
+
+    async def fetchall(self) -> List[Any]:
+        assert self._raw is not None
+        return [self._row(row) for row in await self._raw.fetchall()]
+
+    @property
+    def lastrowid(self) -> int:
+        assert self._raw is not None
+        return self._raw.lastrowid
+
+    @property
+    def rowcount(self) -> int:
+        assert self._raw is not None
+        return self._raw.rowcount
+
+    async def close(self):
+        if self._raw is not None:
+            await self._raw.close()
+            self._raw = None
+
+
+class SQLiteConnection(StorageConnection):
+    # Сразу берём блокировку записи: иначе в WAL транзакция, начавшая
+    # с чтения, получает SQLITE_BUSY при первой записи без ожидания busy_timeout.
+    begin_statement = "BEGIN IMMEDIATE"
+
+    def __init__(self, raw: aiosqlite.Connection, backend: StorageBackend):
+        self.raw = raw
+        self._backend = backend
+
+    @asynccontextmanager
+    async def cursor(
+        self, dict_rows: bool = False, stream: bool = False
+    ) -> AsyncIterator[SQLiteCursor]:
+        del stream  # sqlite3 и так отдаёт строки лениво по мере fetch*
+        cursor = SQLiteCursor(self.raw, self._backend, dict_rows)
+        try:
+            yield cursor
+        finally:
+            await cursor.close()
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Встраиваемое хранилище на aiosqlite в режиме WAL.
+    Небольшой пул соединений: WAL допускает параллельное чтение,
+    записи сериализует сам SQLite (busy_timeout).
+    """
+
+    name = "sqlite"
+    migrations = MIGRATIONS
+    transactional_ddl = True
+
+    def __init__(self, path: str, pool_size: int = 4):
+        super().__init__()
+        self.path = path
+        self.pool_size = pool_size
+        self._connections: list[aiosqlite.Connection] = []
+        self._idle: asyncio.Queue[aiosqlite.Connection] | None = None
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(
+            self.path,
+            isolation_level=None,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+        )
+        await conn.execute("PRAGMA journal_mode = WAL")
+        await conn.execute("PRAGMA synchronous = NORMAL")
+        await conn.execute("PRAGMA foreign_keys = ON")
+        await conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    async def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._idle = asyncio.Queue()
+        for _ in range(self.pool_size):
+            conn = await self._connect()
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections.clear()
+        self._idle = None
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[SQLiteConnection]:
+        assert self._idle is not None
+        raw = await self._idle.get()
+        try:
+            yield SQLiteConnection(raw, self)
+        finally:
+            self._idle.put_nowait(raw)
+
+    def since(self, amount: int, unit: str) -> str:
+        amount, unit = check_interval(amount, unit)
+        return f"datetime('now', '-{amount} {SQLITE_INTERVAL_UNITS[unit]}')"
+
+    def seconds_between(self, start: str, end: str) -> str:
+        return f"CAST(ROUND((julianday({end}) - julianday({start})) * 86400) AS INTEGER)"
+
+    def upsert_clause(
+        self,
+        key_columns: Sequence[str],
+        update_columns: Sequence[str],
+        touch_columns: Sequence[str] = (),
+    ) -> str:
+        assignments = [f"{col} = excluded.{col}" for col in update_columns]
+        assignments += [f"{col} = CURRENT_TIMESTAMP" for col in touch_columns]
+        return (
+            f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET "
+            + ", ".join(assignments)
+        )
+
+    def fulltext_query(self, terms: SearchTerms) -> str:
+        query = " AND ".join(_fts5_term(term) for term in terms.required)
+        for term in terms.excluded:
+            query += f" NOT {_fts5_term(term)}"
+        return query
+
+    def fulltext_hits_sql(self) -> tuple[str, int]:
+        # bm25() в FTS5 отрицательный: меньше — релевантнее, поэтому меняем знак.
+        return FULLTEXT_HITS_SQL, 2
+
+    async def ensure_schema(self):
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                for statement in SCHEMA:
+                    await cur.execute(statement)
+
+        await self.apply_migrations()
@@ -0,0 +1,656 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the public query functions of ``db.py``.
+
+Seeds a dedicated database with a configurable volume of tickets, messages and
+profiles (skewed like production: a few heavy users and very long tickets,
+mostly closed history), times every public coroutine of ``db.py``, captures
+the query plans of the statements each function issues (``EXPLAIN FORMAT=JSON``
+on MySQL, ``EXPLAIN QUERY PLAN`` on SQLite) and writes a JSON report with
+stable key order, so reports from two commits can be diffed.
+
+Public functions without a benchmark case are listed under ``"skipped"`` so a
+new query never goes unnoticed.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+import argparse
+import asyncio
+import inspect
+import json
+import random
+import subprocess
+import sys
+import time
+
+BOT_DIR = Path(__file__).resolve().parent.parent
+if str(BOT_DIR) not in sys.path:
+    sys.path.insert(0, str(BOT_DIR))
+
+# pylint: disable=wrong-import-position
+import db
+from config import load_settings
+from devdb import ensure_database, isolated_settings
+from query_probe import QueryProbe, normalize_sql
+from storage import StorageBackend
+
+LIFECYCLE_FUNCTIONS = {"init_db_pool", "close_db_pool", "ensure_schema"}
+EXPLAINABLE_PREFIXES = ("SELECT", "UPDATE", "DELETE")
+
+CATEGORIES = ("donate", "bug", "other")
+CATEGORY_WEIGHTS = (0.35, 0.4, 0.25)
+ADMINS = [(5_000_000_000 + idx, f"bench_admin{idx}") for idx in range(8)]
+USER_ID_BASE = 1_000_000_000
+WORDS = (
+    "донат не пришёл сервер ошибка игрок машина дом бизнес фракция наказание "
+    "жалоба баг текстура вылет лаг оплата монеты кейс промокод аккаунт пароль "
+    "админ тикет ответ скрин видео доказательство"
+).split()
+
+
+@dataclass
+class BenchCase:
+    name: str
+    func_name: str
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+
+
+@dataclass
+class Samples:
+    typical_ticket_id: int
+    heavy_ticket_id: int
+    thread_id: int
+    typical_user_id: int
+    heavy_user_id: int
+    admin_id: int
+    heavy_ticket_mid_message_id: int
+    bench_ticket_id: int = 0
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def random_text(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 60)))
+
+
+def message_counts(rng: random.Random, tickets: int, messages: int) -> list[int]:
+    """Pareto-распределение сообщений по тикетам: у каждого тикета минимум одно."""
+    weights = [rng.paretovariate(1.3) for _ in range(tickets)]
+    extra = max(0, messages - tickets)
+    scale = extra / sum(weights) if weights else 0.0
+    return [1 + int(weight * scale) for weight in weights]
+
+
+async def commit_batch(cur):
+    await cur.execute("COMMIT")
+    await cur.execute("BEGIN")
+
+
+async def seed_database(
+    backend: StorageBackend,
+    *,
+    tickets: int,
+    messages: int,
+    users: int,
+    days: int,
+    seed: int,
+    batch: int,
+):
+    rng = random.Random(seed)
+    counts = message_counts(rng, tickets, messages)
+    now = datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    span = timedelta(days=days).total_seconds()
+
+    mysql = backend.name == "mysql"
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            if mysql:
+                await cur.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+            for table in (
+                "ticket_messages_archive",
+                "ticket_messages",
+                "tickets",
+                "user_profiles",
+            ):
+                await cur.execute(
+                    f"TRUNCATE TABLE {table}" if mysql else f"DELETE FROM {table}"
+                )
+            await cur.execute("BEGIN")
+
+            await cur.executemany(
+                "INSERT INTO user_profiles (user_id, game_nickname) VALUES (%s, %s)",
+                [(USER_ID_BASE + idx, f"Bench_{idx}") for idx in range(users)],
+            )
+
+            ticket_rows = []
+            message_rows = []
+            message_id = 0
+            thread_id = 0
+            for ticket_id in range(1, tickets + 1):
+                created = start + timedelta(
+                    seconds=span * (ticket_id / tickets) - rng.uniform(0, 600)
+                )
+                # Свежие тикеты чаще активны, история почти целиком закрыта.
+                recent = ticket_id > tickets * 0.98
+                roll = rng.random()
+                if recent and roll < 0.4:
+                    status = "open"
+                elif recent and roll < 0.8:
+                    status = "in_work"
+                else:
+                    status = "closed" if roll < 0.995 or recent else "in_work"
+
+                has_thread = status != "closed" or rng.random() < 0.3
+                thread_id += 1
+                admin = rng.choice(ADMINS) if status != "open" and rng.random() < 0.8 else None
+                user_idx = int(users * rng.random() ** 3)
+                # первый ответ админа — второе сообщение переписки
+                first_reply = (
+                    created + timedelta(minutes=7) if counts[ticket_id - 1] > 1 else None
+                )
+                ticket_rows.append(
+                    (
+                        ticket_id,
+                        USER_ID_BASE + user_idx,
+                        f"bench{user_idx}",
+                        rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0],
+                        f"Тикет {ticket_id}: {rng.choice(WORDS)} {rng.choice(WORDS)}",
+                        status,
+                        thread_id if has_thread else None,
+                        admin[0] if admin else None,
+                        admin[1] if admin else None,
+                        created,
+                        created,
+                        first_reply if status != "open" else None,
+                        first_reply,
+                        (
+                            created + timedelta(minutes=counts[ticket_id - 1] * 7)
+                            if status == "closed"
+                            else None
+                        ),
+                        created + timedelta(minutes=max(counts[ticket_id - 1] - 1, 0) * 7),
+                    )
+                )
+
+                for msg_no in range(counts[ticket_id - 1]):
+                    message_id += 1
+                    message_rows.append(
+                        (
+                            message_id,
+                            ticket_id,
+                            "user" if msg_no % 2 == 0 else "admin",
+                            random_text(rng),
+                            created + timedelta(minutes=msg_no * 7),
+                        )
+                    )
+                    if len(message_rows) >= batch:
+                        await flush_tickets(cur, ticket_rows)
+                        await flush_messages(cur, message_rows)
+                        await commit_batch(cur)
+
+                if len(ticket_rows) >= batch:
+                    await flush_tickets(cur, ticket_rows)
+                    await commit_batch(cur)
+
+            await flush_tickets(cur, ticket_rows)
+            await flush_messages(cur, message_rows)
+            await cur.execute("COMMIT")
+            if mysql:
+                await cur.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+                for table in ("tickets", "ticket_messages", "user_profiles"):
+                    await cur.execute(f"ANALYZE TABLE {table}")
+                    await cur.fetchall()
+            else:
+                await cur.execute("ANALYZE")
+
+
+async def flush_tickets(cur, rows: list[tuple]):
+    if not rows:
+        return
+    await cur.executemany(
+        """
+        INSERT INTO tickets (
+            id, user_id, username, category, topic, status, admin_thread_id,
+            assigned_admin_id, assigned_admin_username, created_at, updated_at,
+            taken_at, first_admin_reply_at, closed_at, last_message_at
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        rows,
+    )
+    rows.clear()
+
+
+async def flush_messages(cur, rows: list[tuple]):
+    if not rows:
+        return
+    await cur.executemany(
+        """
+        INSERT INTO ticket_messages (id, ticket_id, sender, text, created_at)
+        VALUES (%s, %s, %s, %s, %s)
+        """,
+        rows,
+    )
+    rows.clear()
+
+
+async def fetch_value(backend: StorageBackend, sql: str, default=None):
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(sql)
+            row = await cur.fetchone()
+            return row[0] if row and row[0] is not None else default
+
+
+async def table_counts(backend: StorageBackend) -> dict[str, int]:
+    counts = {}
+    for table in ("tickets", "ticket_messages", "user_profiles"):
+        counts[table] = int(
+            await fetch_value(backend, f"SELECT COUNT(*) FROM {table}", 0)
+        )
+    return counts
+
+
+async def pick_samples(backend: StorageBackend, seed: int) -> Samples:
+    rng = random.Random(seed)
+    max_ticket_id = int(await fetch_value(backend, "SELECT MAX(id) FROM tickets", 0))
+    if not max_ticket_id:
+        raise SystemExit("Database is empty: run with --reseed to seed it.")
+
+    typical_ticket_id = int(
+        await fetch_value(
+            backend,
+            f"SELECT id FROM tickets WHERE id >= {rng.randint(1, max_ticket_id)} "
+            "ORDER BY id LIMIT 1",
+        )
+    )
+    heavy_ticket_id = int(
+        await fetch_value(
+            backend,
+            "SELECT ticket_id FROM ticket_messages "
+            "GROUP BY ticket_id ORDER BY COUNT(*) DESC LIMIT 1",
+        )
+    )
+    heavy_ticket_mid_message_id = int(
+        await fetch_value(
+            backend,
+            "SELECT (MIN(id) + MAX(id)) / 2 FROM ticket_messages "
+            f"WHERE ticket_id = {heavy_ticket_id}",
+        )
+    )
+    heavy_user_id = int(
+        await fetch_value(
+            backend,
+            "SELECT user_id FROM tickets GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1",
+        )
+    )
+    typical_user_id = int(
+        await fetch_value(
+            backend, f"SELECT user_id FROM tickets WHERE id = {typical_ticket_id}"
+        )
+    )
+    thread_id = int(
+        await fetch_value(
+            backend,
+            "SELECT admin_thread_id FROM tickets "
+            "WHERE admin_thread_id IS NOT NULL ORDER BY id DESC LIMIT 1",
+            0,
+        )
+    )
+    admin_id = int(
+        await fetch_value(
+            backend,
+            "SELECT assigned_admin_id FROM tickets WHERE assigned_admin_id IS NOT NULL "
+            "GROUP BY assigned_admin_id ORDER BY COUNT(*) DESC LIMIT 1",
+            ADMINS[0][0],
+        )
+    )
+    return Samples(
+        typical_ticket_id=typical_ticket_id,
+        heavy_ticket_id=heavy_ticket_id,
+        thread_id=thread_id,
+        typical_user_id=typical_user_id,
+        heavy_user_id=heavy_user_id,
+        admin_id=admin_id,
+        heavy_ticket_mid_message_id=heavy_ticket_mid_message_id,
+    )
+
+
+def build_cases(samples: Samples) -> list[BenchCase]:
+    bench_user_id = USER_ID_BASE - 1
+    return [
+        BenchCase("get_open_tickets", "get_open_tickets"),
+        BenchCase("get_tickets_by_status[open]", "get_tickets_by_status", ("open",)),
+        BenchCase("get_tickets_by_status[in_work]", "get_tickets_by_status", ("in_work",)),
+        BenchCase("get_tickets_by_status[closed]", "get_tickets_by_status", ("closed",)),
+        BenchCase("get_tickets_by_assignee", "get_tickets_by_assignee", (samples.admin_id,)),
+        BenchCase("get_closed_tickets_with_threads", "get_closed_tickets_with_threads"),
+        BenchCase("get_ticket", "get_ticket", (samples.typical_ticket_id,)),
+        BenchCase("ticket_exists", "ticket_exists", (samples.typical_ticket_id,)),
+        BenchCase("get_ticket_by_thread_id", "get_ticket_by_thread_id", (samples.thread_id,)),
+        BenchCase(
+            "get_ticket_with_messages[typical]",
+            "get_ticket_with_messages",
+            (samples.typical_ticket_id,),
+        ),
+        BenchCase(
+            "get_ticket_with_messages[heavy]",
+            "get_ticket_with_messages",
+            (samples.heavy_ticket_id,),
+        ),
+        BenchCase(
+            "get_ticket_messages_page[heavy,latest]",
+            "get_ticket_messages_page",
+            (samples.heavy_ticket_id,),
+        ),
+        BenchCase(
+            "get_ticket_messages_page[heavy,older]",
+            "get_ticket_messages_page",
+            (samples.heavy_ticket_id,),
+            kwargs={"before_id": samples.heavy_ticket_mid_message_id},
+        ),
+        BenchCase("search_tickets[word]", "search_tickets", (WORDS[0],)),
+        BenchCase(
+            "search_tickets[phrase,filtered]",
+            "search_tickets",
+            (f'"{WORDS[0]} {WORDS[1]}"',),
+            kwargs={"status": "closed", "category": "donate"},
+        ),
+        BenchCase(
+            "get_archivable_tickets",
+            "get_archivable_tickets",
+            (30,),
+            kwargs={"limit": 50},
+        ),
+        BenchCase(
+            "get_expired_ticket_ids[default]",
+            "get_expired_ticket_ids",
+            (180,),
+            kwargs={"exclude_categories": ("donate",)},
+        ),
+        BenchCase("get_orphan_user_profile_ids", "get_orphan_user_profile_ids", (180,)),
+        BenchCase("get_ticket_stats_overview", "get_ticket_stats_overview"),
+        BenchCase("get_ticket_stats_by_assignee", "get_ticket_stats_by_assignee"),
+        BenchCase("get_sla_samples[30d]", "get_sla_samples", (30,)),
+        BenchCase(
+            "get_escalation_candidates",
+            "get_escalation_candidates",
+            ([("donate", (), (30, 120)), (None, ("donate",), (60, 240))],),
+        ),
+        BenchCase("get_user_tickets[typical]", "get_user_tickets", (samples.typical_user_id,)),
+        BenchCase("get_user_tickets[heavy]", "get_user_tickets", (samples.heavy_user_id,)),
+        BenchCase(
+            "get_user_last_active_ticket[heavy]",
+            "get_user_last_active_ticket",
+            (samples.heavy_user_id,),
+        ),
+        BenchCase(
+            "get_user_active_tickets[heavy]",
+            "get_user_active_tickets",
+            (samples.heavy_user_id,),
+        ),
+        BenchCase(
+            "get_user_active_tickets_count[heavy]",
+            "get_user_active_tickets_count",
+            (samples.heavy_user_id,),
+        ),
+        BenchCase("get_user_profile", "get_user_profile", (samples.typical_user_id,)),
+        BenchCase(
+            "create_ticket",
+            "create_ticket",
+            kwargs={
+                "user_id": bench_user_id,
+                "username": "bench",
+                "topic": "Бенчмарк",
+                "text": "Сообщение бенчмарка",
+                "category": "other",
+            },
+        ),
+        BenchCase(
+            "add_ticket_message",
+            "add_ticket_message",
+            (samples.bench_ticket_id, "user", "Сообщение бенчмарка"),
+        ),
+        BenchCase("set_ticket_status", "set_ticket_status", (samples.bench_ticket_id, "in_work")),
+        BenchCase("set_ticket_thread", "set_ticket_thread", (samples.bench_ticket_id, None)),
+        BenchCase(
+            "set_ticket_assignee",
+            "set_ticket_assignee",
+            (samples.bench_ticket_id, ADMINS[0][0], ADMINS[0][1]),
+        ),
+        BenchCase("upsert_user_profile", "upsert_user_profile", (bench_user_id, "Bench_user")),
+    ]
+
+
+def public_functions() -> list[str]:
+    return sorted(
+        name
+        for name, obj in inspect.getmembers(db, inspect.iscoroutinefunction)
+        if not name.startswith("_")
+        and name not in LIFECYCLE_FUNCTIONS
+        and obj.__module__ == db.__name__
+    )
+
+
+async def explain(backend: StorageBackend, sql: str, args) -> object:
+    mysql = backend.name == "mysql"
+    async with backend.acquire() as conn:
+        async with conn.cursor() as cur:
+            try:
+                if mysql:
+                    await cur.execute(f"EXPLAIN FORMAT=JSON {sql}", args)
+                else:
+                    await cur.execute(f"EXPLAIN QUERY PLAN {sql}", args)
+                rows = await cur.fetchall()
+            except Exception as exc:
+                return {"error": str(exc)}
+
+    if not mysql:
+        # (id, parent, notused, detail) -> читаемые шаги плана
+        return [row[3] for row in rows]
+    try:
+        return json.loads(rows[0][0])
+    except (IndexError, TypeError, ValueError):
+        return rows[0][0] if rows else None
+
+
+async def run_case(
+    case: BenchCase,
+    *,
+    backend: StorageBackend,
+    probe: QueryProbe,
+    repeat: int,
+    warmup: int,
+) -> dict:
+    func = getattr(db, case.func_name)
+    for _ in range(warmup):
+        await func(*case.args, **case.kwargs)
+
+    timings: list[float] = []
+    probe.reset()
+    for idx in range(repeat):
+        probe.record = idx == 0
+        started = time.perf_counter()
+        await func(*case.args, **case.kwargs)
+        timings.append(time.perf_counter() - started)
+    probe.record = False
+
+    recorded = list(probe.queries)
+    queries_per_call = probe.count / repeat if repeat else 0
+
+    statements = []
+    for query in recorded:
+        sql = normalize_sql(query.sql)
+        entry: dict = {"sql": sql}
+        if sql.upper().startswith(EXPLAINABLE_PREFIXES):
+            entry["explain"] = await explain(backend, sql, query.args)
+        statements.append(entry)
+
+    ordered = sorted(timings)
+    return {
+        "function": case.func_name,
+        "queries_per_call": round(queries_per_call, 2),
+        "timings_ms": {
+            "min": round(ordered[0] * 1000, 3),
+            "p50": round(percentile(ordered, 50) * 1000, 3),
+            "p95": round(percentile(ordered, 95) * 1000, 3),
+            "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3),
+        },
+        "statements": statements,
+    }
+
+
+def git_revision() -> dict:
+    def run(*cmd: str) -> str:
+        try:
+            return subprocess.run(
+                cmd,
+                cwd=BOT_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    return {
+        "commit": run("git", "rev-parse", "HEAD"),
+        "dirty": bool(run("git", "status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+async def run_benchmarks(args: argparse.Namespace) -> dict:
+    settings = isolated_settings(
+        load_settings(),
+        suffix="bench",
+        backend=args.backend,
+        db_name=args.db_name,
+        db_path=args.db_path,
+    )
+    await ensure_database(settings)
+    await db.init_db_pool(settings)
+    backend = db.BACKEND
+    assert backend is not None
+    try:
+        if args.reseed:
+            started = time.perf_counter()
+            await seed_database(
+                backend,
+                tickets=args.tickets,
+                messages=args.messages,
+                users=args.users or max(1, args.tickets // 4),
+                days=args.days,
+                seed=args.seed,
+                batch=args.batch,
+            )
+            print(f"seeded in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+        counts = await table_counts(backend)
+        samples = await pick_samples(backend, args.seed)
+        samples.bench_ticket_id = await db.create_ticket(
+            user_id=USER_ID_BASE - 1,
+            username="bench",
+            topic="Бенчмарк",
+            text="Тикет для бенчмарка записи",
+            category="other",
+        )
+        server_version = await fetch_value(
+            backend,
+            "SELECT VERSION()" if backend.name == "mysql" else "SELECT sqlite_version()",
+            "",
+        )
+
+        cases = build_cases(samples)
+        if args.only:
+            cases = [case for case in cases if case.func_name in args.only]
+
+        results = {}
+        with QueryProbe(backend) as probe:
+            for case in cases:
+                results[case.name] = await run_case(
+                    case,
+                    backend=backend,
+                    probe=probe,
+                    repeat=args.repeat,
+                    warmup=args.warmup,
+                )
+                print(
+                    f"{case.name:<40} p50={results[case.name]['timings_ms']['p50']} ms",
+                    file=sys.stderr,
+                )
+
+        covered = {case.func_name for case in build_cases(samples)}
+        return {
+            "meta": {
+                "git": git_revision(),
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+                "backend": backend.name,
+                "server_version": server_version,
+                "database": (
+                    settings.db_name if backend.name == "mysql" else settings.db_path
+                ),
+                "rows": counts,
+                "repeat": args.repeat,
+                "warmup": args.warmup,
+                "seed": args.seed,
+                "samples": samples.__dict__,
+            },
+            "results": results,
+            "skipped": [name for name in public_functions() if name not in covered],
+        }
+    finally:
+        await db.close_db_pool()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark db.py query functions.")
+    parser.add_argument(
+        "--backend", choices=("mysql", "sqlite"), default="", help="Override DB_BACKEND."
+    )
+    parser.add_argument(
+        "--db-name", default="", help="MySQL database (default: <DB_NAME>_bench)."
+    )
+    parser.add_argument(
+        "--db-path", default="", help="SQLite file (default: <DB_PATH>_bench)."
+    )
+    parser.add_argument(
+        "--reseed",
+        action="store_true",
+        help="Empty the benchmark tables and seed them again.",
+    )
+    parser.add_argument("--tickets", type=int, default=100_000, help="Tickets to seed.")
+    parser.add_argument("--messages", type=int, default=2_000_000, help="Messages to seed.")
+    parser.add_argument("--users", type=int, default=0, help="Players (default: tickets/4).")
+    parser.add_argument("--days", type=int, default=365, help="History span in days.")
+    parser.add_argument("--batch", type=int, default=5000, help="Rows per INSERT batch.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per case.")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed calls per case.")
+    parser.add_argument(
+        "--only", nargs="*", default=[], help="Benchmark only these db.py functions."
+    )
+    parser.add_argument("--out", default="", help="Write the JSON report to this file.")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmarks(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True, default=str)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
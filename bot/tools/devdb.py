@@ -0,0 +1,58 @@
+"""Isolated databases for dev tools (load test, benchmarks).
+
+Tools never touch the production database from .env: MySQL runs use a
+separate ``<DB_NAME>_<suffix>`` schema created on demand, SQLite runs use a
+separate file next to ``DB_PATH``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import replace
+import re
+
+from config import Settings
+
+DB_NAME_RE = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+def isolated_settings(
+    base: Settings,
+    *,
+    suffix: str,
+    backend: str = "",
+    db_name: str = "",
+    db_path: str = "",
+) -> Settings:
+    backend = (backend or base.db_backend).lower()
+    db_name = db_name or f"{base.db_name}_{suffix}"
+    if not DB_NAME_RE.match(db_name):
+        raise SystemExit(f"Invalid database name: {db_name!r}")
+
+    if not db_path:
+        stem, dot, ext = base.db_path.rpartition(".")
+        db_path = f"{stem}_{suffix}.{ext}" if dot else f"{base.db_path}_{suffix}"
+    return replace(base, db_backend=backend, db_name=db_name, db_path=db_path)
+
+
+async def ensure_database(settings: Settings):
+    """Create the MySQL schema if missing (SQLite creates its file itself)."""
+    if settings.db_backend != "mysql":
+        return
+
+    import aiomysql
+
+    conn = await aiomysql.connect(
+        host=settings.db_host,
+        port=settings.db_port,
+        user=settings.db_user,
+        password=settings.db_password,
+        autocommit=True,
+    )
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"CREATE DATABASE IF NOT EXISTS `{settings.db_name}` "
+                "CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
+            )
+    finally:
+        conn.close()
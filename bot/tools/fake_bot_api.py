@@ -0,0 +1,158 @@
+"""In-process fake of the Telegram Bot API used by the load-test harness.
+
+The server answers every Bot API method the handlers call with a minimal but
+schema-valid result, counts calls per method and remembers the forum topics it
+created, so synthetic admins can reply inside real ticket threads.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+import asyncio
+import itertools
+import json
+import re
+import time
+
+from aiohttp import web
+
+
+MESSAGE_METHODS = {
+    "sendMessage",
+    "sendPhoto",
+    "sendDocument",
+    "sendVideo",
+    "sendAnimation",
+    "sendVoice",
+    "sendAudio",
+    "sendSticker",
+    "editMessageText",
+    "editMessageCaption",
+    "editMessageReplyMarkup",
+}
+
+TOPIC_TICKET_ID_RE = re.compile(r"#(\d+)")
+
+
+@dataclass
+class ForumThread:
+    chat_id: int
+    thread_id: int
+    ticket_id: int | None
+    name: str
+
+
+class FakeBotAPI:
+    def __init__(self, *, bot_id: int, latency: float = 0.0):
+        self.bot_id = bot_id
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self.threads: list[ForumThread] = []
+        self._ids = itertools.count(1)
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{bound_port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        form = await request.post()
+        params = {key: value for key, value in form.items() if isinstance(value, str)}
+        self.calls[method] += 1
+
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+        result = self._result_for(method, params)
+        return web.json_response({"ok": True, "result": result})
+
+    def _message(self, params: dict[str, str]) -> dict:
+        chat_id = int(params.get("chat_id") or 0)
+        message = {
+            "message_id": next(self._ids),
+            "date": int(time.time()),
+            "chat": {
+                "id": chat_id,
+                "type": "supergroup" if chat_id < 0 else "private",
+            },
+        }
+        if params.get("message_thread_id"):
+            message["message_thread_id"] = int(params["message_thread_id"])
+        if params.get("text"):
+            message["text"] = params["text"]
+        return message
+
+    def _result_for(self, method: str, params: dict[str, str]):
+        if method == "getMe":
+            return {
+                "id": self.bot_id,
+                "is_bot": True,
+                "first_name": "LoadTest",
+                "username": "loadtest_bot",
+            }
+
+        if method in MESSAGE_METHODS:
+            return self._message(params)
+
+        if method == "sendMediaGroup":
+            media = json.loads(params.get("media") or "[]")
+            return [self._message(params) for _ in media]
+
+        if method == "createForumTopic":
+            name = params.get("name", "")
+            match = TOPIC_TICKET_ID_RE.search(name)
+            thread = ForumThread(
+                chat_id=int(params.get("chat_id") or 0),
+                thread_id=next(self._ids),
+                ticket_id=int(match.group(1)) if match else None,
+                name=name,
+            )
+            self.threads.append(thread)
+            return {
+                "message_thread_id": thread.thread_id,
+                "name": name,
+                "icon_color": 7322096,
+            }
+
+        if method == "getChatMember":
+            return {
+                "status": "member",
+                "user": {
+                    "id": int(params.get("user_id") or 0),
+                    "is_bot": False,
+                    "first_name": "Admin",
+                },
+            }
+
+        if method == "getChat":
+            return {
+                "id": int(params.get("chat_id") or 0),
+                "type": "private",
+                "first_name": "Player",
+                "accent_color_id": 0,
+                "max_reaction_count": 11,
+            }
+
+        if method == "getUpdates":
+            return []
+
+        return True
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""End-to-end load test of the support bot against a fake Telegram Bot API.
+
+Boots the real Dispatcher and routers from ``handlers.get_routers()``, points
+the Bot session at an in-process fake Bot API server and feeds updates from
+synthetic players (ticket creation, text replies, photo albums) and admins
+(replies and "take" presses inside ticket topics). Reports handler latency
+percentiles, throughput, DB queries per update and peak RSS.
+
+The storage backend is taken from .env (DB_BACKEND and its connection
+settings), but the harness always works in a separate database: the
+``<DB_NAME>_loadtest`` MySQL schema (created when missing) or a
+``*_loadtest`` SQLite file next to DB_PATH. ``--backend sqlite`` runs the whole
+test on a dev box without any database server.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import resource
+import sys
+import time
+
+BOT_DIR = Path(__file__).resolve().parent.parent
+if str(BOT_DIR) not in sys.path:
+    sys.path.insert(0, str(BOT_DIR))
+
+# pylint: disable=wrong-import-position
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Update
+
+from bot import create_dispatcher
+import db
+from config import load_settings
+from devdb import ensure_database, isolated_settings
+from fake_bot_api import FakeBotAPI
+from query_probe import QueryProbe
+
+
+LOGGER = logging.getLogger("support_bot.loadtest")
+
+FAKE_BOT_TOKEN = "123456789:LOADTEST"
+FAKE_ADMIN_CHAT_ID = -1001000000001
+ADMIN_ID_BASE = 6_000_000_000
+CATEGORY_BUTTONS = ("💳 Донат", "🛠 Баг / тех. проблема", "📦 Другое")
+
+
+@dataclass
+class LoadTestOptions:
+    players: int
+    admins: int
+    replies: int
+    album_every: int
+    album_size: int
+    reply_interval: float
+    step_delay: float
+    ramp_up: float
+    admin_interval: float
+    take_ratio: float
+    api_latency: float
+    seed: int
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values: list[float]) -> dict:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 2),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class LoadTest:
+    def __init__(self, *, options: LoadTestOptions, dp, bot: Bot, api: FakeBotAPI):
+        self.options = options
+        self.dp = dp
+        self.bot = bot
+        self.api = api
+        self.random = random.Random(options.seed)
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors = 0
+        self.taken_tickets: set[int] = set()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._media_group_ids = itertools.count(1)
+        # Свежие user_id на каждый прогон: без профилей и активных тикетов в БД.
+        self.player_id_base = 7_000_000_000 + (int(time.time()) % 100_000) * 10_000
+
+    @property
+    def total_updates(self) -> int:
+        return sum(len(values) for values in self.latencies.values())
+
+    async def feed(self, kind: str, update_type: str, payload: dict):
+        update = Update.model_validate(
+            {"update_id": next(self._update_ids), update_type: payload},
+            context={"bot": self.bot},
+        )
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            self.errors += 1
+            LOGGER.exception("Update of kind %s failed", kind)
+        self.latencies[kind].append(time.perf_counter() - started)
+
+    def _photo(self) -> list[dict]:
+        file_no = next(self._file_ids)
+        return [
+            {
+                "file_id": f"loadtest-photo-{file_no}",
+                "file_unique_id": f"lt{file_no}",
+                "width": 1280,
+                "height": 720,
+            }
+        ]
+
+    def player_message(self, user_id: int, **fields) -> dict:
+        user = {
+            "id": user_id,
+            "is_bot": False,
+            "first_name": "Player",
+            "username": f"player{user_id}",
+        }
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": "Player"},
+            "from": user,
+            **fields,
+        }
+
+    def admin_message(self, admin_id: int, thread_id: int, **fields) -> dict:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {
+                "id": FAKE_ADMIN_CHAT_ID,
+                "type": "supergroup",
+                "title": "Support admins",
+                "is_forum": True,
+            },
+            "from": {
+                "id": admin_id,
+                "is_bot": False,
+                "first_name": "Admin",
+                "username": f"admin{admin_id}",
+            },
+            "message_thread_id": thread_id,
+            "is_topic_message": True,
+            **fields,
+        }
+
+    async def send_player_album(self, kind: str, user_id: int, caption: str):
+        media_group_id = f"lt-album-{next(self._media_group_ids)}"
+        for idx in range(self.options.album_size):
+            fields = {"photo": self._photo(), "media_group_id": media_group_id}
+            if idx == 0:
+                fields["caption"] = caption
+            await self.feed(kind, "message", self.player_message(user_id, **fields))
+
+    async def run_player(self, index: int):
+        options = self.options
+        user_id = self.player_id_base + index
+        await asyncio.sleep(self.random.uniform(0, options.ramp_up))
+
+        setup_steps = [
+            "/start",
+            "📩 Создать тикет",
+            f"Player_{index}",
+            self.random.choice(CATEGORY_BUTTONS),
+            f"Нагрузочный тикет {index}",
+        ]
+        for text in setup_steps:
+            await self.feed("player_setup", "message", self.player_message(user_id, text=text))
+            await asyncio.sleep(options.step_delay)
+
+        description = f"Описание проблемы игрока {index}: " + "текст " * 20
+        if options.album_every and index % options.album_every == 0:
+            await self.send_player_album("player_new_ticket_album", user_id, description)
+        else:
+            await self.feed(
+                "player_new_ticket",
+                "message",
+                self.player_message(user_id, text=description),
+            )
+
+        for reply_no in range(1, options.replies + 1):
+            await asyncio.sleep(options.reply_interval)
+            text = f"Ответ игрока {index} №{reply_no}"
+            if options.album_every and reply_no % options.album_every == 0:
+                await self.send_player_album("player_album", user_id, text)
+            else:
+                await self.feed(
+                    "player_reply", "message", self.player_message(user_id, text=text)
+                )
+
+    async def run_admin(self, index: int, stop: asyncio.Event):
+        admin_id = ADMIN_ID_BASE + index
+        reply_no = 0
+        while not stop.is_set():
+            await asyncio.sleep(self.random.uniform(0.5, 1.5) * self.options.admin_interval)
+            threads = [t for t in self.api.threads if t.chat_id == FAKE_ADMIN_CHAT_ID]
+            if not threads:
+                continue
+
+            thread = self.random.choice(threads)
+            if (
+                thread.ticket_id is not None
+                and thread.ticket_id not in self.taken_tickets
+                and self.random.random() < self.options.take_ratio
+            ):
+                self.taken_tickets.add(thread.ticket_id)
+                await self.feed(
+                    "admin_take",
+                    "callback_query",
+                    {
+                        "id": f"lt-cb-{next(self._update_ids)}",
+                        "from": {
+                            "id": admin_id,
+                            "is_bot": False,
+                            "first_name": "Admin",
+                            "username": f"admin{admin_id}",
+                        },
+                        "chat_instance": "loadtest",
+                        "data": f"take_ticket:{thread.ticket_id}",
+                        "message": self.admin_message(
+                            admin_id,
+                            thread.thread_id,
+                            text=f"🆕 Новый тикет #{thread.ticket_id}",
+                        ),
+                    },
+                )
+                continue
+
+            reply_no += 1
+            await self.feed(
+                "admin_reply",
+                "message",
+                self.admin_message(
+                    admin_id,
+                    thread.thread_id,
+                    text=f"Ответ админа {index} №{reply_no}",
+                ),
+            )
+
+    async def wait_background_tasks(self, timeout: float):
+        """Дождаться фоновых flush-задач альбомов, запущенных хендлерами."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            pending = [
+                task
+                for task in asyncio.all_tasks()
+                if getattr(task.get_coro(), "__name__", "").startswith("flush_")
+            ]
+            if not pending:
+                return
+            await asyncio.sleep(0.2)
+
+    async def run(self) -> float:
+        stop = asyncio.Event()
+        started = time.perf_counter()
+        admins = [
+            asyncio.create_task(self.run_admin(idx, stop))
+            for idx in range(self.options.admins)
+        ]
+        await asyncio.gather(
+            *(self.run_player(idx) for idx in range(self.options.players))
+        )
+        stop.set()
+        await asyncio.gather(*admins)
+        await self.wait_background_tasks(timeout=10.0)
+        return time.perf_counter() - started
+
+
+def build_report(
+    test: LoadTest,
+    *,
+    duration: float,
+    queries: int,
+    options: LoadTestOptions,
+) -> dict:
+    all_latencies = [value for values in test.latencies.values() for value in values]
+    updates = test.total_updates
+    return {
+        "options": options.__dict__,
+        "duration_s": round(duration, 2),
+        "updates": updates,
+        "errors": test.errors,
+        "throughput_updates_per_s": round(updates / duration, 2) if duration else 0.0,
+        "latency": summarize(all_latencies),
+        "latency_by_kind": {
+            kind: summarize(values) for kind, values in sorted(test.latencies.items())
+        },
+        "db_queries": queries,
+        "db_queries_per_update": round(queries / updates, 2) if updates else 0.0,
+        "bot_api_calls": test.api.total_calls,
+        "bot_api_calls_per_update": (
+            round(test.api.total_calls / updates, 2) if updates else 0.0
+        ),
+        "bot_api_calls_by_method": dict(test.api.calls.most_common()),
+        "tickets_published": len(test.api.threads),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_report(report: dict):
+    latency = report["latency"]
+    print("=== Support bot load test ===")
+    print(
+        f"updates: {report['updates']} in {report['duration_s']} s "
+        f"({report['throughput_updates_per_s']} updates/s), errors: {report['errors']}"
+    )
+    print(
+        f"handler latency: p50={latency['p50_ms']} ms p95={latency['p95_ms']} ms "
+        f"p99={latency['p99_ms']} ms max={latency['max_ms']} ms"
+    )
+    for kind, stats in report["latency_by_kind"].items():
+        print(
+            f"  {kind:<26} n={stats['count']:<6} p50={stats['p50_ms']:<8} "
+            f"p95={stats['p95_ms']:<8} p99={stats['p99_ms']}"
+        )
+    print(
+        f"db queries: {report['db_queries']} "
+        f"({report['db_queries_per_update']} per update)"
+    )
+    print(
+        f"bot api calls: {report['bot_api_calls']} "
+        f"({report['bot_api_calls_per_update']} per update)"
+    )
+    for method, count in report["bot_api_calls_by_method"].items():
+        print(f"  {method:<26} {count}")
+    print(f"tickets published: {report['tickets_published']}")
+    print(f"peak RSS: {report['peak_rss_mb']} MB")
+
+
+async def run_load_test(args: argparse.Namespace) -> dict:
+    options = LoadTestOptions(
+        players=args.players,
+        admins=args.admins,
+        replies=args.replies,
+        album_every=args.album_every,
+        album_size=args.album_size,
+        reply_interval=args.reply_interval,
+        step_delay=args.step_delay,
+        ramp_up=args.ramp_up,
+        admin_interval=args.admin_interval,
+        take_ratio=args.take_ratio,
+        api_latency=args.api_latency_ms / 1000,
+        seed=args.seed,
+    )
+
+    settings = isolated_settings(
+        load_settings(),
+        suffix="loadtest",
+        backend=args.backend,
+        db_name=args.db_name,
+        db_path=args.db_path,
+    )
+    settings.bot_token = FAKE_BOT_TOKEN
+    settings.admin_chat_id = FAKE_ADMIN_CHAT_ID
+
+    await ensure_database(settings)
+    await db.init_db_pool(settings)
+
+    api = FakeBotAPI(bot_id=int(FAKE_BOT_TOKEN.split(":", 1)[0]), latency=options.api_latency)
+    base_url = await api.start()
+    session = AiohttpSession(api=TelegramAPIServer.from_base(base_url))
+    bot = Bot(token=FAKE_BOT_TOKEN, session=session)
+    dp = create_dispatcher(settings, bot)
+
+    probe = QueryProbe(db.BACKEND)
+    probe.install()
+    # темы новых тикетов создаёт фоновый TicketPublisher, как в bot.py
+    publisher = asyncio.create_task(dp.workflow_data["publisher"].run(bot))
+    try:
+        test = LoadTest(options=options, dp=dp, bot=bot, api=api)
+        duration = await test.run()
+        return build_report(test, duration=duration, queries=probe.count, options=options)
+    finally:
+        publisher.cancel()
+        await asyncio.gather(publisher, return_exceptions=True)
+        probe.uninstall()
+        await bot.session.close()
+        await api.stop()
+        await db.close_db_pool()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the support bot handlers.")
+    parser.add_argument("--players", type=int, default=50, help="Synthetic players.")
+    parser.add_argument("--admins", type=int, default=5, help="Synthetic admins.")
+    parser.add_argument(
+        "--replies", type=int, default=3, help="Replies per player after ticket creation."
+    )
+    parser.add_argument(
+        "--album-every",
+        type=int,
+        default=3,
+        help="Every N-th ticket/reply is a photo album (0 disables albums).",
+    )
+    parser.add_argument("--album-size", type=int, default=3, help="Photos per album.")
+    parser.add_argument(
+        "--reply-interval",
+        type=float,
+        default=5.5,
+        help="Seconds between player replies (the bot has a 5 s per-user cooldown).",
+    )
+    parser.add_argument(
+        "--step-delay", type=float, default=0.05, help="Pause between setup steps."
+    )
+    parser.add_argument(
+        "--ramp-up", type=float, default=5.0, help="Spread player start over N seconds."
+    )
+    parser.add_argument(
+        "--admin-interval", type=float, default=1.0, help="Mean pause between admin actions."
+    )
+    parser.add_argument(
+        "--take-ratio",
+        type=float,
+        default=0.3,
+        help="Probability that an admin action is a 'take' press on a new ticket.",
+    )
+    parser.add_argument(
+        "--api-latency-ms",
+        type=float,
+        default=0.0,
+        help="Artificial latency of every fake Bot API call.",
+    )
+    parser.add_argument(
+        "--backend", choices=("mysql", "sqlite"), default="", help="Override DB_BACKEND."
+    )
+    parser.add_argument(
+        "--db-name", default="", help="MySQL database (default: <DB_NAME>_loadtest)."
+    )
+    parser.add_argument(
+        "--db-path", default="", help="SQLite file (default: <DB_PATH>_loadtest)."
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+    parser.add_argument("--json", dest="json_path", default="", help="Write report to file.")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+
+    report = asyncio.run(run_load_test(args))
+    print_report(report)
+    if args.json_path:
+        Path(args.json_path).write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""Instrumentation of SQL statements issued by ``db.py`` for dev tools.
+
+The probe registers a query hook on the active storage backend
+(``db.BACKEND.query_hooks``), so load tests and benchmarks can count queries or
+capture the exact statements a data-access function runs on any backend.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class RecordedQuery:
+    sql: str
+    args: Any
+
+
+def normalize_sql(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+class QueryProbe:
+    def __init__(self, backend, *, record: bool = False):
+        self.backend = backend
+        self.record = record
+        self.count = 0
+        self.queries: list[RecordedQuery] = []
+
+    def _hook(self, sql: str, args: Any):
+        self.count += 1
+        if self.record:
+            self.queries.append(RecordedQuery(sql=sql, args=args))
+
+    def install(self):
+        self.backend.query_hooks.append(self._hook)
+
+    def uninstall(self):
+        if self._hook in self.backend.query_hooks:
+            self.backend.query_hooks.remove(self._hook)
+
+    def reset(self):
+        self.count = 0
+        self.queries.clear()
+
+    def __enter__(self) -> "QueryProbe":
+        self.install()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.uninstall()